@@ -12,6 +12,7 @@ import (
 	"github.com/smart-inner/smarttune/util/http"
 	"github.com/spf13/cobra"
 	"io/ioutil"
+	"strconv"
 	"strings"
 	"time"
 )
@@ -104,8 +105,55 @@ func (o *RunOptions) GetResult(maxTimeSec, intervalSec int) (*Result, error) {
 	return nil, errors.New("failed to download the nex config")
 }
 
+// WaitResult blocks on the long-poll query of the result until its recommendation
+// is ready, each request waits at most pollSec seconds on the server side
+func (o *RunOptions) WaitResult(resultId string, maxTimeSec, pollSec int) (*Result, error) {
+	url := fmt.Sprintf("http://%s/api/result/query/%s/%s", o.Backend, o.SessionName, resultId)
+	deadline := time.Now().Add(time.Duration(maxTimeSec) * time.Second)
+
+	for time.Now().Before(deadline) {
+		timeout := int(time.Until(deadline) / time.Second)
+		if timeout > pollSec {
+			timeout = pollSec
+		}
+		request := map[string]string{"timeout": strconv.Itoa(timeout)}
+		resp, err := http.Get(url, request)
+		if err != nil {
+			return nil, err
+		}
+		body, err := ioutil.ReadAll(resp.Body)
+		resp.Body.Close()
+		if err != nil {
+			return nil, err
+		}
+		if resp.StatusCode == 200 {
+			var result Result
+			if err = json.Unmarshal(body, &result); err != nil {
+				return nil, err
+			}
+			return &result, nil
+		} else {
+			fmt.Fprintf(o.Out, "Unable to obtain result, status: %s\n", resp.Status)
+		}
+	}
+	return nil, errors.New("failed to download the nex config")
+}
+
+// parseResultId extracts the result id from the response of GenerateResult
+func parseResultId(resp string) (string, bool) {
+	idx := strings.LastIndex(resp, ":")
+	if idx < 0 {
+		return "", false
+	}
+	resultId := strings.TrimSpace(resp[idx+1:])
+	if _, err := strconv.Atoi(resultId); err != nil {
+		return "", false
+	}
+	return resultId, true
+}
+
 func (o *RunOptions) GenerateResult(url string, request map[string]interface{}) (string, error) {
-	resp, err := http.PostJSON(url, request)
+	resp, err := http.PostGzipJSON(url, request)
 	if err != nil {
 		return "", err
 	}
@@ -152,11 +200,12 @@ func (o *RunOptions) Loop(iter int) error {
 	}
 
 	// generate the next recommendation configuration
+	// the collected snapshots are already JSON, they are embedded as nested objects
 	request := make(map[string]interface{})
-	request["summary"] = string(summaryStr)
-	request["knobs"] = knobs
-	request["metrics_before"] = beforeMetrics
-	request["metrics_after"] = afterMetrics
+	request["summary"] = json.RawMessage(summaryStr)
+	request["knobs"] = json.RawMessage(knobs)
+	request["metrics_before"] = json.RawMessage(beforeMetrics)
+	request["metrics_after"] = json.RawMessage(afterMetrics)
 	url := fmt.Sprintf("http://%s/api/result/generate/%s", o.Backend, o.SessionName)
 	resp, err := o.GenerateResult(url, request)
 	if err != nil {
@@ -164,7 +213,12 @@ func (o *RunOptions) Loop(iter int) error {
 	}
 	fmt.Fprintf(o.Out, resp)
 
-	result, err := o.GetResult(180, 5)
+	var result *Result
+	if resultId, ok := parseResultId(resp); ok {
+		result, err = o.WaitResult(resultId, 180, 60)
+	} else {
+		result, err = o.GetResult(180, 5)
+	}
 	if err != nil {
 		return err
 	}
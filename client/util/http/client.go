@@ -2,6 +2,7 @@ package http
 
 import (
 	"bytes"
+	"compress/gzip"
 	"encoding/json"
 	"errors"
 	"fmt"
@@ -74,6 +75,38 @@ func PostJSON(url string, request map[string]interface{}) (*http.Response, error
 	return post(url, request, "application/json")
 }
 
+// PostGzipJSON
+// @Description: implements HTTP POST with gzip-compressed JSON body
+// @Parameter url
+// @Parameter request
+// @return *http.Response
+// @return error
+func PostGzipJSON(url string, request map[string]interface{}) (*http.Response, error) {
+	if request == nil {
+		return nil, errors.New("the request parameter cannot be nil")
+	}
+	bytesData, err := json.Marshal(request)
+	if err != nil {
+		return nil, err
+	}
+	var buf bytes.Buffer
+	writer := gzip.NewWriter(&buf)
+	if _, err = writer.Write(bytesData); err != nil {
+		return nil, err
+	}
+	if err = writer.Close(); err != nil {
+		return nil, err
+	}
+	httpRequest, _ := http.NewRequest("POST", url, &buf)
+	httpRequest.Header.Add("Content-Type", "application/json")
+	httpRequest.Header.Add("Content-Encoding", "gzip")
+	resp, err := httpClient.Do(httpRequest)
+	if err != nil {
+		return nil, err
+	}
+	return resp, nil
+}
+
 // post
 // @Description: common handle post request
 // @Parameter url
@@ -8,6 +8,7 @@ executor = Executor()
 scheduler = APScheduler()
 
 from .views import *
+from .utils import ArtifactStore
 
 def create_app(config_obj):
     app = Flask(__name__)
@@ -15,6 +16,7 @@ def create_app(config_obj):
     db.init_app(app)
     db.app = app
     executor.init_app(app)
+    ArtifactStore.init_app(app)
     scheduler.init_app(app)
     scheduler.start()
     app.register_blueprint(session, url_prefix='/api/session')
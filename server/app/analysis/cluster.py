@@ -7,9 +7,12 @@ import copy
 import numpy as np
 from loguru import logger
 
-from scipy.spatial.distance import cdist
 from sklearn.metrics import silhouette_score
 from sklearn.cluster import KMeans as SklearnKMeans
+try:
+    import joblib
+except ImportError:
+    from sklearn.externals import joblib
 
 from .base import ModelBase
 
@@ -88,7 +91,7 @@ class KMeans(ModelBase):
         self.sample_labels_ = None
         self.sample_distances_ = None
 
-    def fit(self, X, K, sample_labels=None, estimator_params=None):
+    def fit(self, X, K, sample_labels=None, estimator_params=None, closest_only=False):
         """Fits a Sklearn KMeans model to X.
 
         Parameters
@@ -105,6 +108,10 @@ class KMeans(ModelBase):
         estimator_params : dict, optional
                            The parameters to pass to the KMeans estimators.
 
+        closest_only : bool, optional
+                       Only records the sample closest to each cluster center,
+                       enough for get_closest_samples.
+
 
         Returns
         -------
@@ -125,32 +132,26 @@ class KMeans(ModelBase):
         self.sample_labels_ = np.array(sample_labels)
         self.n_clusters_ = K
 
+        # "All clusters must have at least 1 member!"
+        labels = self.model_.labels_
+        counts = np.bincount(labels, minlength=self.n_clusters_)
+        if np.any(counts == 0):
+            return None
+
+        # Distance between each sample and its cluster center, the samples are
+        # then ordered by cluster and by ascending distance within a cluster
+        dists = np.linalg.norm(X - self.model_.cluster_centers_[labels], axis=1)
+        sort_order = np.lexsort((dists, labels))
+        starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+        ends = starts + 1 if closest_only else starts + counts
+
         # Record sample label/distance from its cluster center
         self.sample_distances_ = OrderedDict()
         for cluster_label in range(self.n_clusters_):
-            assert cluster_label not in self.sample_distances_
-            member_rows = X[self.cluster_labels_ == cluster_label, :]
-            member_labels = self.sample_labels_[self.cluster_labels_ == cluster_label]
-            centroid = np.expand_dims(self.cluster_centers_[cluster_label], axis=0)
-
-            # "All clusters must have at least 1 member!"
-            if member_rows.shape[0] == 0:
-                return None
-
-            # Calculate distance between each member row and the current cluster
-            dists = np.empty(member_rows.shape[0])
-            dist_labels = []
-            for j, (row, label) in enumerate(zip(member_rows, member_labels)):
-                dists[j] = cdist(np.expand_dims(row, axis=0), centroid, "euclidean").squeeze()
-                dist_labels.append(label)
-
-            # Sort the distances/labels in ascending order
-            sort_order = np.argsort(dists)
-            dists = dists[sort_order]
-            dist_labels = np.array(dist_labels)[sort_order]
+            members = sort_order[starts[cluster_label]:ends[cluster_label]]
             self.sample_distances_[cluster_label] = {
-                "sample_labels": dist_labels,
-                "distances": dists,
+                "sample_labels": self.sample_labels_[members],
+                "distances": dists[members],
             }
         return self
 
@@ -181,6 +182,97 @@ class KMeans(ModelBase):
         return json.dumps(memberships, indent=4)
 
 
+def _fit_kmeans(X, K, sample_labels, estimator_params, closest_only):
+    # Module level so that it can be shipped to the joblib workers
+    return KMeans().fit(X, K, sample_labels, estimator_params, closest_only)
+
+
+def _reference_dispersions(Xbs, K):
+    # log(Wk) of a chunk of reference datasets of the gap statistic, only the
+    # inertia is needed so the sample distances of KMeans.fit are not computed
+    return [np.log(SklearnKMeans(K).fit(Xb).inertia_ / (2.0 * K)) for Xb in Xbs]
+
+
+class LazyClusterMap(object):
+    """LazyClusterMap:
+
+    Maps each cluster size (K) to the KMeans model fitted to X with K
+    clusters like the cluster_map_ of KMeansClusters, but the models are
+    fitted the first time they are read. A KSelection technique that stops
+    early (GapStatistic) then never fits the larger cluster sizes.
+
+    keys() are the candidate cluster sizes, they end before the first K
+    with an empty cluster once it has been fitted. get() returns None for
+    that K and the larger ones.
+
+    With n_jobs != 1 a read of a size that is not fitted yet fits it and the
+    next sizes together, one per job.
+    """
+
+    def __init__(self, X, cluster_sizes, sample_labels, estimator_params, closest_only, n_jobs=1):
+        self.X_ = X
+        self.cluster_sizes_ = list(cluster_sizes)
+        self.sample_labels_ = sample_labels
+        self.estimator_params_ = estimator_params
+        self.closest_only_ = closest_only
+        self.n_jobs_ = n_jobs
+        self.models_ = {}
+
+    def keys(self):
+        return list(self.cluster_sizes_)
+
+    def get(self, K, default=None):
+        if K not in self.cluster_sizes_:
+            return default
+        if K not in self.models_:
+            self._fit_from(K)
+            if K not in self.cluster_sizes_:
+                return default
+        return self.models_[K]
+
+    def _fit_from(self, K):
+        # Fits K and, with several jobs, the next unfitted sizes concurrently
+        n_chunk = joblib.cpu_count() if self.n_jobs_ < 0 else self.n_jobs_
+        start = self.cluster_sizes_.index(K)
+        chunk = [k for k in self.cluster_sizes_[start:] if k not in self.models_][:max(1, n_chunk)]
+        if len(chunk) == 1:
+            models = [_fit_kmeans(self.X_, K, self.sample_labels_, self.estimator_params_,
+                                  self.closest_only_)]
+        else:
+            models = joblib.Parallel(n_jobs=self.n_jobs_)(
+                joblib.delayed(_fit_kmeans)(self.X_, k, self.sample_labels_, self.estimator_params_,
+                                            self.closest_only_)
+                for k in chunk)
+        for k, model in zip(chunk, models):
+            if model is None:  # Set maximum cluster
+                assert k > self.cluster_sizes_[0], "min_cluster is too large for the model"
+                self.cluster_sizes_ = [size for size in self.cluster_sizes_ if size < k]
+                break
+            self.models_[k] = model
+
+    def items(self):
+        # Fits all the remaining cluster sizes
+        items = []
+        for K in self.keys():
+            model = self.get(K)
+            if model is None:
+                break
+            items.append((K, model))
+        return items
+
+    def __getitem__(self, K):
+        model = self.get(K)
+        if model is None:
+            raise KeyError(K)
+        return model
+
+    def __contains__(self, K):
+        return K in self.cluster_sizes_
+
+    def __len__(self):
+        return len(self.items())
+
+
 class KMeansClusters(ModelBase):
 
     """
@@ -218,7 +310,8 @@ class KMeansClusters(ModelBase):
         self.cluster_map_ = None
         self.sample_labels_ = None
 
-    def fit(self, X, min_cluster, max_cluster, sample_labels=None, estimator_params=None):
+    def fit(self, X, min_cluster, max_cluster, sample_labels=None, estimator_params=None,
+            n_jobs=1, closest_only=False, lazy=False):
         """Fits a KMeans model to X for each cluster in the range [min_cluster, max_cluster].
 
         Parameters
@@ -238,6 +331,19 @@ class KMeansClusters(ModelBase):
         estimator_params : dict, optional
                            The parameters to pass to the KMeans estimators.
 
+        n_jobs : int, optional
+                 The number of jobs fitting the cluster sizes concurrently,
+                 -1 uses all the processors. With 1 the sizes are fitted one
+                 by one and the sweep stops at the first empty cluster.
+
+        closest_only : bool, optional
+                       Only records the sample closest to each cluster center
+                       in the KMeans models.
+
+        lazy : bool, optional
+               Fits the cluster sizes when they are read: cluster_map_ is a
+               LazyClusterMap, which fits n_jobs sizes at a time.
+
 
         Returns
         -------
@@ -250,8 +356,19 @@ class KMeansClusters(ModelBase):
         if sample_labels is None:
             sample_labels = ["sample_{}".format(i) for i in range(X.shape[1])]
         self.sample_labels_ = sample_labels
-        for K in range(self.min_cluster_, self.max_cluster_ + 1):
-            tmp = KMeans().fit(X, K, self.sample_labels_, estimator_params)
+        cluster_sizes = range(self.min_cluster_, self.max_cluster_ + 1)
+        if lazy:
+            self.cluster_map_ = LazyClusterMap(X, cluster_sizes, self.sample_labels_, estimator_params,
+                                               closest_only, n_jobs)
+            return self
+        if n_jobs == 1:
+            models = (_fit_kmeans(X, K, self.sample_labels_, estimator_params, closest_only)
+                      for K in cluster_sizes)
+        else:
+            models = joblib.Parallel(n_jobs=n_jobs)(
+                joblib.delayed(_fit_kmeans)(X, K, self.sample_labels_, estimator_params, closest_only)
+                for K in cluster_sizes)
+        for K, tmp in zip(cluster_sizes, models):
             if tmp is None:  # Set maximum cluster
                 assert K > min_cluster, "min_cluster is too large for the model"
                 self.max_cluster_ = K - 1
@@ -366,7 +483,7 @@ class GapStatistic(KSelection):
         self.log_wkbs_ = None
         self.khats_ = None
 
-    def fit(self, X, cluster_map, n_b=50):
+    def fit(self, X, cluster_map, n_b=50, n_jobs=1):
         """Estimates the optimal number of clusters (K) for a
            KMeans model trained on X.
 
@@ -375,13 +492,18 @@ class GapStatistic(KSelection):
         X : array-like, shape (n_samples, n_features)
             Training data.
 
-        cluster_map_ : dict
+        cluster_map_ : dict or LazyClusterMap
                        A dictionary mapping each cluster size (K) to the KMeans
-                       model fitted to X with K clusters
+                       model fitted to X with K clusters. With a LazyClusterMap
+                       the cluster sizes after the optimal K + 1 are not fitted.
 
         n_B : int
               The number of reference data sets to generate
 
+        n_jobs : int, optional
+                 The number of jobs fitting the reference data sets concurrently,
+                 -1 uses all the processors.
+
 
         Returns
         -------
@@ -389,39 +511,52 @@ class GapStatistic(KSelection):
         """
         self._reset()
         mins, maxs = GapStatistic.bounding_box(X)
-        n_clusters = len(cluster_map)
+        cluster_sizes = sorted(cluster_map.keys())
+        n_clusters = len(cluster_sizes)
+
+        # The B reference datasets are drawn once and shared by every K, each
+        # job fits one chunk of them
+        Xbs = np.random.uniform(mins, maxs, size=(n_b,) + X.shape)
+        n_chunks = joblib.cpu_count() if n_jobs < 0 else n_jobs
+        Xb_chunks = np.array_split(Xbs, max(1, min(n_b, n_chunks)))
 
         # Dispersion for real distribution
         log_wks = np.zeros(n_clusters)
         log_wkbs = np.zeros(n_clusters)
         sk = np.zeros(n_clusters)
-        for indk, (K, model) in enumerate(sorted(cluster_map.items())):
-
-            # Computes Wk: the within-dispersion of each cluster size (k)
-            log_wks[indk] = np.log(model.cluster_inertia_ / (2.0 * K))
-
-            # Create B reference datasets
-            log_bwkbs = np.zeros(n_b)
-            for i in range(n_b):
-                Xb = np.empty_like(X)
-                for j in range(X.shape[1]):
-                    Xb[:, j] = np.random.uniform(mins[j], maxs[j], size=X.shape[0])
-                Xb_model = KMeans().fit(Xb, K)
-                log_bwkbs[i] = np.log(Xb_model.cluster_inertia_ / (2.0 * K))
-            log_wkbs[indk] = sum(log_bwkbs) / n_b
-            sk[indk] = np.sqrt(sum((log_bwkbs - log_wkbs[indk]) ** 2) / n_b)
-        sk = sk * np.sqrt(1 + 1.0 / n_b)
-
-        khats = np.zeros(n_clusters)
+        n_fitted = n_clusters
+        with joblib.Parallel(n_jobs=n_jobs) as parallel:
+            for indk, K in enumerate(cluster_sizes):
+                model = cluster_map.get(K)
+                if model is None:  # K has an empty cluster
+                    n_fitted = indk
+                    break
+
+                # Computes Wk: the within-dispersion of each cluster size (k)
+                log_wks[indk] = np.log(model.cluster_inertia_ / (2.0 * K))
+
+                # Fit the B reference datasets
+                log_bwkbs = np.concatenate(parallel(
+                    joblib.delayed(_reference_dispersions)(Xb_chunk, K) for Xb_chunk in Xb_chunks))
+                log_wkbs[indk] = np.mean(log_bwkbs)
+                sk[indk] = np.sqrt(np.mean((log_bwkbs - log_wkbs[indk]) ** 2)) * np.sqrt(1 + 1.0 / n_b)
+
+                # The smallest K with gap(K) >= gap(K+1) - s(K+1) is the answer,
+                # the larger cluster sizes are not read (nor fitted)
+                if indk > 0 and log_wkbs[indk - 1] - log_wks[indk - 1] >= \
+                        log_wkbs[indk] - log_wks[indk] - sk[indk]:
+                    n_fitted = indk + 1
+                    self.optimal_num_clusters_ = cluster_sizes[indk - 1]
+                    break
+
+        log_wks = log_wks[:n_fitted]
+        log_wkbs = log_wkbs[:n_fitted]
+        sk = sk[:n_fitted]
+        khats = np.zeros(n_fitted)
         gaps = log_wkbs - log_wks
         gsks = gaps - sk
         khats[1:] = gaps[0:-1] - gsks[1:]
-        self.clusters_ = np.array(sorted(cluster_map.keys()))
-
-        for i in range(1, n_clusters):
-            if gaps[i - 1] >= gsks[i]:
-                self.optimal_num_clusters_ = self.clusters_[i - 1]
-                break
+        self.clusters_ = np.array(cluster_sizes[:n_fitted])
 
         if self.optimal_num_clusters_ is None:
             logger.info("GapStatistic NOT found the optimal k, \
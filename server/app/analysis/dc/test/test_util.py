@@ -0,0 +1,42 @@
+import unittest
+import numpy as np
+from app.analysis.dc.config import config_context
+from app.analysis.dc.util import cal_distance, cal_labels
+
+
+def naive_distance(X, sample_weight):
+    X = np.multiply(X.T, sample_weight).T
+    distance = np.zeros(shape=(len(X), len(X)))
+    for i in range(len(X)):
+        for j in range(len(X)):
+            distance[i][j] = np.sqrt(np.sum(np.power(X[i] - X[j], 2)))
+    return distance
+
+
+class TestUtil(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.X = rng.rand(60, 2)
+        self.sample_weight = rng.rand(60) + 0.5
+        self.centers = self.X[[3, 17, 42]]
+
+    def test_cal_distance(self):
+        expected = naive_distance(self.X, self.sample_weight)
+        distance = cal_distance(self.X, self.sample_weight)
+        np.testing.assert_allclose(distance, expected, atol=1e-12)
+        np.testing.assert_array_equal(np.diag(distance), 0.0)
+        with config_context(working_memory=0.001):
+            np.testing.assert_allclose(cal_distance(self.X, self.sample_weight), expected, atol=1e-12)
+
+    def test_cal_labels(self):
+        expected = np.vstack([np.linalg.norm(self.centers - point, axis=1) for point in self.X])
+        labels, distance = cal_labels(self.X, self.centers)
+        np.testing.assert_allclose(distance, expected)
+        np.testing.assert_array_equal(labels, np.argmin(expected, axis=1))
+        with config_context(working_memory=0.001):
+            np.testing.assert_array_equal(cal_labels(self.X, self.centers, return_inertia=False), labels)
+
+
+if __name__ == '__main__':
+    unittest.main()
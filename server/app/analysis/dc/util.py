@@ -1,6 +1,7 @@
 import numpy as np
 import heapq
 from sklearn import metrics
+from ..pairwise import pairwise_distances, pairwise_distances_argmin
 
 def cal_labels(X, centers, return_inertia=True):
     """
@@ -22,14 +23,11 @@ def cal_labels(X, centers, return_inertia=True):
         Sum of squared distances of samples to their closest cluster center.
         Inertia is only returned if return_inertia is True.
     """
-    distance = np.array([])
-    for point in X:
-        distance = np.append(distance, np.linalg.norm(centers - point, axis=1), axis=0)
-    distance = distance.reshape(len(X), len(centers))
+    if not return_inertia:
+        return pairwise_distances_argmin(X, centers)
+    distance = pairwise_distances(X, centers)
     labels = np.argmin(distance, axis=1)
-    if return_inertia:
-        return labels, distance
-    return labels
+    return labels, distance
 
 def cal_distance(X, sample_weight):
     """
@@ -48,13 +46,8 @@ def cal_distance(X, sample_weight):
         The distance matrix for any two points
     """
     X = np.multiply(X.T, sample_weight).T
-    distance = np.zeros(shape=(len(X), len(X)))
-    for i in range(len(X)):
-        for j in range(len(X)):
-            if i > j:
-                distance[i][j] = distance[j][i]
-            elif i < j:
-                distance[i][j] = np.sqrt(np.sum(np.power(X[i] - X[j], 2)))
+    distance = pairwise_distances(X)
+    np.fill_diagonal(distance, 0.0)
     return distance
 
 def cal_dc(distance, percent):
@@ -1,11 +1,16 @@
 import numpy as np
 from sklearn.decomposition import FactorAnalysis as SklearnFactorAnalysis
+from sklearn.decomposition import PCA, IncrementalPCA
 from .base import ModelBase
 
 class FactorAnalysis(ModelBase):
     """FactorAnalysis (FA):
 
-    Fits an Sklearn FactorAnalysis model to X.
+    Fits an Sklearn FactorAnalysis model to X. The 'randomized' and
+    'incremental' solvers extract the factors from a principal component
+    analysis instead (the loadings are the principal axes scaled by the
+    standard deviation they explain), a single randomized SVD or row chunks
+    of a fixed size rather than the iterated SVDs of the FA estimator.
 
 
     See also
@@ -15,7 +20,7 @@ class FactorAnalysis(ModelBase):
 
     Attributes
     ----------
-    model_ : sklearn.decomposition.FactorAnalysis
+    model_ : sklearn.decomposition.FactorAnalysis, PCA or IncrementalPCA
              The fitted FA model
 
     components_ : array, [n_components, n_features]
@@ -34,6 +39,8 @@ class FactorAnalysis(ModelBase):
                    accounting for noise
     """
 
+    SOLVERS_ = ('fa', 'randomized', 'incremental')
+
     def __init__(self):
         self.model_ = None
         self.components_ = None
@@ -51,7 +58,8 @@ class FactorAnalysis(ModelBase):
         self.pvars_ = None
         self.pvars_noise_ = None
 
-    def fit(self, X, feature_labels=None, n_components=None, estimator_params=None):
+    def fit(self, X, feature_labels=None, n_components=None, estimator_params=None,
+            solver='fa', batch_size=1000):
         """Fits an Sklearn FA model to X.
 
         Parameters
@@ -65,34 +73,77 @@ class FactorAnalysis(ModelBase):
         estimator_params : dict, optional
                            The parameters to pass to Sklearn's FA estimators.
 
+        solver : string, optional
+                 One of ['fa', 'randomized', 'incremental'].
+
+        batch_size : int, optional
+                     The number of rows of each chunk of the incremental solver.
+
 
         Returns
         -------
         self
         """
         self._reset()
+        if solver not in self.SOLVERS_:
+            raise Exception("FactorAnalysis solver {} not supported!".format(solver))
         if feature_labels is None:
             feature_labels = ["feature_{}".format(i) for i in range(X.shape[1])]
         self.feature_labels_ = feature_labels
-        if n_components is not None:
-            model = SklearnFactorAnalysis(n_components=n_components)
+        if solver != 'fa':
+            components, noise_variance = self._fit_pca(X, n_components, estimator_params,
+                                                       solver, batch_size)
         else:
-            model = SklearnFactorAnalysis()
-        self.model_ = model
-        if estimator_params is not None:
-            # Update Sklearn estimator params
-            assert isinstance(estimator_params, dict)
-            self.model_.set_params(**estimator_params)
-        self.model_.fit(X)
+            if n_components is not None:
+                model = SklearnFactorAnalysis(n_components=n_components)
+            else:
+                model = SklearnFactorAnalysis()
+            self.model_ = model
+            if estimator_params is not None:
+                # Update Sklearn estimator params
+                assert isinstance(estimator_params, dict)
+                self.model_.set_params(**estimator_params)
+            self.model_.fit(X)
+            components, noise_variance = self.model_.components_, self.model_.noise_variance_
 
         # Remove zero-valued components (n_components x n_features)
-        components_mask = np.sum(self.model_.components_ != 0.0, axis=1) > 0.0
-        self.components_ = self.model_.components_[components_mask]
+        components_mask = np.sum(components != 0.0, axis=1) > 0.0
+        self.components_ = components[components_mask]
 
         # Compute the % variance explained (with/without noise)
         c2 = np.sum(self.components_ ** 2, axis=1)
         self.total_variance_ = np.sum(c2)
         self.pvars_ = 100 * c2 / self.total_variance_
         self.pvars_noise_ = 100 * c2 / (self.total_variance_ +
-                                        np.sum(self.model_.noise_variance_))
+                                        np.sum(noise_variance))
         return self
+
+    def _fit_pca(self, X, n_components, estimator_params, solver, batch_size):
+        """Extracts the factor loadings & the noise variances of X with a
+        (randomized or incremental) PCA."""
+        n_samples, n_features = X.shape
+        if n_components is None:
+            n_components = n_features
+        n_components = min(n_components, n_samples, n_features)
+        if solver == 'randomized':
+            self.model_ = PCA(n_components=n_components, svd_solver='randomized')
+        else:
+            self.model_ = IncrementalPCA(n_components=n_components)
+        if estimator_params is not None:
+            assert isinstance(estimator_params, dict)
+            self.model_.set_params(**estimator_params)
+
+        if solver == 'randomized':
+            self.model_.fit(X)
+            variances = np.var(X, axis=0, ddof=1)
+        else:
+            # The rows are fed in chunks of at least batch_size rows, the last
+            # (smaller) chunk is merged into the one before it
+            n_chunks = max(1, n_samples // max(batch_size, n_components))
+            for chunk in np.array_split(np.arange(n_samples), n_chunks):
+                self.model_.partial_fit(X[chunk])
+            variances = self.model_.var_ * n_samples / max(n_samples - 1, 1)
+
+        loadings = self.model_.components_ * np.sqrt(self.model_.explained_variance_)[:, np.newaxis]
+        noise_variance = np.maximum(variances - np.sum(loadings ** 2, axis=0), 0.0)
+        return loadings, noise_variance
@@ -1,10 +1,14 @@
 import numpy as np
-from scipy.spatial.distance import cdist as ed
 from scipy import special
+from scipy.linalg import cho_solve, cholesky, solve_triangular
 from .gp_tf import GPRResult
+from .pairwise import exponential_kernel, exponential_kernel_diag, get_chunk_n_rows
 
 
-# numpy version of Gaussian Process Regression, not using Tensorflow
+# numpy version of Gaussian Process Regression, not using Tensorflow. The
+# kernel matrix is kept as its Cholesky factor L (K = L L^T), partial_fit
+# extends the factor with the new observations in O(n^2) instead of
+# refactorizing it in O(n^3).
 class GPRNP(object):
 
     def __init__(self, length_scale=1.0, magnitude=1.0, max_train_size=7000,
@@ -20,8 +24,8 @@ class GPRNP(object):
         self.debug = debug
         self.X_train = None
         self.y_train = None
-        self.K = None
-        self.K_inv = None
+        self.L = None
+        self.alpha = None
         self.y_best = None
         self.ridge = None
 
@@ -37,8 +41,8 @@ class GPRNP(object):
     def _reset(self):
         self.X_train = None
         self.y_train = None
-        self.K = None
-        self.K_inv = None
+        self.L = None
+        self.alpha = None
         self.y_best = None
 
     def check_X_y(self, X, y):
@@ -53,7 +57,7 @@ class GPRNP(object):
 
     def check_fitted(self):
         if self.X_train is None or self.y_train is None \
-                or self.K is None:
+                or self.L is None:
             raise Exception("The model must be trained before making predictions!")
 
     @staticmethod
@@ -68,6 +72,28 @@ class GPRNP(object):
             raise Exception("Input contains non-finite values: {}"
                             .format(X[~finite_els]))
 
+    def _kernel(self, X1, X2):
+        return exponential_kernel(X1, X2, self.magnitude, self.length_scale)
+
+    def _get_batch_size(self):
+        # The test batches are bounded by batch_size and by the working memory
+        # (the batch x n_train kernel K2 and its solve)
+        return get_chunk_n_rows(16 * self.X_train.shape[0], self.batch_size_)
+
+    @staticmethod
+    def _get_ridge(ridge, sample_size):
+        if np.isscalar(ridge):
+            ridge = np.ones(sample_size) * ridge
+        assert isinstance(ridge, np.ndarray)
+        assert ridge.ndim == 1 and ridge.shape[0] == sample_size
+        return ridge
+
+    def _solve(self):
+        # y_train may hold several outputs (columns), they share the kernel
+        # matrix and are solved together: alpha = K^-1 y_train
+        self.alpha = cho_solve((self.L, True), self.y_train)
+        self.y_best = np.min(self.y_train, axis=0)
+
     def fit(self, X_train, y_train, ridge=1.0):
         self._reset()
         X_train, y_train = self.check_X_y(X_train, y_train)
@@ -77,17 +103,53 @@ class GPRNP(object):
         self.X_train = np.float32(X_train)
         self.y_train = np.float32(y_train)
         sample_size = self.X_train.shape[0]
-        self.ridge = ridge
-        if np.isscalar(ridge):
-            ridge = np.ones(sample_size) * ridge
-        assert isinstance(ridge, np.ndarray)
-        assert ridge.ndim == 1
-        K = self.magnitude * np.exp(-ed(self.X_train, self.X_train) / self.length_scale) \
-            + np.diag(ridge)
-        K_inv = np.linalg.inv(K)
-        self.K = K
-        self.K_inv = K_inv
-        self.y_best = np.min(y_train)
+        # The noise term of the predicted variances, the mean ridge if there
+        # is one ridge per sample
+        self.ridge = float(np.mean(ridge))
+        ridge = GPRNP._get_ridge(ridge, sample_size)
+        K = self._kernel(self.X_train, self.X_train) + np.diag(ridge)
+        self.L = cholesky(K, lower=True)
+        self._solve()
+        return self
+
+    def partial_fit(self, X_new, y_new, ridge=None):
+        # Adds the new observations to the fitted model. With K12 the kernel
+        # between the old and the new samples and K22 the kernel of the new
+        # samples, the factor of the extended kernel is
+        #   [[L,     0  ],      L12 = L^-1 K12
+        #    [L12^T, L22]]      L22 L22^T = K22 - L12^T L12
+        # ridge defaults to the noise term of fit, which is kept for the
+        # predictions whatever the ridge of the new samples.
+        if self.L is None:
+            return self.fit(X_new, y_new, ridge=1.0 if ridge is None else ridge)
+        X_new, y_new = self.check_X_y(X_new, y_new)
+        if X_new.ndim != 2 or y_new.ndim != 2:
+            raise Exception("X_new or y_new should have 2 dimensions! X_dim:{}, y_dim:{}"
+                            .format(X_new.ndim, y_new.ndim))
+        n_train, n_new = self.X_train.shape[0], X_new.shape[0]
+        if y_new.shape[1] != self.y_train.shape[1]:
+            raise Exception("y_new should have {} columns like y_train ({})"
+                            .format(self.y_train.shape[1], y_new.shape[1]))
+        if n_train + n_new > self.max_train_size_:
+            raise Exception("X_train size cannot exceed {} ({})"
+                            .format(self.max_train_size_, n_train + n_new))
+        new_ridge = GPRNP._get_ridge(self.ridge if ridge is None else ridge, n_new)
+
+        X_new = np.float32(X_new)
+        K12 = self._kernel(self.X_train, X_new)
+        K22 = self._kernel(X_new, X_new) + np.diag(new_ridge)
+        L12 = solve_triangular(self.L, K12, lower=True)
+        L22 = cholesky(K22 - np.matmul(np.transpose(L12), L12), lower=True)
+
+        L = np.zeros((n_train + n_new, n_train + n_new))
+        L[:n_train, :n_train] = self.L
+        L[n_train:, :n_train] = np.transpose(L12)
+        L[n_train:, n_train:] = L22
+
+        self.X_train = np.vstack([self.X_train, X_new])
+        self.y_train = np.vstack([self.y_train, np.float32(y_new)])
+        self.L = L
+        self._solve()
         return self
 
     def predict(self, X_test):
@@ -97,27 +159,27 @@ class GPRNP(object):
                             .format(X_test.ndim))
         X_test = np.float32(GPRNP.check_array(X_test))
         test_size = X_test.shape[0]
+        n_outputs = self.y_train.shape[1]
         arr_offset = 0
-        length_scale = self.length_scale
-        yhats = np.zeros([test_size, 1])
-        sigmas = np.zeros([test_size, 1])
-        eips = np.zeros([test_size, 1])
+        batch_size = self._get_batch_size()
+        yhats = np.zeros([test_size, n_outputs])
+        sigmas = np.zeros([test_size, n_outputs])
+        eips = np.zeros([test_size, n_outputs])
         while arr_offset < test_size:
-            if arr_offset + self.batch_size_ > test_size:
+            if arr_offset + batch_size > test_size:
                 end_offset = test_size
             else:
-                end_offset = arr_offset + self.batch_size_
+                end_offset = arr_offset + batch_size
             xt_ = X_test[arr_offset:end_offset]
-            K2 = self.magnitude * np.exp(-ed(self.X_train, xt_) / length_scale)
-            K3 = self.magnitude * np.exp(-ed(xt_, xt_) / length_scale)
+            K2 = self._kernel(self.X_train, xt_)
             K2_trans = np.transpose(K2)
-            yhat = np.matmul(K2_trans, np.matmul(self.K_inv, self.y_train))
-            xt_size = K3.shape[0]
-            ridge = self.ridge
-            if np.isscalar(ridge):
-                ridge = np.ones(xt_size) * ridge
-            sigma = np.sqrt(np.diag(K3 - np.matmul(K2_trans, np.matmul(self.K_inv, K2))
-                                    + np.diag(ridge))).reshape(xt_.shape[0], 1)
+            yhat = np.matmul(K2_trans, self.alpha)
+            xt_size = xt_.shape[0]
+            # diag(K3 - K2^T K^-1 K2) with v = L^-1 K2, only the diagonal of
+            # the test kernel K3 is needed
+            v = solve_triangular(self.L, K2, lower=True)
+            sigma = np.sqrt(exponential_kernel_diag(xt_, self.magnitude) - np.sum(np.square(v), axis=0)
+                            + self.ridge).reshape(xt_size, 1)
             u = (self.y_best - yhat) / sigma
             phi1 = 0.5 * special.erf(u / np.sqrt(2.0)) + 0.5
             phi2 = (1.0 / np.sqrt(2.0 * np.pi)) * np.exp(np.square(u) * (-0.5))
@@ -130,13 +192,31 @@ class GPRNP(object):
         GPRNP.check_output(sigmas)
         return GPRResult(yhats, sigmas)
 
+    def predict_mean(self, X_test):
+        # Only the predicted means, they need X_train & alpha alone so the
+        # model can be rebuilt from those two matrices (e.g. in another process)
+        if self.X_train is None or self.alpha is None:
+            raise Exception("The model must be trained before making predictions!")
+        if X_test.ndim != 2:
+            raise Exception("X_test should have 2 dimensions! X_dim:{}"
+                            .format(X_test.ndim))
+        X_test = np.float32(GPRNP.check_array(X_test))
+        test_size = X_test.shape[0]
+        yhats = np.zeros([test_size, self.alpha.shape[1]])
+        batch_size = self._get_batch_size()
+        for arr_offset in range(0, test_size, batch_size):
+            xt_ = X_test[arr_offset:arr_offset + batch_size]
+            K2 = self._kernel(self.X_train, xt_)
+            yhats[arr_offset:arr_offset + xt_.shape[0]] = np.matmul(np.transpose(K2), self.alpha)
+        GPRNP.check_output(yhats)
+        return yhats
+
     def get_params(self, deep=True):
         return {"length_scale": self.length_scale,
                 "magnitude": self.magnitude,
                 "X_train": self.X_train,
                 "y_train": self.y_train,
-                "K": self.K,
-                "K_inv": self.K_inv}
+                "L": self.L}
 
     def set_params(self, **parameters):
         for param, val in list(parameters.items()):
@@ -2,6 +2,7 @@ import gc
 import numpy as np
 import tensorflow as tf
 from loguru import logger
+from .pairwise import pairwise_distances
 
 
 class GPRResult(object):
@@ -21,6 +22,10 @@ class GPRGDResult(GPRResult):
 
 
 class GPR(object):
+    # The fit & predict chain is one graph evaluated by a session kept on the
+    # model. fit stores X_train, K_inv & xy_ in (non-trainable) variables of
+    # the graph, so predict only feeds the test samples. The graph and the
+    # session are reused by the following fits, close() releases them.
 
     def __init__(self, length_scale=2.0, magnitude=1.0, ridge=1.0, max_train_size=7000,
                  batch_size=3000, num_threads=4, check_numerics=True, debug=False,
@@ -43,9 +48,24 @@ class GPR(object):
         self.K = None
         self.K_inv = None
         self.graph = None
+        self.sess = None
         self.vars = None
         self.ops = None
 
+    @staticmethod
+    def _state_variable(name):
+        # A variable holding a fitted matrix, its shape is set by each fit
+        return tf.Variable(tf.zeros([0, 0], dtype=tf.float32), trainable=False,
+                           validate_shape=False, name=name)
+
+    @staticmethod
+    def _distances(X1, X2):
+        # Euclidean distances from the squared norms (like gpflow's square_dist)
+        X1s = tf.reduce_sum(tf.square(X1), 1)
+        X2s = tf.reduce_sum(tf.square(X2), 1)
+        dists = -2 * tf.matmul(X1, X2, transpose_b=True) + \
+            tf.reshape(X1s, (-1, 1)) + tf.reshape(X2s, (1, -1))
+        return tf.sqrt(tf.maximum(dists, 0.0))
 
     def build_graph(self):
         self.vars = {}
@@ -85,86 +105,72 @@ class GPR(object):
                 noise_var = tf.constant(self.ridge,
                                         dtype=np.float32,
                                         name='noise_scale')
-            # Nodes for distance computation
-            v1 = tf.placeholder(tf.float32, name="v1")
-            v2 = tf.placeholder(tf.float32, name="v2")
-            dist_op = tf.sqrt(tf.reduce_sum(tf.pow(tf.subtract(v1, v2), 2), 1), name='dist_op')
-            if self.check_numerics:
-                dist_op = tf.check_numerics(dist_op, "dist_op: ")
-
-            self.vars['v1_h'] = v1
-            self.vars['v2_h'] = v2
-            self.ops['dist_op'] = dist_op
             self.vars['mag_v'] = mag_var
             self.vars['ls_v'] = ls_var
             self.vars['noise_v'] = noise_var
 
-            # Nodes for kernel computation
-            X_dists = tf.placeholder(tf.float32, name='X_dists')
-            ridge_ph = tf.placeholder(tf.float32, name='ridge')
+            # Nodes for the fit, the ridge defaults to the noise of every sample
+            X_ph = tf.placeholder(tf.float32, shape=[None, None], name='X_train')
+            yt_ = tf.placeholder(tf.float32, shape=[None, None], name='yt_')
+            ridge_ph = tf.placeholder_with_default(noise_var * tf.ones([tf.shape(X_ph)[0]]),
+                                                   shape=[None], name='ridge')
+            # The distance of every sample to itself is exactly 0
+            X_dists = tf.matrix_set_diag(GPR._distances(X_ph, X_ph), tf.zeros([tf.shape(X_ph)[0]]))
             K_op = mag_var * tf.exp(-X_dists / ls_var)  # pylint: disable=invalid-name
             if self.check_numerics:
                 K_op = tf.check_numerics(K_op, "K_op: ")
             K_ridge_op = K_op + tf.diag(ridge_ph)
             if self.check_numerics:
                 K_ridge_op = tf.check_numerics(K_ridge_op, "K_ridge_op: ")
-
-            self.vars['X_dists_h'] = X_dists
-            self.vars['ridge_h'] = ridge_ph
-            self.ops['K_op'] = K_op
-            self.ops['K_ridge_op'] = K_ridge_op
-
-            # Nodes for xy computation
-            K = tf.placeholder(tf.float32, name='K')
-            K_inv = tf.placeholder(tf.float32, name='K_inv')
-            xy_ = tf.placeholder(tf.float32, name='xy_')
-            yt_ = tf.placeholder(tf.float32, name='yt_')
-            K_inv_op = tf.matrix_inverse(K)
+            K_inv_op = tf.matrix_inverse(K_ridge_op)
             if self.check_numerics:
                 K_inv_op = tf.check_numerics(K_inv_op, "K_inv: ")
-            xy_op = tf.matmul(K_inv, yt_)
+            xy_op = tf.matmul(K_inv_op, yt_)
             if self.check_numerics:
                 xy_op = tf.check_numerics(xy_op, "xy_: ")
 
-            self.vars['K_h'] = K
-            self.vars['K_inv_h'] = K_inv
-            self.vars['xy_h'] = xy_
+            # The fitted state kept in the graph between fit & predict
+            X_train_v = GPR._state_variable('X_train_v')
+            K_inv_v = GPR._state_variable('K_inv_v')
+            xy_v = GPR._state_variable('xy_v')
+            fit_op = tf.group(tf.assign(X_train_v, X_ph, validate_shape=False),
+                              tf.assign(K_inv_v, K_inv_op, validate_shape=False),
+                              tf.assign(xy_v, xy_op, validate_shape=False))
+
+            self.vars['X_h'] = X_ph
             self.vars['yt_h'] = yt_
+            self.vars['ridge_h'] = ridge_ph
+            self.vars['X_train_v'] = X_train_v
+            self.vars['K_inv_v'] = K_inv_v
+            self.vars['xy_v'] = xy_v
+            self.ops['K_ridge_op'] = K_ridge_op
             self.ops['K_inv_op'] = K_inv_op
             self.ops['xy_op'] = xy_op
+            self.ops['fit_op'] = fit_op
 
-            # Nodes for yhat/sigma computation
-            K2 = tf.placeholder(tf.float32, name="K2")
-            K3 = tf.placeholder(tf.float32, name="K3")
-            ridge_test_ph = tf.placeholder(tf.float32, name="ridge_test_ph")
-            yhat_ = tf.cast(tf.matmul(tf.transpose(K2), xy_), tf.float32)
+            # Nodes for yhat/sigma computation, only the diagonals of K3 (the
+            # magnitude) and of K2^T K^-1 K2 are needed for the variances
+            X_test_ph = tf.placeholder(tf.float32, shape=[None, None], name='X_test')
+            K2 = mag_var * tf.exp(-GPR._distances(X_train_v, X_test_ph) / ls_var)
+            yhat_ = tf.cast(tf.matmul(K2, xy_v, transpose_a=True), tf.float32)
             if self.check_numerics:
                 yhat_ = tf.check_numerics(yhat_, "yhat_: ")
-            sv1 = tf.matmul(tf.transpose(K2), tf.matmul(K_inv, K2))
+            sv1 = tf.reduce_sum(K2 * tf.matmul(K_inv_v, K2), 0)
             if self.check_numerics:
                 sv1 = tf.check_numerics(sv1, "sv1: ")
-            sig_val = tf.cast((tf.sqrt(tf.diag_part(K3 + tf.diag(ridge_test_ph) - sv1))),
-                              tf.float32)
+            sig_val = tf.cast((tf.sqrt(mag_var + noise_var - sv1)), tf.float32)
             if self.check_numerics:
                 sig_val = tf.check_numerics(sig_val, "sig_val: ")
 
-            self.vars['K2_h'] = K2
-            self.vars['K3_h'] = K3
+            self.vars['X_test_h'] = X_test_ph
             self.ops['yhat_op'] = yhat_
             self.ops['sig_op'] = sig_val
-            self.ops['ridge_test_h'] = ridge_test_ph
-
-            # Compute y_best (min y)
-            y_best_op = tf.cast(tf.reduce_min(yt_, 0, True), tf.float32)
-            if self.check_numerics:
-                y_best_op = tf.check_numerics(y_best_op, "y_best_op: ")
-            self.ops['y_best_op'] = y_best_op
 
-            sigma = tf.placeholder(tf.float32, name='sigma')
-            yhat = tf.placeholder(tf.float32, name='yhat')
-
-            self.vars['sigma_h'] = sigma
-            self.vars['yhat_h'] = yhat
+            init = tf.global_variables_initializer()
+        self.sess = tf.Session(graph=self.graph,
+                               config=tf.ConfigProto(
+                                   intra_op_parallelism_threads=self.num_threads_))
+        self.sess.run(init)
 
     def __repr__(self):
         rep = ""
@@ -207,108 +213,28 @@ class GPR(object):
         X_train, y_train = self.check_X_y(X_train, y_train)
         self.X_train = np.float32(X_train)
         self.y_train = np.float32(y_train)
-        sample_size = self.X_train.shape[0]
-        ridge = self.ridge
-
-        X_dists = np.zeros((sample_size, sample_size), dtype=np.float32)
-        with tf.Session(graph=self.graph,
-                        config=tf.ConfigProto(
-                            intra_op_parallelism_threads=self.num_threads_)) as sess:
-            init = tf.global_variables_initializer()
-            sess.run(init)
-
-            noise_var = self.vars['noise_v']
-            if np.isscalar(ridge):
-                ridge = np.ones(sample_size) * sess.run(noise_var)
-            assert isinstance(ridge, np.ndarray)
-            assert ridge.ndim == 1
-
-            dist_op = self.ops['dist_op']
-            v1, v2 = self.vars['v1_h'], self.vars['v2_h']
-            for i in range(sample_size):
-                X_dists[i] = sess.run(dist_op, feed_dict={v1: self.X_train[i], v2: self.X_train})
-
-            K_ridge_op = self.ops['K_ridge_op']
-            X_dists_ph = self.vars['X_dists_h']
-            ridge_ph = self.vars['ridge_h']
-
-            self.K = sess.run(K_ridge_op, feed_dict={X_dists_ph: X_dists, ridge_ph: ridge})
-
-            K_ph = self.vars['K_h']
-
-            K_inv_op = self.ops['K_inv_op']
-            self.K_inv = sess.run(K_inv_op, feed_dict={K_ph: self.K})
-
-            xy_op = self.ops['xy_op']
-            K_inv_ph = self.vars['K_inv_h']
-            yt_ph = self.vars['yt_h']
-            self.xy_ = sess.run(xy_op, feed_dict={K_inv_ph: self.K_inv,
-                                                  yt_ph: self.y_train})
+        feed_dict = {self.vars['X_h']: self.X_train, self.vars['yt_h']: self.y_train}
+        if not np.isscalar(self.ridge):
+            assert isinstance(self.ridge, np.ndarray)
+            assert self.ridge.ndim == 1
+            feed_dict[self.vars['ridge_h']] = self.ridge
+        _, self.K, self.K_inv, self.xy_ = self.sess.run(
+            [self.ops['fit_op'], self.ops['K_ridge_op'], self.ops['K_inv_op'], self.ops['xy_op']],
+            feed_dict=feed_dict)
         return self
 
     def predict(self, X_test):
         self.check_fitted()
         X_test = np.float32(GPR.check_array(X_test))
         test_size = X_test.shape[0]
-        sample_size = self.X_train.shape[0]
-        ridge = self.ridge
-        arr_offset = 0
         yhats = np.zeros([test_size, 1])
         sigmas = np.zeros([test_size, 1])
-        with tf.Session(graph=self.graph,
-                        config=tf.ConfigProto(
-                            intra_op_parallelism_threads=self.num_threads_)) as sess:
-            init = tf.global_variables_initializer()
-            sess.run(init)
-
-            noise_var = self.vars['noise_v']
-            if np.isscalar(ridge):
-                ridge_test = np.ones(test_size) * sess.run(noise_var)
-            # Nodes for distance operation
-            dist_op = self.ops['dist_op']
-            v1 = self.vars['v1_h']
-            v2 = self.vars['v2_h']
-
-            # Nodes for kernel computation
-            K_op = self.ops['K_op']
-            X_dists = self.vars['X_dists_h']
-
-            # Nodes to compute yhats/sigmas
-            yhat_ = self.ops['yhat_op']
-            K_inv_ph = self.vars['K_inv_h']
-            K2 = self.vars['K2_h']
-            K3 = self.vars['K3_h']
-            xy_ph = self.vars['xy_h']
-            ridge_test_ph = self.ops['ridge_test_h']
-            while arr_offset < test_size:
-                if arr_offset + self.batch_size_ > test_size:
-                    end_offset = test_size
-                else:
-                    end_offset = arr_offset + self.batch_size_
-
-                X_test_batch = X_test[arr_offset:end_offset]
-                batch_len = end_offset - arr_offset
-
-                dists1 = np.zeros([sample_size, batch_len])
-                for i in range(sample_size):
-                    dists1[i] = sess.run(dist_op, feed_dict={v1: self.X_train[i],
-                                                             v2: X_test_batch})
-
-                sig_val = self.ops['sig_op']
-                K2_ = sess.run(K_op, feed_dict={X_dists: dists1})
-                yhat = sess.run(yhat_, feed_dict={K2: K2_, xy_ph: self.xy_})
-                dists2 = np.zeros([batch_len, batch_len])
-                for i in range(batch_len):
-                    dists2[i] = sess.run(dist_op, feed_dict={v1: X_test_batch[i], v2: X_test_batch})
-                K3_ = sess.run(K_op, feed_dict={X_dists: dists2})
-
-                sigma = np.zeros([1, batch_len], np.float32)
-                sigma[0] = sess.run(sig_val, feed_dict={K_inv_ph: self.K_inv, K2: K2_,
-                                                        K3: K3_, ridge_test_ph: ridge_test})
-                sigma = np.transpose(sigma)
-                yhats[arr_offset: end_offset] = yhat
-                sigmas[arr_offset: end_offset] = sigma
-                arr_offset = end_offset
+        for arr_offset in range(0, test_size, self.batch_size_):
+            end_offset = min(arr_offset + self.batch_size_, test_size)
+            yhat, sigma = self.sess.run([self.ops['yhat_op'], self.ops['sig_op']],
+                                        feed_dict={self.vars['X_test_h']: X_test[arr_offset:end_offset]})
+            yhats[arr_offset:end_offset] = yhat
+            sigmas[arr_offset:end_offset] = sigma.reshape(-1, 1)
         GPR.check_output(yhats)
         GPR.check_output(sigmas)
         return GPRResult(yhats, sigmas)
@@ -325,16 +251,28 @@ class GPR(object):
     def set_params(self, **parameters):
         for param, val in list(parameters.items()):
             setattr(self, param, val)
+        # The hyperparameters are built into the graph
+        if any(param in parameters for param in ('length_scale', 'magnitude', 'ridge', 'num_threads_',
+                                                 'check_numerics', 'hyperparameter_trainable')):
+            self.close()
         return self
 
+    def close(self):
+        if self.sess is not None:
+            self.sess.close()
+        self.sess = None
+        self.graph = None
+        self.vars = None
+        self.ops = None
+
     def _reset(self):
         self.X_train = None
         self.y_train = None
         self.xy_ = None
         self.K = None
         self.K_inv = None
-        self.graph = None
-        self.build_graph()
+        if self.graph is None:
+            self.build_graph()
         gc.collect()
 
 
@@ -379,51 +317,112 @@ class GPRGD(GPR):
         super(GPRGD, self).fit(X_train, y_train)
         self.X_min = X_min
         self.X_max = X_max
+        if 'X_min_v' not in self.vars:
+            with self.graph.as_default():
+                X_min_v = GPR._state_variable('X_min_v')
+                X_max_v = GPR._state_variable('X_max_v')
+                X_min_ph = tf.placeholder(tf.float32, shape=[None], name='X_min')
+                X_max_ph = tf.placeholder(tf.float32, shape=[None], name='X_max')
+                self.vars['X_min_v'] = X_min_v
+                self.vars['X_max_v'] = X_max_v
+                self.vars['X_min_h'] = X_min_ph
+                self.vars['X_max_h'] = X_max_ph
+                self.ops['bounds_op'] = tf.group(tf.assign(X_min_v, X_min_ph, validate_shape=False),
+                                                 tf.assign(X_max_v, X_max_ph, validate_shape=False))
+                self.sess.run(tf.variables_initializer([X_min_v, X_max_v]))
+                # The descent ops of every (batch size, number of features)
+                self.ops['gd'] = {}
+        nfeats = self.X_train.shape[1]
+        self.sess.run(self.ops['bounds_op'], feed_dict={
+            self.vars['X_min_h']: np.float32(np.broadcast_to(X_min, (nfeats,))),
+            self.vars['X_max_h']: np.float32(np.broadcast_to(X_max, (nfeats,)))})
+        return self
 
-        with tf.Session(graph=self.graph,
-                        config=tf.ConfigProto(
-                            intra_op_parallelism_threads=self.num_threads_)) as sess:
-            xt_ = tf.Variable(self.X_train[0], tf.float32)
-            xt_ph = tf.placeholder(tf.float32)
+    def _get_gd_ops(self, batch_len, nfeats):
+        # Descent ops moving the batch_len starting points together as one
+        # [batch_len, nfeats] variable. The loss of every point only depends
+        # on its own row, so the points descend independently. Every step also
+        # projects the points on the bounds and keeps the best (minimum loss)
+        # point seen by each row.
+        key = (batch_len, nfeats)
+        if key in self.ops['gd']:
+            return self.ops['gd'][key]
+
+        with self.graph.as_default():
+            global_vars = {v.name for v in tf.global_variables()}
+            xt_ = tf.Variable(tf.zeros([batch_len, nfeats]), dtype=tf.float32)
+            xt_ph = tf.placeholder(tf.float32, shape=[batch_len, nfeats])
             xt_assign_op = xt_.assign(xt_ph)
-            init = tf.global_variables_initializer()
-            sess.run(init)
+            best_loss = tf.Variable(tf.fill([batch_len], np.float32(np.inf)), trainable=False)
+            best_yhat = tf.Variable(tf.zeros([batch_len]), trainable=False)
+            best_sigma = tf.Variable(tf.zeros([batch_len]), trainable=False)
+            best_conf = tf.Variable(tf.zeros([batch_len, nfeats]), trainable=False)
 
             mag_var = self.vars['mag_v']
             ls_var = self.vars['ls_v']
             noise_var = self.vars['noise_v']
-            K2_mat = tf.transpose(tf.expand_dims(tf.sqrt(tf.reduce_sum(tf.pow(
-                tf.subtract(xt_, self.X_train), 2), 1)), 0))
+            X_train_v = self.vars['X_train_v']
+            # The squared distances are kept away from 0 so that their square
+            # root stays differentiable
+            X1s = tf.reduce_sum(tf.square(xt_), 1)
+            X2s = tf.reduce_sum(tf.square(X_train_v), 1)
+            K2_mat = tf.sqrt(tf.maximum(-2 * tf.matmul(xt_, X_train_v, transpose_b=True) +
+                                        tf.reshape(X1s, (-1, 1)) + tf.reshape(X2s, (1, -1)), 1e-12))
             if self.check_numerics is True:
                 K2_mat = tf.check_numerics(K2_mat, "K2_mat: ")
             K2__ = tf.cast(mag_var * tf.exp(-K2_mat / ls_var), tf.float32)  # pylint: disable=invalid-name
             if self.check_numerics is True:
                 K2__ = tf.check_numerics(K2__, "K2__: ")
-            yhat_gd = tf.cast(tf.matmul(tf.transpose(K2__), self.xy_), tf.float32)
+            yhat_gd = tf.cast(tf.squeeze(tf.matmul(K2__, self.vars['xy_v']), 1), tf.float32)
             if self.check_numerics is True:
                 yhat_gd = tf.check_numerics(yhat_gd, message="yhat: ")
-            sig_val = tf.cast((tf.sqrt(mag_var + noise_var - tf.matmul(
-                tf.transpose(K2__), tf.matmul(self.K_inv, K2__)))), tf.float32)
+            sig_val = tf.cast((tf.sqrt(mag_var + noise_var - tf.reduce_sum(
+                tf.matmul(K2__, self.vars['K_inv_v']) * K2__, 1))), tf.float32)
             if self.check_numerics is True:
                 sig_val = tf.check_numerics(sig_val, message="sigma: ")
 
-            loss = tf.squeeze(tf.subtract(self.mu_multiplier * yhat_gd,
-                                          self.sigma_multiplier * sig_val))
+            loss = tf.subtract(self.mu_multiplier * yhat_gd,
+                               self.sigma_multiplier * sig_val)
             if self.check_numerics is True:
                 loss = tf.check_numerics(loss, "loss: ")
+
+            # Keep the point with the minimum loss of every row (NaN losses
+            # are never kept)
+            better = tf.less(loss, best_loss)
+            record_op = tf.group(tf.assign(best_loss, tf.where(better, loss, best_loss)),
+                                 tf.assign(best_yhat, tf.where(better, yhat_gd, best_yhat)),
+                                 tf.assign(best_sigma, tf.where(better, sig_val, best_sigma)),
+                                 tf.assign(best_conf, tf.where(better, xt_.read_value(), best_conf)))
+
             optimizer = tf.train.AdamOptimizer(learning_rate=self.learning_rate,
                                                epsilon=self.epsilon)
             # optimizer = tf.train.GradientDescentOptimizer(learning_rate=self.learning_rate)
-            train = optimizer.minimize(loss)
-
-            self.vars['xt_'] = xt_
-            self.vars['xt_ph'] = xt_ph
-            self.ops['xt_assign_op'] = xt_assign_op
-            self.ops['yhat_gd'] = yhat_gd
-            self.ops['sig_val2'] = sig_val
-            self.ops['loss_op'] = loss
-            self.ops['train_op'] = train
-        return self
+            with tf.control_dependencies([record_op]):
+                train = optimizer.minimize(tf.reduce_sum(loss), var_list=[xt_])
+            # constraint Projected Gradient Descent
+            with tf.control_dependencies([train]):
+                step_op = xt_.assign(tf.clip_by_value(xt_.read_value(), self.vars['X_min_v'],
+                                                      self.vars['X_max_v']))
+            # Only the descent variables are reset for every batch
+            init = tf.variables_initializer([v for v in tf.global_variables() if v.name not in global_vars])
+
+        ops = {
+            'xt_': xt_,
+            'xt_ph': xt_ph,
+            'xt_assign_op': xt_assign_op,
+            'yhat_gd': yhat_gd,
+            'sig_val': sig_val,
+            'loss_op': loss,
+            'record_op': record_op,
+            'step_op': step_op,
+            'init_op': init,
+            'best_loss': best_loss,
+            'best_yhat': best_yhat,
+            'best_sigma': best_sigma,
+            'best_conf': best_conf,
+        }
+        self.ops['gd'][key] = ops
+        return ops
 
     def predict(self, X_test, constraint_helper=None,  # pylint: disable=arguments-differ
                 categorical_feature_method='hillclimbing',
@@ -432,112 +431,51 @@ class GPRGD(GPR):
         X_test = np.float32(GPR.check_array(X_test))
         test_size = X_test.shape[0]
         nfeats = self.X_train.shape[1]
+        if constraint_helper is not None and categorical_feature_method != 'hillclimbing':
+            raise Exception("Unknown categorial feature method: {}".format(
+                categorical_feature_method))
 
-        arr_offset = 0
         yhats = np.zeros([test_size, 1])
         sigmas = np.zeros([test_size, 1])
         minls = np.zeros([test_size, 1])
         minl_confs = np.zeros([test_size, nfeats])
 
-        with tf.Session(graph=self.graph,
-                        config=tf.ConfigProto(
-                            intra_op_parallelism_threads=self.num_threads_)) as sess:
-            while arr_offset < test_size:
-                if arr_offset + self.batch_size_ > test_size:
-                    end_offset = test_size
-                else:
-                    end_offset = arr_offset + self.batch_size_
-
-                X_test_batch = X_test[arr_offset:end_offset]
-                batch_len = end_offset - arr_offset
-
-                xt_ = self.vars['xt_']
-                init = tf.global_variables_initializer()
-                sess.run(init)
-
-                sig_val = self.ops['sig_val2']
-                yhat_gd = self.ops['yhat_gd']
-                loss = self.ops['loss_op']
-                train = self.ops['train_op']
-
-                xt_ph = self.vars['xt_ph']
-                assign_op = self.ops['xt_assign_op']
-
-                yhat = np.empty((batch_len, 1))
-                sigma = np.empty((batch_len, 1))
-                minl = np.empty((batch_len, 1))
-                minl_conf = np.empty((batch_len, nfeats))
-                for i in range(batch_len):
-                    if self.debug is True:
-                        logger.info("-------------------------------------------")
-                    yhats_it = np.empty((self.max_iter + 1,)) * np.nan
-                    sigmas_it = np.empty((self.max_iter + 1,)) * np.nan
-                    losses_it = np.empty((self.max_iter + 1,)) * np.nan
-                    confs_it = np.empty((self.max_iter + 1, nfeats)) * np.nan
-                    sess.run(init)
-                    sess.run(assign_op, feed_dict={xt_ph: X_test_batch[i]})
-                    step = 0
-                    for step in range(self.max_iter):
-                        if self.debug is True:
-                            logger.info("Batch %d, iter %d:" % (i, step))
-                        yhats_it[step] = sess.run(yhat_gd)[0][0]
-                        sigmas_it[step] = sess.run(sig_val)[0][0]
-                        losses_it[step] = sess.run(loss)
-                        confs_it[step] = sess.run(xt_)
-                        if self.debug is True:
-                            logger.info("    yhat:  %s" % str(yhats_it[step]))
-                            logger.info("    sigma: %s" % str(sigmas_it[step]))
-                            logger.info("    loss:  %s" % str(losses_it[step]))
-                            logger.info("    conf:  %s" % str(confs_it[step]))
-                        sess.run(train)
-                        # constraint Projected Gradient Descent
-                        xt = sess.run(xt_)
-                        xt_valid = np.minimum(xt, self.X_max)
-                        xt_valid = np.maximum(xt_valid, self.X_min)
-                        sess.run(assign_op, feed_dict={xt_ph: xt_valid})
-                        if constraint_helper is not None:
-                            xt_valid = constraint_helper.apply_constraints(sess.run(xt_))
-                            sess.run(assign_op, feed_dict={xt_ph: xt_valid})
-                            if categorical_feature_method == 'hillclimbing':
-                                if step % categorical_feature_steps == 0:
-                                    current_xt = sess.run(xt_)
-                                    current_loss = sess.run(loss)
-                                    new_xt = \
-                                        constraint_helper.randomize_categorical_features(
-                                            current_xt)
-                                    sess.run(assign_op, feed_dict={xt_ph: new_xt})
-                                    new_loss = sess.run(loss)
-                                    if current_loss < new_loss:
-                                        sess.run(assign_op, feed_dict={xt_ph: new_xt})
-                            else:
-                                raise Exception("Unknown categorial feature method: {}".format(
-                                    categorical_feature_method))
-                    if step == self.max_iter - 1:
-                        # Record results from final iteration
-                        yhats_it[-1] = sess.run(yhat_gd)[0][0]
-                        sigmas_it[-1] = sess.run(sig_val)[0][0]
-                        losses_it[-1] = sess.run(loss)
-                        confs_it[-1] = sess.run(xt_)
-                        assert np.all(np.isfinite(yhats_it))
-                        assert np.all(np.isfinite(sigmas_it))
-                        assert np.all(np.isfinite(losses_it))
-                        assert np.all(np.isfinite(confs_it))
-
-                    # Store info for conf with min loss from all iters
-                    if np.all(~np.isfinite(losses_it)):
-                        min_loss_idx = 0
-                    else:
-                        min_loss_idx = np.nanargmin(losses_it)
-                    yhat[i] = yhats_it[min_loss_idx]
-                    sigma[i] = sigmas_it[min_loss_idx]
-                    minl[i] = losses_it[min_loss_idx]
-                    minl_conf[i] = confs_it[min_loss_idx]
-
-                minls[arr_offset:end_offset] = minl
-                minl_confs[arr_offset:end_offset] = minl_conf
-                yhats[arr_offset:end_offset] = yhat
-                sigmas[arr_offset:end_offset] = sigma
-                arr_offset = end_offset
+        sess = self.sess
+        for arr_offset in range(0, test_size, self.batch_size_):
+            end_offset = min(arr_offset + self.batch_size_, test_size)
+            X_test_batch = X_test[arr_offset:end_offset]
+            batch_len = end_offset - arr_offset
+
+            ops = self._get_gd_ops(batch_len, nfeats)
+            xt_, xt_ph, assign_op = ops['xt_'], ops['xt_ph'], ops['xt_assign_op']
+            sess.run(ops['init_op'])
+            sess.run(assign_op, feed_dict={xt_ph: X_test_batch})
+            for step in range(self.max_iter):
+                if self.debug is True:
+                    # Per-step traces, only when debugging (they cost extra runs)
+                    yhat_it, sigma_it, loss_it = sess.run([ops['yhat_gd'], ops['sig_val'], ops['loss_op']])
+                    logger.info("Batch %d, iter %d:" % (arr_offset, step))
+                    logger.info("    yhat:  %s" % str(yhat_it))
+                    logger.info("    sigma: %s" % str(sigma_it))
+                    logger.info("    loss:  %s" % str(loss_it))
+                sess.run(ops['step_op'])
+                if constraint_helper is not None:
+                    xt_valid = np.array([constraint_helper.apply_constraints(xt)
+                                         for xt in sess.run(xt_)])
+                    if step % categorical_feature_steps == 0:
+                        xt_valid = np.array([constraint_helper.randomize_categorical_features(xt)
+                                             for xt in xt_valid])
+                    sess.run(assign_op, feed_dict={xt_ph: xt_valid})
+            # Record the points of the final iteration
+            sess.run(ops['record_op'])
+
+            # Store info for conf with min loss from all iters
+            minl, yhat, sigma, minl_conf = sess.run([ops['best_loss'], ops['best_yhat'],
+                                                     ops['best_sigma'], ops['best_conf']])
+            minls[arr_offset:end_offset] = minl.reshape(-1, 1)
+            yhats[arr_offset:end_offset] = yhat.reshape(-1, 1)
+            sigmas[arr_offset:end_offset] = sigma.reshape(-1, 1)
+            minl_confs[arr_offset:end_offset] = minl_conf
 
         GPR.check_output(yhats)
         GPR.check_output(sigmas)
@@ -645,18 +583,8 @@ class GPRGD(GPR):
 #        return yhats, sigmas, eips
 
 
-def euclidean_mat(X, y, sess):
-    x_n = X.shape[0]
-    y_n = y.shape[0]
-    z = np.zeros([x_n, y_n])
-    for i in range(x_n):
-        v1 = X[i]
-        tmp = []
-        for j in range(y_n):
-            v2 = y[j]
-            tmp.append(tf.sqrt(tf.reduce_sum(tf.pow(tf.subtract(v1, v2), 2))))
-        z[i] = (sess.run(tmp))
-    return z
+def euclidean_mat(X, y, sess):  # pylint: disable=unused-argument
+    return pairwise_distances(X, y)
 
 
 def gd_tf(xs, ys, xt, ridge, length_scale=1.0, magnitude=1.0, max_iter=50):
@@ -683,15 +611,7 @@ def gd_tf(xs, ys, xt, ridge, length_scale=1.0, magnitude=1.0, max_iter=50):
         sess.run(init)
 
         ridge = np.float32(ridge)
-        v1 = tf.placeholder(tf.float32, name="v1")
-        v2 = tf.placeholder(tf.float32, name="v2")
-        dist = tf.sqrt(tf.reduce_sum(tf.pow(tf.subtract(v1, v2), 2), 1))
-
-        tmp = np.zeros([sample_size, sample_size])
-        for i in range(sample_size):
-            tmp[i] = sess.run(dist, feed_dict={v1: xs[i], v2: xs})
-
-        tmp = tf.cast(tmp, tf.float32)
+        tmp = tf.cast(pairwise_distances(xs), tf.float32)
         K = magnitude * tf.exp(-tmp / length_scale) + tf.diag(ridge)
 
         K2_mat = tf.sqrt(tf.reduce_sum(tf.pow(tf.subtract(xt_, xs), 2), 1))
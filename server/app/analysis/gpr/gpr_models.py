@@ -164,6 +164,25 @@ def create_model(model_name, **kwargs):
     return _MODEL_MAP[model_name](**kwargs)
 
 
+def get_exponential_kernel_params(model_name, lengthscales=None, variance=None, **kwargs):
+    # The magnitude, length scale & ridge of the numpy GPR (analysis.gp.GPRNP,
+    # kernel magnitude * exp(-||x - y|| / length_scale)) that predicts the same
+    # means as the model built by create_model with these kwargs, without
+    # hyperparameter optimization. BasicGP is a Matern12 kernel, i.e. that
+    # exponential kernel. ExpWhiteGP is the gpflow Exponential kernel
+    # exp(-0.5 * r) with unit variance & lengthscales, plus a White kernel
+    # that adds its (unit) variance to the diagonal of the training kernel
+    # only, like a ridge. The likelihood variance (1.0) is a ridge of both.
+    check_valid(model_name)
+    if model_name == 'BasicGP':
+        return {
+            'magnitude': 1.0 if variance is None else variance,
+            'length_scale': 2.0 if lengthscales is None else lengthscales,
+            'ridge': 1.0,
+        }
+    return {'magnitude': 1.0, 'length_scale': 2.0, 'ridge': 2.0}
+
+
 def check_valid(model_name):
     if model_name not in _MODEL_MAP:
         raise ValueError('Invalid GPR model name: {}'.format(model_name))
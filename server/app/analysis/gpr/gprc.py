@@ -13,13 +13,19 @@ class GPRC(GPR):
         self.cholesky = None
         self.alpha = None
 
-    @autoflow()
-    def _compute_cache(self):
+    @params_as_tensors
+    def _build_cache(self):
+        # The cache as tensors of the model's graph, they follow the data
+        # assigned to X & Y
         K = self.kern.K(self.X) + tf.eye(tf.shape(self.X)[0], dtype=settings.float_type) * self.likelihood.variance
         L = tf.cholesky(K, name='gp_cholesky')
         V = tf.matrix_triangular_solve(L, self.Y - self.mean_function(self.X), name='gp_alpha')
         return L, V
 
+    @autoflow()
+    def _compute_cache(self):
+        return self._build_cache()
+
     def update_cache(self):
         self.cholesky, self.alpha = self._compute_cache()
 
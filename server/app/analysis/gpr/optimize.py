@@ -1,6 +1,8 @@
 import numpy as np
 import tensorflow as tf
+import threading
 from gpflow import settings
+from . import gpr_models
 from sklearn.utils import assert_all_finite, check_array
 from sklearn.utils.validation import FLOAT_DTYPES
 from loguru import logger
@@ -68,4 +70,107 @@ def tf_optimize(model, Xnew_arr, learning_rate=0.01, maxiter=100, ucb_beta=3.,
             logger.info("kernel variance: %f" % session.run(kvar))
             logger.info("kernel lengthscale: %f" % session.run(kls))
             logger.info("likelihood variance: %f" % session.run(lvar))
-        return GPRGDResult(y_mean_value, y_std_value, loss_value, Xnew_value)
\ No newline at end of file
+        return GPRGDResult(y_mean_value, y_std_value, loss_value, Xnew_value)
+
+
+class CompiledOptimizer(object):
+    # tf_optimize compiled once for a model and a number of candidates (the
+    # starting points). The model is built in a graph of its own, its training
+    # data, the starting points, the bounds, the learning rate and the UCB
+    # beta are rebound through placeholders, so one graph serves every
+    # recommendation with the same model name, input dimension & number of
+    # candidates. The model hyperparameters are not optimized. Callers hold
+    # the lock while running the optimizer (see OptimizerCache.acquire).
+
+    def __init__(self, model_name, X_dim, n_candidates, **model_kwargs):
+        self.model_name = model_name
+        self.X_dim = X_dim
+        self.n_candidates = n_candidates
+        self.lock = threading.Lock()
+        self.released = False
+        self.graph = tf.Graph()
+        self.session = tf.Session(graph=self.graph, config=tf.ConfigProto(
+            gpu_options=tf.GPUOptions(allow_growth=True)))
+        float_type = settings.float_type
+        with self.graph.as_default(), self.session.as_default():
+            # The model is built on placeholder data, fit() rebinds it
+            self.model = gpr_models.create_model(model_name, X=np.zeros((1, X_dim)), y=np.zeros((1, 1)),
+                                                 **model_kwargs).model
+            model = self.model
+            self.X_ph = tf.placeholder(float_type, shape=[None, X_dim], name='X')
+            self.y_ph = tf.placeholder(float_type, shape=[None, None], name='y')
+            self.Xnew_ph = tf.placeholder(float_type, shape=[n_candidates, X_dim], name='Xnew_init')
+            self.lower_ph = tf.placeholder(float_type, shape=[X_dim], name='lower_bound')
+            self.upper_ph = tf.placeholder(float_type, shape=[X_dim], name='upper_bound')
+            self.beta_ph = tf.placeholder(float_type, shape=[], name='ucb_beta')
+            self.learning_rate_ph = tf.placeholder(float_type, shape=[], name='learning_rate')
+
+            Xnew = tf.Variable(tf.zeros([n_candidates, X_dim], dtype=float_type), name='Xnew')
+            lower_bound = tf.Variable(tf.zeros([X_dim], dtype=float_type), trainable=False)
+            upper_bound = tf.Variable(tf.zeros([X_dim], dtype=float_type), trainable=False)
+            beta_t = tf.Variable(tf.zeros([], dtype=float_type), trainable=False, name='ucb_beta')
+            learning_rate = tf.Variable(tf.zeros([], dtype=float_type), trainable=False)
+            self.bind_op = tf.group(
+                tf.assign(model.X.parameter_tensor, self.X_ph, validate_shape=False),
+                tf.assign(model.Y.parameter_tensor, self.y_ph, validate_shape=False),
+                tf.assign(Xnew, self.Xnew_ph),
+                tf.assign(lower_bound, self.lower_ph),
+                tf.assign(upper_bound, self.upper_ph),
+                tf.assign(beta_t, self.beta_ph),
+                tf.assign(learning_rate, self.learning_rate_ph))
+
+            # The cholesky & alpha of the model follow the bound data
+            model.cholesky, model.alpha = model._build_cache()  # pylint: disable=protected-access
+            self.Xnew_bounded = tf.minimum(tf.maximum(Xnew, lower_bound), upper_bound)
+            fmean, fvar, self.kvar, self.kls, self.lvar = \
+                model._build_predict(self.Xnew_bounded)  # pylint: disable=protected-access
+            y_mean_var = model.likelihood.predict_mean_and_var(fmean, fvar)
+            self.y_mean = y_mean_var[0]
+            self.y_std = tf.sqrt(y_mean_var[1])
+            self.loss = tf.subtract(self.y_mean, tf.multiply(beta_t, self.y_std), name='loss_fn')
+            opt = tf.train.AdamOptimizer(learning_rate, epsilon=1e-6)
+            self.train_op = opt.minimize(self.loss, var_list=[Xnew])
+            # Reset for every run: the optimizer's slots & the starting points
+            self.init_op = tf.variables_initializer(opt.variables())
+            self.session.run(tf.variables_initializer([Xnew, lower_bound, upper_bound,
+                                                       beta_t, learning_rate]))
+
+    def optimize(self, X, y, Xnew_arr, learning_rate=0.01, maxiter=100, ucb_beta=3.,
+                 bounds=None, debug=True):
+        Xnew_arr = check_array(Xnew_arr, copy=False, warn_on_dtype=True, dtype=FLOAT_DTYPES)
+        if Xnew_arr.shape != (self.n_candidates, self.X_dim):
+            raise Exception("Xnew should have the shape {} ({})".format(
+                (self.n_candidates, self.X_dim), Xnew_arr.shape))
+        if bounds is None:
+            bounds = [-np.infty, np.infty]
+        feed_dict = {
+            self.X_ph: X,
+            self.y_ph: y,
+            self.Xnew_ph: Xnew_arr,
+            self.lower_ph: np.broadcast_to(bounds[0], (self.X_dim,)),
+            self.upper_ph: np.broadcast_to(bounds[1], (self.X_dim,)),
+            self.beta_ph: ucb_beta,
+            self.learning_rate_ph: learning_rate,
+        }
+        session = self.session
+        session.run(self.bind_op, feed_dict=feed_dict)
+        session.run(self.init_op)
+        for i in range(maxiter):
+            session.run(self.train_op)
+        Xnew_value, y_mean_value, y_std_value, loss_value = session.run(
+            [self.Xnew_bounded, self.y_mean, self.y_std, self.loss])
+        assert_all_finite(Xnew_value)
+        assert_all_finite(y_mean_value)
+        assert_all_finite(y_std_value)
+        assert_all_finite(loss_value)
+        if debug:
+            logger.info("kernel variance: %f" % session.run(self.kvar))
+            logger.info("kernel lengthscale: %f" % session.run(self.kls))
+            logger.info("likelihood variance: %f" % session.run(self.lvar))
+        return GPRGDResult(y_mean_value, y_std_value, loss_value, Xnew_value)
+
+    def release(self):
+        # Called by the OptimizerCache on eviction, waits for a running optimize()
+        with self.lock:
+            self.released = True
+            self.session.close()
@@ -76,18 +76,12 @@ class LassoPath(ModelBase):
 
         # Rank the features in X by order of importance. This ranking is based
         # on how early a given features enter the regression (the earlier a
-        # feature enters the regression, the MORE important it is).
-        feature_rankings = [[] for _ in range(X.shape[1])]
-        for target_coef_paths in self.coefs_:
-            for i, feature_path in enumerate(target_coef_paths):
-                entrance_step = 1
-                for val_at_step in feature_path:
-                    if val_at_step == 0:
-                        entrance_step += 1
-                    else:
-                        break
-                feature_rankings[i].append(entrance_step)
-        self.rankings_ = np.array([np.mean(ranks) for ranks in feature_rankings])
+        # feature enters the regression, the MORE important it is). The
+        # entrance step is one past the first non-zero coefficient of the path.
+        nonzero = self.coefs_ != 0
+        entrance_steps = np.where(nonzero.any(axis=2), nonzero.argmax(axis=2) + 1,
+                                  self.coefs_.shape[2] + 1)
+        self.rankings_ = entrance_steps.mean(axis=0)
         return self
 
     def get_ranked_features(self):
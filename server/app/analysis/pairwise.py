@@ -0,0 +1,156 @@
+import numpy as np
+from scipy.spatial.distance import cdist
+
+# Pairwise euclidean distances & exponential kernels computed by chunks of
+# rows. The chunks are sized so that their temporaries fit in the
+# 'working_memory' (MiB) of analysis.dc.config, which can be changed for a
+# block of code with config_context(working_memory=...).
+
+def get_chunk_n_rows(row_bytes, max_n_rows=None, working_memory=None):
+    """
+    Calculate the number of rows that fit in the working memory
+    Parameters:
+    -----------
+    row_bytes: int
+        The memory used by the temporaries of each row
+    max_n_rows: int, default=None
+        The maximum number of rows to return
+    working_memory: int, default=None
+        The memory budget (MiB), defaults to the working_memory setting
+    Returns
+    --------
+    chunk_n_rows: int
+        The number of rows per chunk, at least 1
+    """
+    if working_memory is None:
+        # Imported here, the dc package uses this module itself
+        from .dc.config import get_config
+        working_memory = get_config()['working_memory']
+    chunk_n_rows = int(working_memory * (2 ** 20) // max(1, row_bytes))
+    if max_n_rows is not None:
+        chunk_n_rows = min(chunk_n_rows, max_n_rows)
+    return max(1, chunk_n_rows)
+
+def gen_row_chunks(n_rows, row_bytes, working_memory=None):
+    """
+    Generate the slices of the chunks of rows
+    Parameters:
+    -----------
+    n_rows: int
+        The number of rows to split
+    row_bytes: int
+        The memory used by the temporaries of each row
+    working_memory: int, default=None
+        The memory budget (MiB), defaults to the working_memory setting
+    Returns
+    --------
+    slices: generator of slice
+        The rows of every chunk
+    """
+    chunk_n_rows = get_chunk_n_rows(row_bytes, n_rows, working_memory)
+    for start in range(0, n_rows, chunk_n_rows):
+        yield slice(start, min(start + chunk_n_rows, n_rows))
+
+def pairwise_distances_chunked(X, Y=None, working_memory=None):
+    """
+    Generate the euclidean distances between X and Y by chunks of rows of X
+    Parameters:
+    -----------
+    X: ndarray of shape (n_samples_X, n_features)
+    Y: ndarray of shape (n_samples_Y, n_features), default=None
+        Defaults to X
+    working_memory: int, default=None
+        The memory budget (MiB), defaults to the working_memory setting
+    Returns
+    --------
+    chunks: generator of (slice, ndarray of shape (chunk_size, n_samples_Y))
+        The rows of X and their distances to Y
+    """
+    if Y is None:
+        Y = X
+    for rows in gen_row_chunks(X.shape[0], 8 * Y.shape[0], working_memory):
+        yield rows, cdist(X[rows], Y)
+
+def pairwise_distances(X, Y=None, working_memory=None):
+    """
+    Calculate the euclidean distances between X and Y
+    Parameters:
+    -----------
+    X: ndarray of shape (n_samples_X, n_features)
+    Y: ndarray of shape (n_samples_Y, n_features), default=None
+        Defaults to X
+    working_memory: int, default=None
+        The memory budget (MiB), defaults to the working_memory setting
+    Returns
+    --------
+    distance: ndarray of shape (n_samples_X, n_samples_Y)
+        The distance matrix
+    """
+    n_samples_Y = X.shape[0] if Y is None else Y.shape[0]
+    distance = np.empty((X.shape[0], n_samples_Y))
+    for rows, chunk in pairwise_distances_chunked(X, Y, working_memory):
+        distance[rows] = chunk
+    return distance
+
+def pairwise_distances_argmin(X, Y, working_memory=None):
+    """
+    Find the closest row of Y for every row of X, without building the
+    distance matrix
+    Parameters:
+    -----------
+    X: ndarray of shape (n_samples_X, n_features)
+    Y: ndarray of shape (n_samples_Y, n_features)
+    working_memory: int, default=None
+        The memory budget (MiB), defaults to the working_memory setting
+    Returns
+    --------
+    indices: ndarray of shape (n_samples_X, )
+        The index of the closest row of Y
+    """
+    indices = np.empty(X.shape[0], dtype=np.intp)
+    for rows, chunk in pairwise_distances_chunked(X, Y, working_memory):
+        indices[rows] = np.argmin(chunk, axis=1)
+    return indices
+
+def exponential_kernel(X, Y=None, magnitude=1.0, length_scale=1.0, working_memory=None):
+    """
+    Calculate the kernel magnitude * exp(-||x - y|| / length_scale) of the
+    GP models between X and Y
+    Parameters:
+    -----------
+    X: ndarray of shape (n_samples_X, n_features)
+    Y: ndarray of shape (n_samples_Y, n_features), default=None
+        Defaults to X
+    magnitude: float
+    length_scale: float
+    working_memory: int, default=None
+        The memory budget (MiB), defaults to the working_memory setting
+    Returns
+    --------
+    K: ndarray of shape (n_samples_X, n_samples_Y)
+        The kernel matrix
+    """
+    n_samples_Y = X.shape[0] if Y is None else Y.shape[0]
+    K = np.empty((X.shape[0], n_samples_Y))
+    for rows, chunk in pairwise_distances_chunked(X, Y, working_memory):
+        chunk /= -length_scale
+        np.exp(chunk, out=chunk)
+        chunk *= magnitude
+        K[rows] = chunk
+    return K
+
+def exponential_kernel_diag(X, magnitude=1.0):
+    """
+    Calculate the diagonal of exponential_kernel(X, X), i.e. the prior
+    variances of the samples, without building the kernel matrix
+    Parameters:
+    -----------
+    X: ndarray of shape (n_samples, n_features)
+    magnitude: float
+    Returns
+    --------
+    diag: ndarray of shape (n_samples, )
+        The diagonal of the kernel matrix
+    """
+    # The distance of every sample to itself is 0
+    return np.full(X.shape[0], magnitude, dtype=np.float64)
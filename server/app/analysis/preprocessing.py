@@ -43,35 +43,15 @@ class Bin(Preprocess):
         self.axis_ = axis
 
     def fit(self, matrix):
-        if self.axis_ is None:
-            self.deciles_ = get_deciles(matrix, self.axis_)
-        elif self.axis_ == 0:  # Bin columns
-            self.deciles_ = []
-            for col in matrix.T:
-                self.deciles_.append(get_deciles(col, axis=None))
-        elif self.axis_ == 1:  # Bin rows
-            self.deciles_ = []
-            for row in matrix:
-                self.deciles_.append(get_deciles(row, axis=None))
+        # deciles_ is (10,) for axis=None, otherwise (10, n_columns) for
+        # axis=0 and (10, n_rows) for axis=1
+        self.deciles_ = get_deciles(matrix, self.axis_)
         return self
 
     def transform(self, matrix, copy=True):
         assert self.deciles_ is not None
-        if self.axis_ is None:
-            res = bin_by_decile(matrix, self.deciles_,
-                                self.bin_start_, self.axis_)
-        elif self.axis_ == 0:  # Transform columns
-            columns = []
-            for col, decile in zip(matrix.T, self.deciles_):
-                columns.append(bin_by_decile(col, decile,
-                                             self.bin_start_, axis=None))
-            res = np.vstack(columns).T
-        elif self.axis_ == 1:  # Transform rows
-            rows = []
-            for row, decile in zip(matrix, self.deciles_):
-                rows.append(bin_by_decile(row, decile,
-                                          self.bin_start_, axis=None))
-            res = np.vstack(rows)
+        res = bin_by_decile(matrix, self.deciles_,
+                            self.bin_start_, self.axis_)
         assert res.shape == matrix.shape
         return res
 
@@ -80,9 +60,6 @@ class Bin(Preprocess):
 
 
 def get_deciles(matrix, axis=None):
-    if axis is not None:
-        raise NotImplementedError("Axis is not yet implemented")
-
     assert matrix.ndim > 0
     assert matrix.size > 0
 
@@ -93,19 +70,25 @@ def get_deciles(matrix, axis=None):
 
 
 def bin_by_decile(matrix, deciles, bin_start, axis=None):
-    if axis is not None:
-        raise NotImplementedError("Axis is not yet implemented")
-
+    # Each value goes to the first decile it does not exceed, i.e. its bin
+    # is bin_start plus the number of deciles it is not below or equal to (a
+    # searchsorted along the deciles of its column/row, NaN deciles are never
+    # matched). NaN values are binned as 0. The bins only need a small
+    # integer type.
     assert matrix.ndim > 0
     assert matrix.size > 0
     assert deciles is not None
     assert len(deciles) == 10
 
-    binned_matrix = np.zeros_like(matrix)
-    for i in range(10)[::-1]:
-        decile = deciles[i]
-        binned_matrix[matrix <= decile] = i + bin_start
-
+    matrix = np.asarray(matrix)
+    dtype = np.uint8 if 0 <= bin_start <= 255 - 9 else np.int64
+    binned_matrix = np.zeros(matrix.shape, dtype=dtype)
+    for decile in deciles[:-1]:
+        if axis == 1:
+            decile = decile[:, np.newaxis]
+        binned_matrix += ~(matrix <= decile)
+    binned_matrix += dtype(bin_start)
+    binned_matrix[np.isnan(matrix)] = 0
     return binned_matrix
 
 
@@ -234,8 +234,11 @@ def gpr(env, config, n_loops=100):
                       hyperparameter_trainable=True)
 
         actions, rewards = memory.get_all()
-        model.fit(np.array(actions), -np.array(rewards), X_min, X_max)
-        res = model.predict(X_samples)
+        try:
+            model.fit(np.array(actions), -np.array(rewards), X_min, X_max)
+            res = model.predict(X_samples)
+        finally:
+            model.close()
         best_config_idx = np.argmin(res.minl.ravel())
         best_config = res.minl_conf[best_config_idx, :]
         reward, _ = env.simulate(best_config)
@@ -0,0 +1,50 @@
+import unittest
+import numpy as np
+from app.analysis.gp import GPRNP
+
+
+class TestGPRNPPartialFit(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.X = rng.rand(30, 4)
+        self.y = rng.rand(30, 2)
+        self.X_test = rng.rand(7, 4)
+
+    def test_partial_fit_matches_fit(self):
+        model = GPRNP().fit(self.X[:20], self.y[:20], ridge=1.0)
+        model.partial_fit(self.X[20:], self.y[20:])
+        full = GPRNP().fit(self.X, self.y, ridge=1.0)
+        np.testing.assert_allclose(model.L, full.L, rtol=1e-6, atol=1e-8)
+        np.testing.assert_allclose(model.alpha, full.alpha, rtol=1e-5, atol=1e-8)
+        res, full_res = model.predict(self.X_test), full.predict(self.X_test)
+        np.testing.assert_allclose(res.ypreds, full_res.ypreds, rtol=1e-5, atol=1e-8)
+        np.testing.assert_allclose(res.sigmas, full_res.sigmas, rtol=1e-5, atol=1e-8)
+
+    def test_partial_fit_per_sample_ridge(self):
+        # The new samples get another ridge, the noise term of the predicted
+        # variances stays the scalar ridge of fit
+        model = GPRNP().fit(self.X[:20], self.y[:20], ridge=1.0)
+        model.partial_fit(self.X[20:], self.y[20:], ridge=2.0)
+        ridge = np.concatenate([np.ones(20), np.ones(10) * 2.0])
+        full = GPRNP().fit(self.X, self.y, ridge=ridge)
+        res = model.predict(self.X_test)
+        self.assertEqual(res.ypreds.shape, (7, 2))
+        self.assertEqual(res.sigmas.shape, (7, 2))
+        self.assertEqual(model.ridge, 1.0)
+        np.testing.assert_allclose(model.L, full.L, rtol=1e-6, atol=1e-8)
+        np.testing.assert_allclose(res.ypreds, full.predict(self.X_test).ypreds, rtol=1e-5, atol=1e-8)
+
+    def test_partial_fit_y_columns_mismatch(self):
+        model = GPRNP().fit(self.X[:20], self.y[:20])
+        with self.assertRaises(Exception):
+            model.partial_fit(self.X[20:], self.y[20:, :1])
+
+    def test_partial_fit_unfitted(self):
+        model = GPRNP().partial_fit(self.X, self.y)
+        full = GPRNP().fit(self.X, self.y)
+        np.testing.assert_allclose(model.alpha, full.alpha)
+
+
+if __name__ == '__main__':
+    unittest.main()
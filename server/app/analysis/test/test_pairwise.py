@@ -0,0 +1,53 @@
+import unittest
+import numpy as np
+from scipy.spatial.distance import cdist
+from app.analysis.dc.config import config_context
+from app.analysis.pairwise import (pairwise_distances, pairwise_distances_chunked, pairwise_distances_argmin,
+                                   exponential_kernel, exponential_kernel_diag)
+
+# About 1 KiB of working memory, the distances are computed by chunks of a few rows
+SMALL_WORKING_MEMORY = 0.001
+
+
+class TestPairwise(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.X = rng.rand(50, 3)
+        self.Y = rng.rand(40, 3)
+
+    def test_chunks_cover_rows(self):
+        with config_context(working_memory=SMALL_WORKING_MEMORY):
+            chunks = list(pairwise_distances_chunked(self.X, self.Y))
+        self.assertGreater(len(chunks), 1)
+        rows = np.concatenate([np.arange(self.X.shape[0])[rows] for rows, _ in chunks])
+        np.testing.assert_array_equal(rows, np.arange(self.X.shape[0]))
+
+    def test_pairwise_distances_chunked_matches_full(self):
+        expected = cdist(self.X, self.Y)
+        np.testing.assert_allclose(pairwise_distances(self.X, self.Y), expected)
+        np.testing.assert_allclose(pairwise_distances(self.X, self.Y, working_memory=SMALL_WORKING_MEMORY),
+                                   expected)
+        with config_context(working_memory=SMALL_WORKING_MEMORY):
+            np.testing.assert_allclose(pairwise_distances(self.X, self.Y), expected)
+            np.testing.assert_allclose(pairwise_distances(self.X), cdist(self.X, self.X))
+
+    def test_pairwise_distances_argmin(self):
+        expected = np.argmin(cdist(self.X, self.Y), axis=1)
+        np.testing.assert_array_equal(pairwise_distances_argmin(self.X, self.Y), expected)
+        with config_context(working_memory=SMALL_WORKING_MEMORY):
+            np.testing.assert_array_equal(pairwise_distances_argmin(self.X, self.Y), expected)
+
+    def test_exponential_kernel(self):
+        magnitude, length_scale = 2.0, 0.5
+        expected = magnitude * np.exp(-cdist(self.X, self.Y) / length_scale)
+        with config_context(working_memory=SMALL_WORKING_MEMORY):
+            K = exponential_kernel(self.X, self.Y, magnitude=magnitude, length_scale=length_scale)
+            K_X = exponential_kernel(self.X, magnitude=magnitude, length_scale=length_scale)
+        np.testing.assert_allclose(K, expected)
+        np.testing.assert_allclose(K_X, magnitude * np.exp(-cdist(self.X, self.X) / length_scale))
+        np.testing.assert_allclose(exponential_kernel_diag(self.X, magnitude=magnitude), np.diag(K_X))
+
+
+if __name__ == '__main__':
+    unittest.main()
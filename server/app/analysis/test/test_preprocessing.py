@@ -0,0 +1,74 @@
+import unittest
+import numpy as np
+from app.analysis.preprocessing import Bin
+
+
+def percentile_deciles(vector):
+    deciles = np.percentile(vector, np.arange(10, 101, 10))
+    deciles[-1] = np.inf
+    return deciles
+
+
+def bin_vector(vector, deciles, bin_start):
+    # The former binning of a single column/row
+    binned = np.zeros_like(vector)
+    for i in range(10)[::-1]:
+        binned[vector <= deciles[i]] = i + bin_start
+    return binned
+
+
+def bin_matrix(fit_matrix, matrix, bin_start, axis):
+    # The former Bin, fitted and applied column by column or row by row
+    if axis is None:
+        return bin_vector(matrix, percentile_deciles(fit_matrix), bin_start)
+    if axis == 0:
+        return np.vstack([bin_vector(col, percentile_deciles(fit_col), bin_start)
+                          for col, fit_col in zip(matrix.T, fit_matrix.T)]).T
+    return np.vstack([bin_vector(row, percentile_deciles(fit_row), bin_start)
+                      for row, fit_row in zip(matrix, fit_matrix)])
+
+
+class TestBin(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.matrix = rng.randn(40, 6)
+        # integer values, many of them equal to a decile
+        self.ties = rng.randint(0, 4, size=(40, 6)).astype(np.float64)
+        self.other = rng.randn(40, 6) * 3
+
+    def check(self, fit_matrix, matrix, bin_start, axis):
+        binner = Bin(bin_start=bin_start, axis=axis).fit(fit_matrix)
+        expected = bin_matrix(fit_matrix, matrix, bin_start, axis)
+        res = binner.transform(matrix)
+        self.assertEqual(res.shape, matrix.shape)
+        np.testing.assert_array_equal(res, expected)
+
+    def test_bin_matches_per_column_binning(self):
+        for axis in (None, 0, 1):
+            for bin_start in (0, 1):
+                self.check(self.matrix, self.matrix, bin_start, axis)
+                self.check(self.ties, self.ties, bin_start, axis)
+                # values out of the fitted range
+                self.check(self.matrix, self.other, bin_start, axis)
+
+    def test_bin_large_bin_start(self):
+        binner = Bin(bin_start=1000, axis=0).fit(self.matrix)
+        res = binner.transform(self.matrix)
+        np.testing.assert_array_equal(res, bin_matrix(self.matrix, self.matrix, 1000, 0))
+        self.assertEqual(res.max(), 1009)
+
+    def test_bin_nan(self):
+        matrix = self.other.copy()
+        matrix[3, 2] = np.nan
+        res = Bin(bin_start=1, axis=0).fit(self.matrix).transform(matrix)
+        np.testing.assert_array_equal(res, bin_matrix(self.matrix, matrix, 1, 0))
+        self.assertEqual(res[3, 2], 0)
+
+    def test_bin_axis(self):
+        with self.assertRaises(NotImplementedError):
+            Bin(bin_start=1, axis=2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -3,6 +3,44 @@ NUM_LHS_SAMPLES = 10
 MIN_WORKLOAD_RESULTS_COUNT = 5
 KNOB_IDENT_USE_PRUNED_METRICS = False
 ENABLE_DUMMY_ENCODER = False
+LONG_POLL_DEFAULT_TIMEOUT = 60
+LONG_POLL_MAX_TIMEOUT = 300
+COMPLETION_REGISTRY_SIZE = 1024
+METRIC_LAYOUT_REGISTRY_SIZE = 256
+# how the knob & metric data of new results are stored, 'json' or 'vector' (ResultStorageType).
+# 'vector' needs the label_set table and the label_set_id, knob_vector & metric_vector columns
+# of the result table, which db.create_all() does not add to an existing database
+# (see server/migrations/001_result_vectors.sql).
+RESULT_STORAGE_MODE = 'json'
+RESULT_VECTOR_COMPRESSION = False
+TRAINING_MATRIX_CACHE_SIZE = 64
+# the pruned metrics & ranked knobs of a workload are recomputed once the new results
+# make up at least this fraction of all its results
+PIPELINE_RECOMPUTE_FRACTION = 0.1
+# number of worker processes of the periodic pipeline, 1 processes the workloads one by one
+PIPELINE_NUM_WORKERS = 1
+# number of jobs fitting the KMeans models (cluster sizes fitted at a time) and the gap statistic
+# reference datasets of workload characterization, -1 uses all the processors. Keep it at 1
+# when the pipeline already runs several worker processes.
+KMEANS_NUM_JOBS = 1
+# solver of the factor analysis of workload characterization, one of 'fa', 'randomized' or
+# 'incremental' (rows processed in chunks of FACTOR_ANALYSIS_BATCH_SIZE)
+FACTOR_ANALYSIS_SOLVER = 'fa'
+FACTOR_ANALYSIS_BATCH_SIZE = 1000
+# memory budget (bytes) of the fitted workload mapping models kept between recommendations
+WORKLOAD_MODEL_CACHE_BYTES = 512 * 1024 ** 2
+# only the sessions with a result in the last MAPPING_WARM_SESSION_AGE seconds get their workload
+# mapping models fitted at the end of the background tasks
+MAPPING_WARM_SESSION_AGE = 24 * 3600
+# workload mapping only scores the workloads of the clusters (of workload fingerprints) nearest
+# to the target, systems with fewer workloads than WORKLOAD_CLUSTERING_MIN_WORKLOADS are not clustered
+MAPPING_CANDIDATE_CLUSTERS = 1
+WORKLOAD_CLUSTERING_MIN_WORKLOADS = 5
+# number of compiled gpflow acquisition optimizers kept between recommendations, they are
+# keyed by (model name, input dimension, number of candidates)
+GPR_OPTIMIZER_CACHE_SIZE = 8
+# number of worker processes scoring the workloads in workload mapping, 1 scores them one by one
+MAPPING_NUM_WORKERS = 1
 DEFAULT_CONVERSION = '''{
         "BYTES_SYSTEM": {
             "PiB": "1024 ** 5",
@@ -60,6 +98,7 @@ DEFAULT_HYPER_PARAMETERS = '''{
         "GPR_UCB_BETA": "get_beta_td",
         "IMPORTANT_KNOB_NUMBER": 10000,
         "INIT_FLIP_PROB": 0.3,
+        "MAPPING_DEADLINE": 0,
         "NUM_SAMPLES": 30,
         "TF_NUM_THREADS": 4,
         "TOP_NUM_CONFIG": 10}'''
@@ -56,12 +56,24 @@ class SessionKnob(db.Model):
     session_id = db.Column(db.Integer, db.ForeignKey("session.id"))
     knob_id = db.Column(db.Integer, db.ForeignKey("knob_catalog.id"))
 
+class LabelSet(db.Model):
+    __tablename__ = "label_set"
+    id = db.Column(db.Integer, primary_key=True, autoincrement=True)
+    digest = db.Column(db.String(64), nullable=False, index=True)
+    knob_labels = db.Column(db.Text, nullable=False)
+    metric_labels = db.Column(db.Text, nullable=False)
+    creation_time = db.Column(db.DateTime, default=datetime.now)
+    system_id = db.Column(db.Integer, db.ForeignKey("system_catalog.id"))
+
 class Result(db.Model):
     __tablename__ = "result"
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     creation_time = db.Column(db.DateTime, default=datetime.now)
     knob_data = db.Column(db.Text, nullable=True)
     metric_data = db.Column(db.Text, nullable=True)
+    knob_vector = db.Column(db.LargeBinary(length=2 ** 24), nullable=True)
+    metric_vector = db.Column(db.LargeBinary(length=2 ** 24), nullable=True)
+    label_set_id = db.Column(db.Integer, db.ForeignKey("label_set.id"), nullable=True)
     observation_start_time = db.Column(db.DateTime)
     observation_end_time = db.Column(db.DateTime)
     observation_time = db.Column(db.Float)
@@ -87,6 +99,7 @@ class PipelineData(db.Model):
     id = db.Column(db.Integer, primary_key=True, autoincrement=True)
     task_type = db.Column(db.String(32), nullable=False)
     data = db.Column(db.Text, nullable=True)
+    artifact = db.Column(db.String(255), nullable=True)
     creation_time = db.Column(db.DateTime, default=datetime.now)
     workload_id = db.Column(db.Integer, db.ForeignKey("workload.id"))
     pipeline_run_id = db.Column(db.Integer, db.ForeignKey("pipeline_run.id"))
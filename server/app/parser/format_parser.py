@@ -1,5 +1,4 @@
 from .parser import Parser
-from app.models import KnobCatalog
 from app.types import VarType
 from collections import OrderedDict
 
@@ -10,11 +9,7 @@ class FormatParser(Parser):
     def format_system_knobs(self, knobs):
         formatted_knobs = {}
         for knob_name, knob_value in list(knobs.items()):
-            filters = {
-                KnobCatalog.system_id == self.system_id,
-                KnobCatalog.name == knob_name
-            }
-            metadata = KnobCatalog.query.filter(*filters).first()
+            metadata = self.catalog.knob_by_name[knob_name]
             fvalue = None
             if metadata.var_type == VarType.ENUM.value:
                 fvalue = self.format_enum(knob_value, metadata)
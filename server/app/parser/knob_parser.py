@@ -1,4 +1,3 @@
-from app.models import KnobCatalog
 from .parser import Parser
 from app.types import VarType
 
@@ -11,8 +10,8 @@ class KnobParser(Parser):
         for key in valid_knobs.keys():
             assert len(valid_knobs[key]) == 1
             valid_knobs[key] = valid_knobs[key][0]
-        knob_catalog = {knob.name: knob for knob in KnobCatalog.query.filter(KnobCatalog.system_id == self.system_id)}
-        return self.extract_valid_variables(valid_knobs, knob_catalog)
+        return self.extract_valid_variables(valid_knobs, self.catalog.knob_by_name,
+                                            lc_catalog=self.catalog.lc_knob_by_name)
     
     def check_knob_value_in_range(self, value, metadata):
         if metadata.min_val is None or metadata.max_val is None:
@@ -21,41 +20,66 @@ class KnobParser(Parser):
         max_val = float(metadata.max_val)
         return min_val <= float(value) <= max_val
 
+    def check_integer_knob(self, conv_value, metadata):
+        if not self.check_knob_value_in_range(conv_value, metadata):
+            raise Exception("Knob '%s' integer value not in range, min: %s, max: %s, "
+                            "actual: %s" % (metadata.name, metadata.min_val, metadata.max_val, str(conv_value)))
+
+    def convert_system_knob(self, value, metadata):
+        name = metadata.name
+        conv_value = None
+
+        if metadata.var_type == VarType.ENUM.value:
+            conv_value = self.convert_enum(value, metadata)
+        elif metadata.var_type == VarType.INTEGER.value:
+            conv_value = self.convert_integer(value, metadata)
+            self.check_integer_knob(conv_value, metadata)
+        elif metadata.var_type == VarType.REAL.value:
+            conv_value = self.convert_real(value, metadata)
+            if not self.check_knob_value_in_range(conv_value, metadata):
+                raise Exception("Knob '%s' real value not in range, min: %s, max: %s, "
+                                "actual: %s" % (name, metadata.min_val, metadata.max_val, str(conv_value)))
+        elif metadata.var_type == VarType.STRING.value or metadata.var_type == VarType.TIMESTAMP.value:
+            conv_value = value
+        else:
+            raise Exception('Unknown variable type: %s' % metadata.var_type)
+
+        if conv_value is None:
+            raise Exception("Param value for '%s' cannot be null" % name)
+        return conv_value
+
     def convert_system_knobs(self, knobs, knob_catalog=None):
         knob_data = {}
         if knob_catalog is None:
-            filters = {
-                KnobCatalog.system_id == self.system_id,
-                KnobCatalog.tunable == True
-            }
-            knob_catalog = KnobCatalog.query().filter(*filters).all()
+            knob_catalog = self.catalog.tunable_knobs
         
         for metadata in knob_catalog:
             name = metadata.name
             if name not in knobs:
                 continue
-            value = knobs[name]
-            conv_value = None
-
-            if metadata.var_type == VarType.ENUM.value:
-                conv_value = self.convert_enum(value, metadata)
-            elif metadata.var_type == VarType.INTEGER.value:
-                conv_value = self.convert_integer(value, metadata)
-                if not self.check_knob_value_in_range(conv_value, metadata):
-                    raise Exception("Knob '%s' integer value not in range, min: %s, max: %s, "
-                                    "actual: %s" % (name, metadata.min_val, metadata.max_val, str(conv_value)))
-            elif metadata.var_type == VarType.REAL.value:
-                conv_value = self.convert_real(value, metadata)
-                if not self.check_knob_value_in_range(conv_value, metadata):
-                    raise Exception("Knob '%s' real value not in range, min: %s, max: %s, "
-                                    "actual: %s" % (name, metadata.min_val, metadata.max_val, str(conv_value)))
-            elif metadata.var_type == VarType.STRING.value or metadata.var_type == VarType.TIMESTAMP.value:
-                conv_value = value
-            else:
-                raise Exception('Unknown variable type: %s' % metadata.var_type)
-
-            if conv_value is None:
-                raise Exception("Param value for '%s' cannot be null" % name)
-            knob_data[name] = conv_value
+            knob_data[name] = self.convert_system_knob(knobs[name], metadata)
 
         return knob_data
+
+    def convert_system_knobs_batch(self, knobs_list, knob_catalog=None):
+        # Column-wise variant of convert_system_knobs for a batch of observations,
+        # the integer knobs are converted one column at a time
+        knob_data_list = [{} for _ in knobs_list]
+        if knob_catalog is None:
+            knob_catalog = self.catalog.tunable_knobs
+
+        for metadata in knob_catalog:
+            name = metadata.name
+            rows = [i for i, knobs in enumerate(knobs_list) if name in knobs]
+            if len(rows) == 0:
+                continue
+            if metadata.var_type == VarType.INTEGER.value:
+                column = self.convert_integer_column([knobs_list[i][name] for i in rows], metadata)
+                for i, conv_value in zip(rows, column):
+                    self.check_integer_knob(conv_value, metadata)
+                    knob_data_list[i][name] = conv_value
+            else:
+                for i in rows:
+                    knob_data_list[i][name] = self.convert_system_knob(knobs_list[i][name], metadata)
+
+        return knob_data_list
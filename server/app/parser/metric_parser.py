@@ -1,5 +1,4 @@
 from .parser import Parser
-from app.models import MetricCatalog
 from app.types import VarType, MetricType
 
 class MetricParser(Parser):
@@ -11,13 +10,13 @@ class MetricParser(Parser):
         for key in valid_metrics.keys():
             assert len(valid_metrics[key]) == 1
             valid_metrics[key] = valid_metrics[key][0]
-        metric_catalog = {metric.name: metric for metric in MetricCatalog.query.filter(MetricCatalog.system_id == self.system_id)}
-        return self.extract_valid_variables(valid_metrics, metric_catalog, default_value='0')
+        return self.extract_valid_variables(valid_metrics, self.catalog.metric_by_name, default_value='0',
+                                            lc_catalog=self.catalog.lc_metric_by_name)
 
     def calculate_change_in_metrics(self, metrics_start, metrics_end):
         adjusted_metrics = {}
 
-        metric_catalog = {metric.name : metric for metric in MetricCatalog.query.filter(MetricCatalog.system_id == self.system_id)}
+        metric_catalog = self.catalog.metric_by_name
         for metric_name, start_val in metrics_start.items():
             end_val = metrics_end[metric_name]
             metric = metric_catalog[metric_name]
@@ -40,13 +39,7 @@ class MetricParser(Parser):
 
     def convert_system_metrics(self, metrics, target_objective):
         numeric_metrics = {}
-        filters = {
-            MetricCatalog.metric_type != MetricType.INFO.value,
-            MetricCatalog.system_id == self.system_id
-        }
-        numeric_metric_catalog = MetricCatalog.query.filter(*filters).all()
-
-        for metric in numeric_metric_catalog:
+        for metric in self.catalog.numeric_metrics:
             name = metric.name
             value = metrics[name]
 
@@ -5,8 +5,11 @@ from app.models import *
 class Parser:
     def __init__(self, system_id):
         self.system_id = system_id
-        self.conversion_system = json.loads(
-            SystemCatalog.query.filter(SystemCatalog.id == self.system_id).first().conversion)
+        self.catalog = CatalogCache.get(system_id)
+        if self.catalog is None:
+            raise Exception("SystemCatalog cannot find system_id: {}".format(system_id))
+        self.conversion_system = self.catalog.conversion
+        self.compiled_conversion = self.catalog.compiled_conversion
 
     def parse_system_variables(self, variables):
         valid_variables = {}
@@ -23,9 +26,10 @@ class Parser:
                 raise Exception('Unsupported variable scope: %s' % scope)
         return valid_variables
 
-    def extract_valid_variables(self, variables, catalog, default_value=None):
+    def extract_valid_variables(self, variables, catalog, default_value=None, lc_catalog=None):
         valid_variables = {}
-        lc_catalog = {k.lower(): v for k, v in catalog.items()}
+        if lc_catalog is None:
+            lc_catalog = {k.lower(): v for k, v in catalog.items()}
 
         for var_name, var_value in variables.items():
             if var_name in catalog:
@@ -66,11 +70,9 @@ class Parser:
                 converted = int(float(int_value))
         except ValueError:
             if metadata.unit == UnitType.BYTES.value:
-                converted = Conversion.get_raw_size(
-                    int_value, self.conversion_system['BYTES_SYSTEM'])
+                converted = self.compiled_conversion.bytes_system.get_raw_size(int_value)
             elif metadata.unit == UnitType.MILLISECONDS.value:
-                converted = Conversion.get_raw_size(
-                    int_value, self.conversion_system['TIME_SYSTEM'])
+                converted = self.compiled_conversion.time_system.get_raw_size(int_value)
             else:
                 converted = None
         if converted is None:
@@ -79,6 +81,40 @@ class Parser:
         
         return converted
 
+    def convert_integer_column(self, int_values, metadata):
+        # Same as convert_integer for all values of one knob, the values with
+        # a unit suffix are handed to the unit system in a single call
+        converted = [None] * len(int_values)
+        pending = []
+        for i, int_value in enumerate(int_values):
+            if str(int_value) == 'null' or len(str(int_value)) == 0:
+                converted[i] = 0
+                continue
+            try:
+                try:
+                    converted[i] = int(int_value)
+                except ValueError:
+                    converted[i] = int(float(int_value))
+            except ValueError:
+                pending.append(i)
+
+        if len(pending) > 0:
+            if metadata.unit == UnitType.BYTES.value:
+                unit_system = self.compiled_conversion.bytes_system
+            elif metadata.unit == UnitType.MILLISECONDS.value:
+                unit_system = self.compiled_conversion.time_system
+            else:
+                unit_system = None
+            raw_sizes = unit_system.get_raw_sizes([int_values[i] for i in pending]) \
+                if unit_system is not None else [None] * len(pending)
+            for i, raw_size in zip(pending, raw_sizes):
+                if raw_size is None:
+                    raise Exception('Cannot convert knob {} from {} to integer'.format(
+                        metadata.name, int_values[i]))
+                converted[i] = raw_size
+
+        return converted
+
     def convert_real(self, real_value, metadata):
         try:
             return float(real_value)
@@ -96,11 +132,11 @@ class Parser:
         int_value = int(round(int_value))
         if metadata.unit != UnitType.OTHER.value and int_value > 0:
             if metadata.unit == UnitType.BYTES.value:
-                int_value = Conversion.get_human_readable(
-                    int_value, self.conversion_system['BYTES_SYSTEM'], self.conversion_system['MIN_BYTES_UNIT'])
+                int_value = self.compiled_conversion.bytes_system.get_human_readable(
+                    int_value, self.compiled_conversion.min_bytes_unit)
             elif metadata.unit == UnitType.MILLISECONDS.value:
-                int_value = Conversion.get_human_readable(
-                    int_value, self.conversion_system['TIME_SYSTEM'], self.conversion_system['MIN_TIME_UNIT'])
+                int_value = self.compiled_conversion.time_system.get_human_readable(
+                    int_value, self.compiled_conversion.min_time_unit)
             else:
                 raise Exception(
                     'Invalid unit type for {}: {}'.format(
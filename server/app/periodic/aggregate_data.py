@@ -1,15 +1,65 @@
 from loguru import logger
 import time, copy
 from app.utils import *
+from app.models import Result
+from app.types import PipelineTaskType
+import numpy as np
 
-def aggregate_data(wkld_results):
+def _aggregate_results(wkld_results):
+    workload_id = wkld_results[0].workload_id
+    session_ids = sorted({result.session_id for result in wkld_results})
+    aggregated_data = TrainingMatrixStore.get_workload(workload_id, session_ids)
+    if aggregated_data is None or aggregated_data['rowlabels'] != sorted(r.id for r in wkld_results):
+        # the sessions disagree on the columns (or the results changed meanwhile)
+        result_ids = [result.id for result in wkld_results]
+        aggregated_data = DataProcess.aggregate_data(
+            Result.query.filter(Result.id.in_(result_ids)).order_by(Result.id).all())
+    return aggregated_data
+
+def _append_results(wkld_results, previous_knob_data, previous_metric_data):
+    # Appends the results that are not part of the previous matrices yet. Returns
+    # None if the previous matrices cannot be extended (results were deleted or
+    # the columns changed).
+    result_ids = {result.id for result in wkld_results}
+    previous_ids = set(previous_knob_data['rowlabels'])
+    if not previous_ids.issubset(result_ids):
+        return None
+    new_ids = sorted(result_ids - previous_ids)
+    if len(new_ids) == 0:
+        return {
+            'X_matrix': previous_knob_data['data'],
+            'y_matrix': previous_metric_data['data'],
+            'rowlabels': list(previous_knob_data['rowlabels']),
+            'X_columnlabels': previous_knob_data['columnlabels'],
+            'y_columnlabels': previous_metric_data['columnlabels'],
+        }
+
+    new_data = DataProcess.aggregate_data(
+        Result.query.filter(Result.id.in_(new_ids)).order_by(Result.id).all())
+    if list(new_data['X_columnlabels']) != list(previous_knob_data['columnlabels']) or \
+            list(new_data['y_columnlabels']) != list(previous_metric_data['columnlabels']):
+        return None
+    return {
+        'X_matrix': np.vstack([previous_knob_data['data'], new_data['X_matrix']]),
+        'y_matrix': np.vstack([previous_metric_data['data'], new_data['y_matrix']]),
+        'rowlabels': list(previous_knob_data['rowlabels']) + list(new_data['rowlabels']),
+        'X_columnlabels': new_data['X_columnlabels'],
+        'y_columnlabels': new_data['y_columnlabels'],
+    }
+
+def aggregate_data(wkld_results, previous_entries=None):
     # Aggregates both the knob & metric data for the given workload.
     #
     # Parameters:
-    #   wkld_results: result data belonging to this specific workload
+    #   wkld_results: result data (at least id, session_id and workload_id)
+    #         belonging to this specific workload
+    #   previous_entries: the PipelineData objects of the workload from the
+    #         latest pipeline run (see DataProcess.get_latest_pipeline_entries),
+    #         if they hold the knob & metric data only the new results are
+    #         aggregated and appended to them
     #
-    # Returns: two dictionaries containing the knob & metric data as
-    # a tuple
+    # Returns: two dictionaries containing the knob & metric data and the
+    # number of results that were not part of the previous data as a tuple
 
     # Now call the aggregate_data helper function to combine all knob &
     # metric data into matrices and also create row/column labels
@@ -25,14 +75,27 @@ def aggregate_data(wkld_results):
     #   - 'y_columnlabels': a list of the metric names corresponding to the
     #         columns in the metric_data matrix
     start_ts = time.time()
-    aggregated_data = DataProcess.aggregate_data(wkld_results)
+    aggregated_data = None
+    num_new_results = len(wkld_results)
+    previous_entries = previous_entries or {}
+    if PipelineTaskType.KNOB_DATA.value in previous_entries and \
+            PipelineTaskType.METRIC_DATA.value in previous_entries:
+        previous_knob_data = DataProcess.load_pipeline_entry(previous_entries[PipelineTaskType.KNOB_DATA.value])
+        previous_metric_data = DataProcess.load_pipeline_entry(previous_entries[PipelineTaskType.METRIC_DATA.value])
+        aggregated_data = _append_results(wkld_results, previous_knob_data, previous_metric_data)
+        if aggregated_data is not None:
+            num_new_results = len(aggregated_data['rowlabels']) - len(previous_knob_data['rowlabels'])
+    if aggregated_data is None:
+        aggregated_data = _aggregate_results(wkld_results)
 
     # Separate knob & workload data into two "standard" dictionaries of the
-    # same form
+    # same form, the knob data also records what the pipeline consumed
     knob_data = {
         'data': aggregated_data['X_matrix'],
         'rowlabels': aggregated_data['rowlabels'],
-        'columnlabels': aggregated_data['X_columnlabels']
+        'columnlabels': aggregated_data['X_columnlabels'],
+        'max_result_id': max(aggregated_data['rowlabels']),
+        'session_ids': sorted({result.session_id for result in wkld_results})
     }
 
     metric_data = {
@@ -43,5 +106,5 @@ def aggregate_data(wkld_results):
 
     # Return the knob & metric data
     exec_time = TaskUtil.save_execution_time("periodic_task", start_ts, "aggregate_data")
-    logger.info("Done aggregate data (%.1f seconds)." % exec_time)
-    return knob_data, metric_data
\ No newline at end of file
+    logger.info("Done aggregate data (%.1f seconds, # new results: %s)." % (exec_time, num_new_results))
+    return knob_data, metric_data, num_new_results
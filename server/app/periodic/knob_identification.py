@@ -24,7 +24,16 @@ def run_knob_identification(knob_data, metric_data, system_id):
     # independent variables (X) and the metric_data is the set of
     # dependent variables (y).
     start_ts = time.time()
+    consolidated_knobs = identify_knobs(knob_data, metric_data, system_id)
 
+    exec_time = TaskUtil.save_execution_time("periodic_task", start_ts, "run_knob_identification")
+    logger.info("Knob identification finished in %.0f seconds." % exec_time)
+    return consolidated_knobs
+
+def identify_knobs(knob_data, metric_data, system_id, catalog=None):
+    # Same as run_knob_identification without any database access if the
+    # catalog of the system is passed, so that it can run in the worker
+    # processes of the pipeline
     knob_matrix = knob_data['data']
     knob_columnlabels = knob_data['columnlabels']
 
@@ -54,7 +63,7 @@ def run_knob_identification(knob_data, metric_data, system_id):
     if ENABLE_DUMMY_ENCODER:
         # determine which knobs need encoding (enums with >2 possible values)
 
-        categorical_info = DataProcess.dummy_encoder_helper(nonconst_knob_columnlabels, system_id)
+        categorical_info = DataProcess.dummy_encoder_helper(nonconst_knob_columnlabels, system_id, catalog)
         # encode categorical variable first (at least, before standardize)
         dummy_encoder = DummyEncoder(categorical_info['n_values'],
                                      categorical_info['categorical_features'],
@@ -84,7 +93,4 @@ def run_knob_identification(knob_data, metric_data, system_id):
     # consolidate categorical feature columns, and reset to original names
     encoded_knobs = lasso_model.get_ranked_features()
     consolidated_knobs = consolidate_columnlabels(encoded_knobs)
-
-    exec_time = TaskUtil.save_execution_time("periodic_task", start_ts, "run_knob_identification")
-    logger.info("Knob identification finished in %.0f seconds." % exec_time)
     return consolidated_knobs
\ No newline at end of file
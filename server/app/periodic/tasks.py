@@ -8,7 +8,223 @@ from datetime import datetime
 from .aggregate_data import *
 from .knob_identification import *
 from .workload_characterization import *
-import time
+from .workload_clustering import *
+from app.workflow.map_workload import warm_mapping_models
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import multiprocessing, time
+
+def _matrix_input(entry, matrix_data):
+    # Matrices with an artifact are handed to the workers by their path and
+    # memory-mapped there, the others are pickled as numpy arrays
+    matrix_input = {key: value for key, value in matrix_data.items() if key != 'data'}
+    if entry.artifact is not None:
+        matrix_input['artifact'] = entry.artifact
+    else:
+        matrix_input['data'] = np.asarray(matrix_data['data'])
+    return matrix_input
+
+def _load_matrix_input(matrix_input):
+    matrix_data = dict(matrix_input)
+    if 'artifact' in matrix_data:
+        matrix_data['data'] = ArtifactStore.load_matrix(matrix_data.pop('artifact'))
+    return matrix_data
+
+def compute_pipeline_outputs(task):
+    # Computes the pruned metrics and the ranked knobs of one workload. It does
+    # not access the database, so that the workloads can be processed by a
+    # pool of worker processes. Returns the outputs together with the timings
+    # of each step, the caller saves them.
+    ArtifactStore.set_data_dir(task['data_dir'])
+    knob_data = _load_matrix_input(task['knob_data'])
+    metric_data = _load_matrix_input(task['metric_data'])
+    workload_name = task['workload_name']
+    timings = []
+
+    # Execute the Workload Characterization task to compute the list of
+    # pruned metrics for this workload.
+    logger.info("Pruning metrics for workload %s..." % workload_name)
+    start_ts = time.time()
+    pruned_metrics = characterize_workload(metric_data)
+    timings.append(("run_workload_characterization", start_ts, time.time()))
+    logger.info("Done pruning metrics for workload %s (# pruned metrics: %s).\n\n"
+                "Pruned metrics: %s\n" % (workload_name, len(pruned_metrics),
+                pruned_metrics))
+
+    ranked_knob_metrics = task['ranked_knob_metrics']
+    if KNOB_IDENT_USE_PRUNED_METRICS:
+        ranked_knob_metrics = sorted(set(ranked_knob_metrics) | set(pruned_metrics))
+
+    # Use the set of metrics to filter the metric_data
+    metric_idxs = [i for i, metric_name in enumerate(metric_data['columnlabels'])
+                   if metric_name in ranked_knob_metrics]
+    ranked_metric_data = {
+        'data': metric_data['data'][:, metric_idxs],
+        'rowlabels': copy.deepcopy(metric_data['rowlabels']),
+        'columnlabels': [metric_data['columnlabels'][i] for i in metric_idxs]
+    }
+
+    # Execute the Knob Identification task to compute an ordered list of knobs
+    # ranked by their impact on the System's performance.
+    logger.info("Ranking knobs for workload %s (use pruned metric data: %s)..." % \
+                (workload_name, KNOB_IDENT_USE_PRUNED_METRICS))
+    start_ts = time.time()
+    rank_knob_data = copy.deepcopy(knob_data)
+    rank_knob_data['data'], rank_knob_data['columnlabels'] = \
+        DataProcess.clean_knob_data(knob_data['data'], knob_data['columnlabels'],
+                                    task['session_ids'], task['session_knobs'])
+    ranked_knobs = identify_knobs(rank_knob_data, ranked_metric_data, task['system_id'], task['catalog'])
+    timings.append(("run_knob_identification", start_ts, time.time()))
+    logger.info("Done ranking knobs for workload %s (# ranked knobs: %s).\n\n"
+                "Ranked knobs: %s\n" % (workload_name, len(ranked_knobs), ranked_knobs))
+
+    return task['workload_id'], pruned_metrics, ranked_knobs, timings
+
+def save_pipeline_outputs(pipeline_run_id, outputs):
+    # Creates the PipelineData objects of the outputs of compute_pipeline_outputs
+    workload_id, pruned_metrics, ranked_knobs, timings = outputs
+    for fn, start_ts, end_ts in timings:
+        TaskUtil.save_execution_time("periodic_task", start_ts, fn, end_ts=end_ts)
+    pruned_metrics_entry = PipelineData(pipeline_run_id=pipeline_run_id,
+                                        task_type=PipelineTaskType.PRUNED_METRICS.value,
+                                        workload_id=workload_id,
+                                        data=json.dumps(pruned_metrics),
+                                        creation_time=datetime.now())
+    ranked_knobs_entry = PipelineData(pipeline_run_id=pipeline_run_id,
+                                      task_type=PipelineTaskType.RANKED_KNOBS.value,
+                                      workload_id=workload_id,
+                                      data=json.dumps(ranked_knobs),
+                                      creation_time=datetime.now())
+    return [pruned_metrics_entry, ranked_knobs_entry]
+
+def _restore_workload_status(workload):
+    # A workload left in PROCESSING failed, it is put back to MODIFIED so that
+    # the next run retries it
+    db.session.rollback()
+    if workload in db.session and workload.status == WorkloadStatusType.PROCESSING.value:
+        workload.status = WorkloadStatusType.MODIFIED.value
+        db.session.commit()
+
+def _save_workloads(pipeline_run_id, completed):
+    # Commits the PipelineData objects of all the processed workloads of the
+    # run at once, the workloads are put back to MODIFIED if it fails
+    try:
+        for workload, entries, outputs in completed:
+            db.session.add_all(entries)
+            if outputs is not None:
+                db.session.add_all(save_pipeline_outputs(pipeline_run_id, outputs))
+            workload.status = WorkloadStatusType.PROCESSED.value
+        db.session.commit()
+    except Exception:
+        for workload, _, _ in completed:
+            _restore_workload_status(workload)
+        raise
+
+def _prepare_workload(workload, i, num_modified, pipeline_run_id, parallel):
+    # Aggregates the data of a workload. Returns its name, the PipelineData
+    # objects of its data and the task computing its pruned metrics & ranked
+    # knobs (None if they are carried forward). The entries are None if the
+    # workload is done (deleted or without enough results).
+    # the knob & metric data are read from the training matrices, only the
+    # ids are needed here
+    wkld_results = Result.query.with_entities(Result.id, Result.session_id, Result.workload_id).filter(
+        Result.workload_id == workload.id).all()
+    num_wkld_results = len(wkld_results)
+    system = SystemCatalog.query.filter(SystemCatalog.id == workload.system_id).first()
+    workload_name = '{}@{}.{}'.format(system.type, system.version, workload.name)
+
+    logger.info("Starting workload %s (%s/%s, # results: %s)..." % (workload_name,
+                i + 1, num_modified, num_wkld_results))
+
+    if num_wkld_results == 0:
+        # delete the workload
+        logger.info("Deleting workload %s because it has no results." % workload_name)
+        db.session.delete(workload)
+        db.session.commit()
+        return workload_name, None, None
+
+    if num_wkld_results < MIN_WORKLOAD_RESULTS_COUNT:
+        # Check that there are enough results in the workload
+        logger.info("Not enough results in workload %s (# results: %s, # required: %s)." % \
+                    (workload_name, num_wkld_results, MIN_WORKLOAD_RESULTS_COUNT))
+        workload.status = WorkloadStatusType.PROCESSED.value
+        db.session.commit()
+        return workload_name, None, None
+
+    logger.info("Aggregating data for workload %s..." % workload_name)
+    # Aggregate the knob & metric data for this workload, only the results
+    # that are not part of the latest pipeline run are aggregated
+    previous_entries = DataProcess.get_latest_pipeline_entries(workload.id)
+    knob_data, metric_data, num_new_results = aggregate_data(wkld_results, previous_entries)
+    logger.info("Done aggregating data for workload %s (# new results: %s)." % (workload_name,
+                num_new_results))
+
+    # The characterization and the ranking are only recomputed if enough
+    # results were added since their latest recompute (or the sessions of the
+    # workload changed), otherwise their outputs are carried forward. The knob
+    # data records the max result id of the latest recompute, the carried
+    # forward outputs stay measured against it.
+    unique_session_ids = knob_data['session_ids']
+    previous_knob_labels = {}
+    if PipelineTaskType.KNOB_DATA.value in previous_entries:
+        previous_knob_labels = json.loads(previous_entries[PipelineTaskType.KNOB_DATA.value].data)
+    previous_session_ids = previous_knob_labels.get('session_ids', None)
+    recompute_max_result_id = previous_knob_labels.get('recompute_max_result_id',
+                                                       previous_knob_labels.get('max_result_id', None))
+    if recompute_max_result_id is None:
+        num_stale_results = len(knob_data['rowlabels'])
+    else:
+        num_stale_results = sum(1 for result_id in knob_data['rowlabels'] if result_id > recompute_max_result_id)
+    new_fraction = float(num_stale_results) / len(knob_data['rowlabels'])
+    carry_forward = PipelineTaskType.PRUNED_METRICS.value in previous_entries and \
+        PipelineTaskType.RANKED_KNOBS.value in previous_entries and \
+        previous_session_ids == unique_session_ids and \
+        new_fraction < PIPELINE_RECOMPUTE_FRACTION
+    knob_data['recompute_max_result_id'] = recompute_max_result_id if carry_forward else knob_data['max_result_id']
+
+    # Knob_data and metric_data are 2D numpy arrays. Save them as npy
+    # artifacts referenced by new PipelineData objects, the artifacts of
+    # the previous run are shared if nothing changed.
+    if num_new_results == 0:
+        # Same matrices, only the labels of the knob data may change
+        knob_entry = DataProcess.carry_forward_pipeline_entry(
+            previous_entries[PipelineTaskType.KNOB_DATA.value], pipeline_run_id)
+        knob_entry.data = json.dumps({key: value for key, value in knob_data.items() if key != 'data'})
+        metric_entry = DataProcess.carry_forward_pipeline_entry(
+            previous_entries[PipelineTaskType.METRIC_DATA.value], pipeline_run_id)
+    else:
+        knob_entry = DataProcess.create_pipeline_matrix(pipeline_run_id, workload.id,
+                                                        PipelineTaskType.KNOB_DATA.value, knob_data)
+        metric_entry = DataProcess.create_pipeline_matrix(pipeline_run_id, workload.id,
+                                                          PipelineTaskType.METRIC_DATA.value, metric_data)
+    entries = [knob_entry, metric_entry]
+
+    task = None
+    if carry_forward:
+        logger.info("Carrying forward the pruned metrics and ranked knobs of workload %s "
+                    "(results since their latest recompute: %.1f%%)." % (workload_name, new_fraction * 100))
+        for task_type in (PipelineTaskType.PRUNED_METRICS.value, PipelineTaskType.RANKED_KNOBS.value):
+            entries.append(DataProcess.carry_forward_pipeline_entry(previous_entries[task_type],
+                                                                    pipeline_run_id))
+    else:
+        # Workload target objective data
+        unique_sessions = Session.query.filter(Session.id.in_(unique_session_ids)).all()
+        ranked_knob_metrics = sorted([session.target_objective for session in unique_sessions])
+        logger.info("Target objectives for workload %s: %s" % (workload_name,
+                    ', '.join(ranked_knob_metrics)))
+        task = {
+            'workload_id': workload.id,
+            'workload_name': workload_name,
+            'system_id': workload.system_id,
+            'catalog': CatalogCache.get(workload.system_id) if ENABLE_DUMMY_ENCODER else None,
+            'session_ids': unique_session_ids,
+            'session_knobs': DataProcess.get_knobs_for_sessions(unique_session_ids),
+            'ranked_knob_metrics': ranked_knob_metrics,
+            'data_dir': ArtifactStore.data_dir,
+            'knob_data': _matrix_input(knob_entry, knob_data) if parallel else knob_data,
+            'metric_data': _matrix_input(metric_entry, metric_data) if parallel else metric_data,
+        }
+    return workload_name, entries, task
 
 def run_background_tasks():
     start_ts = time.time()
@@ -31,129 +247,76 @@ def run_background_tasks():
     pipeline_run_id = pipeline_run.id
     db.session.commit()
 
-    for i, workload in enumerate(modified_workloads):
-        workload.status = WorkloadStatusType.PROCESSING.value
-        db.session.commit()
-        wkld_results = Result.query.filter(Result.workload_id == workload.id).all()
-        num_wkld_results = len(wkld_results)
-        system = SystemCatalog.query.filter(SystemCatalog.id == workload.system_id).first()
-        workload_name = '{}@{}.{}'.format(system.type, system.version, workload.name)
-
-        logger.info("Starting workload %s (%s/%s, # results: %s)..." % (workload_name,
-                    i + 1, num_modified, num_wkld_results))
-
-        if num_wkld_results == 0:
-            # delete the workload
-            logger.info("Deleting workload %s because it has no results." % workload_name)
-            db.session.delete(workload)
-            db.session.commit()
-            continue
-
-        if num_wkld_results < MIN_WORKLOAD_RESULTS_COUNT:
-            # Check that there are enough results in the workload
-            logger.info("Not enough results in workload %s (# results: %s, # required: %s)." % \
-                        (workload_name, num_wkld_results, MIN_WORKLOAD_RESULTS_COUNT))
-            workload.status = WorkloadStatusType.PROCESSED.value
-            db.session.commit()
-            continue
-
-        logger.info("Aggregating data for workload %s..." % workload_name)
-        # Aggregate the knob & metric data for this workload
-        knob_data, metric_data = aggregate_data(wkld_results)
-        logger.info("Done aggregating data for workload %s." % workload_name)
-
-        # Knob_data and metric_data are 2D numpy arrays. Convert them into a
-        # JSON-friendly (nested) lists and then save them as new PipelineData
-        # objects.
-        knob_data_copy = copy.deepcopy(knob_data)
-        knob_data_copy['data'] = knob_data_copy['data'].tolist()
-        knob_data_copy = json.dumps(knob_data_copy)
-        knob_entry = PipelineData(pipeline_run_id=pipeline_run_id,
-                                  task_type=PipelineTaskType.KNOB_DATA.value,
-                                  workload_id=workload.id,
-                                  data=knob_data_copy,
-                                  creation_time=datetime.now())
-        db.session.add(knob_entry)
-
-        metric_data_copy = copy.deepcopy(metric_data)
-        metric_data_copy['data'] = metric_data_copy['data'].tolist()
-        metric_data_copy = json.dumps(metric_data_copy)
-        metric_entry = PipelineData(pipeline_run_id=pipeline_run_id,
-                                    task_type=PipelineTaskType.METRIC_DATA.value,
-                                    workload_id=workload.id,
-                                    data=metric_data_copy,
-                                    creation_time=datetime.now())
-        db.session.add(metric_entry)
-        db.session.commit()
+    # With more than one worker the characterization and the ranking of the
+    # workloads run in a (spawned) process pool. The PipelineData objects of
+    # the processed workloads are committed at once when all of them are
+    # done. A workload that fails is logged and put back to MODIFIED, so that
+    # the next run retries it, the others are still saved.
+    parallel = PIPELINE_NUM_WORKERS > 1 and num_modified > 1
+    pool = ProcessPoolExecutor(max_workers=PIPELINE_NUM_WORKERS,
+                               mp_context=multiprocessing.get_context('spawn')) if parallel else None
+    pending_workloads = []
+    completed = []
 
-        # Execute the Workload Characterization task to compute the list of
-        # pruned metrics for this workload and save them in a new PipelineData
-        # object.
-        logger.info("Pruning metrics for workload %s..." % workload_name)
-        pruned_metrics = run_workload_characterization(metric_data, workload.system_id)
-        logger.info("Done pruning metrics for workload %s (# pruned metrics: %s).\n\n"
-                    "Pruned metrics: %s\n" % (workload_name, len(pruned_metrics),
-                    pruned_metrics))
-        pruned_metrics_entry = PipelineData(pipeline_run_id=pipeline_run_id,
-                                            task_type=PipelineTaskType.PRUNED_METRICS.value,
-                                            workload_id=workload.id,
-                                            data=json.dumps(pruned_metrics),
-                                            creation_time=datetime.now())
-        db.session.add(pruned_metrics_entry)
-        db.session.commit()
+    try:
+        for i, workload in enumerate(modified_workloads):
+            workload_name = str(workload.id)
+            done = False
+            try:
+                workload.status = WorkloadStatusType.PROCESSING.value
+                db.session.commit()
+                workload_name, entries, task = _prepare_workload(workload, i, num_modified, pipeline_run_id,
+                                                                 parallel)
+                if entries is None:
+                    continue
+                if parallel:
+                    future = pool.submit(compute_pipeline_outputs, task) if task is not None else None
+                    pending_workloads.append((workload, workload_name, entries, future))
+                    done = True
+                    continue
+                outputs = compute_pipeline_outputs(task) if task is not None else None
+                completed.append((workload, entries, outputs))
+                done = True
+                logger.info("Done processing workload %s (%s/%s)." % (workload_name, i + 1,
+                            num_modified))
+            except Exception as ex:
+                logger.exception("Failed to process workload %s: %s" % (workload_name, ex))
+            finally:
+                if not done:
+                    _restore_workload_status(workload)
 
-        # Workload target objective data
-        unique_session_ids = []
-        for result in wkld_results:
-            if result.session_id in unique_session_ids:
-                continue
-            unique_session_ids.append(result.session_id)
-        unique_sessions = Session.query.filter(Session.id.in_(unique_session_ids)).all()
-        ranked_knob_metrics = sorted([session.target_objective for session in unique_sessions])
-        logger.info("Target objectives for workload %s: %s" % (workload_name, ', '.join(ranked_knob_metrics)))
-
-        if KNOB_IDENT_USE_PRUNED_METRICS:
-            ranked_knob_metrics = sorted(set(ranked_knob_metrics) + set(pruned_metrics))
-
-        # Use the set of metrics to filter the metric_data
-        metric_idxs = [i for i, metric_name in enumerate(metric_data['columnlabels'])
-                       if metric_name in ranked_knob_metrics]
-        ranked_metric_data = {
-            'data': metric_data['data'][:, metric_idxs],
-            'rowlabels': copy.deepcopy(metric_data['rowlabels']),
-            'columnlabels': [metric_data['columnlabels'][i] for i in metric_idxs]
-        }
-
-        # Execute the Knob Identification task to compute an ordered list of knobs
-        # ranked by their impact on the System's performance. Save them in a new
-        # PipelineData object.
-        logger.info("Ranking knobs for workload %s (use pruned metric data: %s)..." % \
-                    (workload_name, KNOB_IDENT_USE_PRUNED_METRICS))
-        rank_knob_data = copy.deepcopy(knob_data)
-        rank_knob_data['data'], rank_knob_data['columnlabels'] = \
-            DataProcess.clean_knob_data(knob_data['data'], knob_data['columnlabels'], unique_session_ids)
-        ranked_knobs = run_knob_identification(rank_knob_data, ranked_metric_data, workload.system_id)
-        logger.info("Done ranking knobs for workload %s (# ranked knobs: %s).\n\n"
-                    "Ranked knobs: %s\n" % (workload_name, len(ranked_knobs), ranked_knobs))
-        ranked_knobs_entry = PipelineData(pipeline_run_id=pipeline_run_id,
-                                          task_type=PipelineTaskType.RANKED_KNOBS.value,
-                                          workload_id=workload.id,
-                                          data=json.dumps(ranked_knobs),
-                                          creation_time=datetime.now())
-        db.session.add(ranked_knobs_entry)
-        db.session.commit()
-
-        workload.status = WorkloadStatusType.PROCESSED.value
-        db.session.commit()
-        logger.info("Done processing workload %s (%s/%s)." % (workload_name, i + 1,
-                    num_modified))
+        if parallel:
+            logger.info("Waiting for %s workloads processed by %s workers..." % (len(pending_workloads),
+                        PIPELINE_NUM_WORKERS))
+            for workload, workload_name, entries, future in pending_workloads:
+                try:
+                    completed.append((workload, entries, future.result() if future is not None else None))
+                    logger.info("Done processing workload %s." % workload_name)
+                except Exception as ex:
+                    logger.exception("Failed to process workload %s: %s" % (workload_name, ex))
+                    _restore_workload_status(workload)
+    finally:
+        if pool is not None:
+            pool.shutdown()
 
+    _save_workloads(pipeline_run_id, completed)
     logger.info("Finished processing %s modified workloads." % num_modified)
 
+    # Cluster the fingerprints of the workloads, workload mapping only scores
+    # the clusters nearest to the target
+    logger.info("Clustering the workloads...")
+    db.session.add_all(run_workload_clustering(pipeline_run_id))
+    db.session.commit()
+
     # Set the end_timestamp to the current time to indicate that we are done running
     # the background tasks
     pipeline_run.end_time = datetime.now()
     db.session.commit()
+
+    # Fit the workload mapping models of the active sessions on the new data
+    logger.info("Warming the workload mapping models...")
+    num_warmed = warm_mapping_models(pipeline_run_id)
+    logger.info("Done warming the workload mapping models of %s sessions." % num_warmed)
     exec_time = TaskUtil.save_execution_time('periodic_task', start_ts, "run_background_tasks")
     logger.info("Finished background tasks (%.0f seconds)." % exec_time)
     return 0
@@ -2,6 +2,7 @@ from app.analysis.preprocessing import Bin, get_shuffle_indices
 from app.analysis.factor_analysis import FactorAnalysis
 from app.analysis.cluster import KMeansClusters, create_kselection_model
 from app.utils import *
+from app.commons import KMEANS_NUM_JOBS, FACTOR_ANALYSIS_SOLVER, FACTOR_ANALYSIS_BATCH_SIZE
 from loguru import logger
 import numpy as np
 import time
@@ -17,7 +18,16 @@ def run_workload_characterization(metric_data, system_id=None):
     #     - 'columnlabels': a list of the metric names corresponding to
     #                       the columns in the data matrix
     start_ts = time.time()
+    pruned_metrics = characterize_workload(metric_data)
 
+    # Return pruned metrics
+    exec_time = TaskUtil.save_execution_time("periodic_task", start_ts, "run_workload_characterization")
+    logger.info("Workload characterization finished in %.0f seconds." % exec_time)
+    return pruned_metrics
+
+def characterize_workload(metric_data):
+    # Same as run_workload_characterization without any database access, so
+    # that it can run in the worker processes of the pipeline
     matrix = metric_data['data']
     columnlabels = metric_data['columnlabels']
 
@@ -48,29 +58,31 @@ def run_workload_characterization(metric_data, system_id=None):
     # Fit factor analysis model
     fa_model = FactorAnalysis()
     # For now we use 5 latent variables
-    fa_model.fit(shuffled_matrix, unique_columnlabels, n_components=5)
+    fa_model.fit(shuffled_matrix, unique_columnlabels, n_components=5,
+                 solver=FACTOR_ANALYSIS_SOLVER, batch_size=FACTOR_ANALYSIS_BATCH_SIZE)
 
     # Components: metrics * factors
     components = fa_model.components_.T.copy()
 
     # Run Kmeans for # clusters k in range(1, num_nonduplicate_metrics - 1)
     # K should be much smaller than n_cols in detK, For now max_cluster <= 20
+    # The cluster sizes are fitted lazily (KMEANS_NUM_JOBS at a time), the
+    # gap statistic stops at the first K + 1 that satisfies its criterion
     kmeans_models = KMeansClusters()
     kmeans_models.fit(components, min_cluster=1,
                       max_cluster=min(n_cols - 1, 20),
                       sample_labels=unique_columnlabels,
-                      estimator_params={'n_init': 50})
+                      estimator_params={'n_init': 50},
+                      n_jobs=KMEANS_NUM_JOBS,
+                      closest_only=True,
+                      lazy=True)
 
     # Compute optimal # clusters, k, using gap statistics
     gapk = create_kselection_model("gap-statistic")
-    gapk.fit(components, kmeans_models.cluster_map_)
+    gapk.fit(components, kmeans_models.cluster_map_, n_jobs=KMEANS_NUM_JOBS)
 
     logger.info("Found optimal number of clusters: %d" % gapk.optimal_num_clusters_)
 
     # Get pruned metrics, cloest samples of each cluster center
     pruned_metrics = kmeans_models.cluster_map_[gapk.optimal_num_clusters_].get_closest_samples()
-
-    # Return pruned metrics
-    exec_time = TaskUtil.save_execution_time("periodic_task", start_ts, "run_workload_characterization")
-    logger.info("Workload characterization finished in %.0f seconds." % exec_time)
     return pruned_metrics
\ No newline at end of file
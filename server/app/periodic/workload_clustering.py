@@ -0,0 +1,83 @@
+from app import db
+from app.models import *
+from app.types import *
+from app.utils import *
+from app.commons import WORKLOAD_CLUSTERING_MIN_WORKLOADS
+from app.analysis.dc import DensityCluster
+from sklearn.preprocessing import StandardScaler
+from loguru import logger
+from datetime import datetime
+import numpy as np
+import json, time
+
+def cluster_fingerprints(fingerprints):
+    # Clusters the fingerprints (workloads x features) by density peaks on
+    # their standardized features. Returns one label per workload, -1 marks
+    # the outliers. Small sets of workloads are kept in a single cluster.
+    n_workloads = fingerprints.shape[0]
+    if n_workloads < max(WORKLOAD_CLUSTERING_MIN_WORKLOADS, 4):
+        return np.zeros(n_workloads, dtype=np.int32)
+    scaled_fingerprints = StandardScaler().fit_transform(fingerprints)
+    try:
+        model = DensityCluster(percent=2.0, min_cluster_centers=2,
+                               max_cluster_centers=min(10, n_workloads - 2))
+        return model.fit_predict(scaled_fingerprints)
+    except Exception as ex:
+        logger.warning("Cannot cluster %s workload fingerprints: %s" % (n_workloads, ex))
+        return np.zeros(n_workloads, dtype=np.int32)
+
+def run_workload_clustering(pipeline_run_id):
+    # Computes the fingerprint of every workload of the pipeline run and
+    # clusters the fingerprints of each system. The fingerprints cover the
+    # metrics shared by all workloads of the system that are pruned for at
+    # least one of them. Returns the PipelineData objects to store.
+    start_ts = time.time()
+    filters = {
+        PipelineData.pipeline_run_id == pipeline_run_id,
+        PipelineData.task_type.in_([PipelineTaskType.METRIC_DATA.value, PipelineTaskType.PRUNED_METRICS.value])
+    }
+    entries = {}
+    for entry in PipelineData.query.filter(*filters).all():
+        entries.setdefault(entry.workload_id, {})[entry.task_type] = entry
+    systems = {}
+    for workload_id, workload_entries in entries.items():
+        if len(workload_entries) < 2:
+            continue
+        workload = Workload.query.filter(Workload.id == workload_id).first()
+        if workload is None:
+            continue
+        systems.setdefault(workload.system_id, []).append(workload_id)
+
+    fingerprint_entries = []
+    for system_id, workload_ids in systems.items():
+        workload_ids = sorted(workload_ids)
+        metric_data = {workload_id: DataProcess.load_pipeline_entry(
+            entries[workload_id][PipelineTaskType.METRIC_DATA.value]) for workload_id in workload_ids}
+        shared_metrics = set.intersection(*[set(metric_data[workload_id]['columnlabels'])
+                                            for workload_id in workload_ids])
+        pruned_metrics = set()
+        for workload_id in workload_ids:
+            pruned_metrics.update(json.loads(entries[workload_id][PipelineTaskType.PRUNED_METRICS.value].data))
+        fingerprint_metrics = sorted(shared_metrics & pruned_metrics)
+        if len(fingerprint_metrics) == 0:
+            continue
+
+        fingerprints = np.vstack([DataProcess.get_workload_fingerprint(
+            metric_data[workload_id]['data'], metric_data[workload_id]['columnlabels'], fingerprint_metrics)
+            for workload_id in workload_ids])
+        labels = cluster_fingerprints(fingerprints)
+        logger.info("Clustered %s workloads of system %s into %s clusters (# outliers: %s)." % (
+                    len(workload_ids), system_id, len(set(labels) - {-1}), np.sum(labels == -1)))
+        for workload_id, fingerprint, label in zip(workload_ids, fingerprints, labels):
+            data = {
+                'metrics': fingerprint_metrics,
+                'fingerprint': fingerprint.tolist(),
+                'cluster': int(label),
+            }
+            fingerprint_entries.append(PipelineData(pipeline_run_id=pipeline_run_id,
+                                                    task_type=PipelineTaskType.WORKLOAD_FINGERPRINT.value,
+                                                    workload_id=workload_id,
+                                                    data=json.dumps(data),
+                                                    creation_time=datetime.now()))
+    TaskUtil.save_execution_time("periodic_task", start_ts, "run_workload_clustering")
+    return fingerprint_entries
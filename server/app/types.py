@@ -42,8 +42,13 @@ class WorkloadStatusType(Enum):
     PROCESSING = "PROCESSING"
     PROCESSED = "PROCESSED"
 
+class ResultStorageType(Enum):
+    JSON = "json"
+    VECTOR = "vector"
+
 class PipelineTaskType(Enum):
     PRUNED_METRICS = "Pruned Metrics"
     RANKED_KNOBS = "Ranked Knobs"
     KNOB_DATA = "Knob Data"
     METRIC_DATA = "Metric Data"
+    WORKLOAD_FINGERPRINT = "Workload Fingerprint"
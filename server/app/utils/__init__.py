@@ -1,3 +1,11 @@
+from .catalog_cache import *
+from .artifact_store import *
+from .result_vector import *
 from .data_process import *
+from .training_matrix import *
 from .conversion import *
+from .completion_registry import *
+from .wire_format import *
+from .model_cache import *
+from .optimizer_cache import *
 from .task_util import *
\ No newline at end of file
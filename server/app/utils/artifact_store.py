@@ -0,0 +1,61 @@
+import numpy as np
+import os, tempfile, shutil
+
+class ArtifactStore(object):
+    # Binary artifacts (npy files) of the pipeline, kept under the data directory
+    # of the application. PipelineData rows reference them by their relative
+    # path, the loaders memory-map them read-only so that every process shares
+    # the same pages through the page cache.
+    data_dir = os.path.abspath('data')
+
+    @staticmethod
+    def init_app(app):
+        ArtifactStore.set_data_dir(app.config.get('DATA_DIR', ArtifactStore.data_dir))
+        # The mapping artifacts are exported by the in-memory models of a
+        # process, the ones left by a previous process are orphans
+        ArtifactStore.remove_tree('mapping')
+
+    @staticmethod
+    def set_data_dir(data_dir):
+        ArtifactStore.data_dir = os.path.abspath(data_dir)
+        os.makedirs(ArtifactStore.data_dir, exist_ok=True)
+
+    @staticmethod
+    def get_pipeline_path(pipeline_run_id, workload_id, name):
+        return os.path.join('pipeline', str(pipeline_run_id), str(workload_id), '%s.npy' % name)
+
+    @staticmethod
+    def get_mapping_dir(model_id):
+        return os.path.join('mapping', model_id)
+
+    @staticmethod
+    def get_mapping_path(model_id, workload_id, name):
+        return os.path.join(ArtifactStore.get_mapping_dir(model_id), str(workload_id), '%s.npy' % name)
+
+    @staticmethod
+    def remove_tree(path):
+        shutil.rmtree(os.path.join(ArtifactStore.data_dir, path), ignore_errors=True)
+
+    @staticmethod
+    def save_matrix(path, matrix):
+        # The matrix is written to a temporary file that is renamed in place,
+        # readers never see a partially written artifact
+        full_path = os.path.join(ArtifactStore.data_dir, path)
+        directory = os.path.dirname(full_path)
+        os.makedirs(directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                np.save(f, np.ascontiguousarray(matrix, dtype=np.float64))
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, full_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    @staticmethod
+    def load_matrix(path):
+        return np.load(os.path.join(ArtifactStore.data_dir, path), mmap_mode='r')
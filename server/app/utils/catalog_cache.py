@@ -0,0 +1,73 @@
+from app.models import SystemCatalog, KnobCatalog, MetricCatalog
+from app.types import MetricType
+from .conversion import CompiledConversion
+from collections import namedtuple, OrderedDict
+import threading, json
+
+# Immutable snapshots of the catalog rows, they can be shared between threads
+# and outlive the SQLAlchemy session that loaded them
+KnobMetadata = namedtuple('KnobMetadata', [c.name for c in KnobCatalog.__table__.columns])
+MetricMetadata = namedtuple('MetricMetadata', [c.name for c in MetricCatalog.__table__.columns])
+
+def _snapshot(row, cls):
+    return cls(**{field: getattr(row, field) for field in cls._fields})
+
+class SystemCatalogEntry(object):
+    # Everything the parsers need to know about one registered system
+
+    def __init__(self, system, knobs, metrics, generation):
+        self.system_id = system.id
+        self.type = system.type
+        self.version = system.version
+        self.generation = generation
+        self.conversion = json.loads(system.conversion)
+        self.compiled_conversion = CompiledConversion(self.conversion)
+
+        self.knobs = [_snapshot(knob, KnobMetadata) for knob in knobs]
+        self.knob_by_id = {knob.id: knob for knob in self.knobs}
+        self.knob_by_name = OrderedDict((knob.name, knob) for knob in self.knobs)
+        self.lc_knob_by_name = {name.lower(): knob for name, knob in self.knob_by_name.items()}
+        self.tunable_knobs = [knob for knob in self.knobs if knob.tunable]
+
+        self.metrics = [_snapshot(metric, MetricMetadata) for metric in metrics]
+        self.metric_by_name = OrderedDict((metric.name, metric) for metric in self.metrics)
+        self.lc_metric_by_name = {name.lower(): metric for name, metric in self.metric_by_name.items()}
+        self.numeric_metrics = [metric for metric in self.metrics
+                                if metric.metric_type != MetricType.INFO.value]
+
+class CatalogCache(object):
+    # Process-wide cache of the system catalogs keyed by system_id. Every
+    # invalidation bumps the generation, so a load that raced with an
+    # invalidation is never published.
+    _entries = {}
+    _generation = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(system_id):
+        with CatalogCache._lock:
+            entry = CatalogCache._entries.get(system_id, None)
+            generation = CatalogCache._generation
+        if entry is not None:
+            return entry
+
+        system = SystemCatalog.query.filter(SystemCatalog.id == system_id).first()
+        if system is None:
+            return None
+        knobs = KnobCatalog.query.filter(KnobCatalog.system_id == system_id).order_by(KnobCatalog.id).all()
+        metrics = MetricCatalog.query.filter(MetricCatalog.system_id == system_id).order_by(MetricCatalog.id).all()
+        entry = SystemCatalogEntry(system, knobs, metrics, generation)
+
+        with CatalogCache._lock:
+            if CatalogCache._generation == generation:
+                CatalogCache._entries[system_id] = entry
+        return entry
+
+    @staticmethod
+    def invalidate(system_id=None):
+        with CatalogCache._lock:
+            CatalogCache._generation += 1
+            if system_id is None:
+                CatalogCache._entries.clear()
+            else:
+                CatalogCache._entries.pop(system_id, None)
@@ -0,0 +1,65 @@
+from collections import OrderedDict
+from app.commons import COMPLETION_REGISTRY_SIZE
+import threading
+
+class CompletionRegistry(object):
+    # In-process registry of the recommendations produced by the background
+    # jobs, keyed by result_id. Request threads block on an Event until the
+    # job that handles their result calls notify(), the latest payloads are
+    # kept in a bounded LRU so that late waiters do not need the database.
+    _completed = OrderedDict()
+    _waiters = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _evict():
+        while len(CompletionRegistry._completed) > COMPLETION_REGISTRY_SIZE:
+            CompletionRegistry._completed.popitem(last=False)
+
+    @staticmethod
+    def get(result_id):
+        with CompletionRegistry._lock:
+            payload = CompletionRegistry._completed.get(result_id, None)
+            if payload is not None:
+                CompletionRegistry._completed.move_to_end(result_id)
+            return payload
+
+    @staticmethod
+    def notify(result_id, payload):
+        with CompletionRegistry._lock:
+            CompletionRegistry._completed[result_id] = payload
+            CompletionRegistry._completed.move_to_end(result_id)
+            CompletionRegistry._evict()
+            waiter = CompletionRegistry._waiters.pop(result_id, None)
+        if waiter is not None:
+            waiter[0].set()
+
+    @staticmethod
+    def wait(result_id, timeout, fallback=None):
+        # Returns the payload of result_id or None once the timeout expires.
+        # The fallback is called once after the waiter is registered, so a
+        # recommendation committed before that point (or by another process)
+        # is not missed.
+        with CompletionRegistry._lock:
+            payload = CompletionRegistry._completed.get(result_id, None)
+            if payload is not None:
+                return payload
+            waiter = CompletionRegistry._waiters.get(result_id, None)
+            if waiter is None:
+                waiter = [threading.Event(), 0]
+                CompletionRegistry._waiters[result_id] = waiter
+            waiter[1] += 1
+
+        try:
+            if fallback is not None:
+                payload = fallback()
+                if payload is not None:
+                    return payload
+            if waiter[0].wait(timeout):
+                return CompletionRegistry.get(result_id)
+            return None
+        finally:
+            with CompletionRegistry._lock:
+                waiter[1] -= 1
+                if waiter[1] == 0 and CompletionRegistry._waiters.get(result_id, None) is waiter:
+                    del CompletionRegistry._waiters[result_id]
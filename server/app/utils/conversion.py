@@ -1,9 +1,48 @@
+import ast
 import math
+import operator
 
-class Conversion(object):
-    @staticmethod
-    def get_raw_size(value, system):
-        for suffix, factor in system.items():
+_FACTOR_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.FloorDiv: operator.floordiv,
+    ast.Pow: operator.pow,
+}
+_NUMBER_NODES = tuple(getattr(ast, name) for name in ('Constant', 'Num') if hasattr(ast, name))
+
+def _eval_factor(node):
+    if isinstance(node, ast.Expression):
+        return _eval_factor(node.body)
+    if isinstance(node, _NUMBER_NODES):
+        value = node.value if hasattr(node, 'value') else node.n
+        if isinstance(value, int) and not isinstance(value, bool):
+            return value
+    if isinstance(node, ast.BinOp) and type(node.op) in _FACTOR_OPERATORS:
+        return _FACTOR_OPERATORS[type(node.op)](_eval_factor(node.left), _eval_factor(node.right))
+    raise ValueError('Unsupported conversion factor: {}'.format(ast.dump(node)))
+
+def parse_factor(factor):
+    # Factors are integer arithmetic such as "1024 ** 3", they are evaluated
+    # on the syntax tree instead of handing the catalog string to eval()
+    if isinstance(factor, int):
+        return factor
+    return _eval_factor(ast.parse(str(factor).strip(), mode='eval'))
+
+class CompiledUnitSystem(object):
+    # One unit system (e.g. BYTES_SYSTEM) with its factors evaluated up front
+
+    def __init__(self, system):
+        # the declaration order is kept, get_human_readable relies on the
+        # larger units being listed first
+        self.units = [(suffix, parse_factor(factor)) for suffix, factor in system.items()]
+        self.factors = dict(self.units)
+        # the longest suffix has to be tried first, 'ms' must not be read as 'm' + 's'
+        self.suffixes = sorted(self.units, key=lambda unit: len(unit[0]), reverse=True)
+        self._readable_tables = {}
+
+    def get_raw_size(self, value):
+        for suffix, factor in self.suffixes:
             if value.endswith(suffix):
                 if len(value) == len(suffix):
                     amount = 1
@@ -12,31 +51,49 @@ class Conversion(object):
                         amount = int(value[:-len(suffix)])
                     except ValueError:
                         continue
-                return amount * eval(factor)
+                return amount * factor
         return None
-    
-    @staticmethod
-    def get_human_readable(value, system, min_suffix):
-        # Converts the value to larger units only if there is no loss of resolution.
-        min_factor = None
-        unit = None
-        mod_system = []
-        for suffix, factor in system.items():
-            if suffix == min_suffix:
-                if value < eval(factor):
-                    return value
-                min_factor = eval(factor)
-                unit = min_suffix
-                value = math.floor(float(value) / min_factor)
-                break
-            mod_system.append((eval(factor), suffix))
 
-        if min_factor is None:
-            raise ValueError('Invalid min suffix for system: suffix={}, system={}'.format(
-                min_suffix, system))
+    def get_raw_sizes(self, values):
+        # Knob columns repeat the same few settings across observations, so
+        # every distinct value is converted once per batch
+        converted = {}
+        raw_sizes = []
+        for value in values:
+            if value not in converted:
+                converted[value] = self.get_raw_size(value)
+            raw_sizes.append(converted[value])
+        return raw_sizes
 
-        for factor, suffix in mod_system:
-            adj_factor = factor / min_factor
+    def _get_readable_table(self, min_suffix):
+        table = self._readable_tables.get(min_suffix, None)
+        if table is None:
+            if min_suffix not in self.factors:
+                raise ValueError('Invalid min suffix for system: suffix={}, system={}'.format(
+                    min_suffix, [suffix for suffix, _ in self.units]))
+            min_factor = self.factors[min_suffix]
+            larger_units = []
+            for suffix, factor in self.units:
+                if suffix == min_suffix:
+                    break
+                if factor % min_factor == 0:
+                    adj_factor = factor // min_factor
+                else:
+                    adj_factor = float(factor) / min_factor
+                larger_units.append((adj_factor, suffix))
+            table = (min_factor, larger_units)
+            self._readable_tables[min_suffix] = table
+        return table
+
+    def get_human_readable(self, value, min_suffix):
+        # Converts the value to larger units only if there is no loss of resolution.
+        min_factor, larger_units = self._get_readable_table(min_suffix)
+        if value < min_factor:
+            return value
+        value = int(value) // min_factor
+        unit = min_suffix
+
+        for adj_factor, suffix in larger_units:
             if value % adj_factor == 0:
                 value = math.floor(float(value) / adj_factor)
                 unit = suffix
@@ -46,4 +103,40 @@ class Conversion(object):
                 unit = suffix
                 break
 
-        return '{}{}'.format(int(value), unit)
\ No newline at end of file
+        return '{}{}'.format(int(value), unit)
+
+    def get_human_readables(self, values, min_suffix):
+        return [self.get_human_readable(value, min_suffix) for value in values]
+
+class CompiledConversion(object):
+    # The unit systems of a SystemCatalog.conversion, compiled once per catalog
+
+    def __init__(self, conversion):
+        self.systems = {}
+        for name, system in conversion.items():
+            if isinstance(system, dict):
+                self.systems[name] = CompiledUnitSystem(system)
+        self.bytes_system = self.systems.get('BYTES_SYSTEM', None)
+        self.time_system = self.systems.get('TIME_SYSTEM', None)
+        self.min_bytes_unit = conversion.get('MIN_BYTES_UNIT', None)
+        self.min_time_unit = conversion.get('MIN_TIME_UNIT', None)
+
+class Conversion(object):
+    _compiled_systems = {}
+
+    @staticmethod
+    def _compile(system):
+        key = tuple((suffix, str(factor)) for suffix, factor in system.items())
+        compiled = Conversion._compiled_systems.get(key, None)
+        if compiled is None:
+            compiled = CompiledUnitSystem(system)
+            Conversion._compiled_systems[key] = compiled
+        return compiled
+
+    @staticmethod
+    def get_raw_size(value, system):
+        return Conversion._compile(system).get_raw_size(value)
+
+    @staticmethod
+    def get_human_readable(value, system, min_suffix):
+        return Conversion._compile(system).get_human_readable(value, min_suffix)
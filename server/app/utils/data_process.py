@@ -1,5 +1,9 @@
 from app.models import *
-from app.types import VarType
+from app.types import VarType, PipelineTaskType
+from .catalog_cache import CatalogCache
+from .result_vector import ResultVector
+from .artifact_store import ArtifactStore
+from datetime import datetime
 from pyDOE import lhs
 from scipy.stats import uniform
 import numpy as np
@@ -10,11 +14,13 @@ class DataProcess(object):
 
     @staticmethod
     def get_knobs_for_session(session_id):
-        session_knobs = SessionKnob.query.filter(SessionKnob.session_id == session_id)
-        knob_ids = [s.knob_id for s in session_knobs]
-        knobs = KnobCatalog.query.filter(KnobCatalog.id.in_(knob_ids)).all()
+        session = Session.query.filter(Session.id == session_id).first()
+        catalog = CatalogCache.get(session.system_id)
+        knob_ids = {s.knob_id for s in SessionKnob.query.filter(SessionKnob.session_id == session_id)}
         knob_infos = []
-        for knob in knobs:
+        for knob in catalog.knobs:
+            if knob.id not in knob_ids:
+                continue
             knob_info = {}
             knob_info['id'] = knob.id
             knob_info['name'] = knob.name
@@ -23,6 +29,7 @@ class DataProcess(object):
             knob_info['tunable'] = knob.tunable
             knob_info['min_val'] = knob.min_val
             knob_info['max_val'] = knob.max_val
+            knob_info['default'] = knob.default
             if knob.var_type == VarType.ENUM.value:
                 enum_vals = knob.enum_vals.split(',')
                 knob_info['min_val'] = '0'
@@ -84,20 +91,34 @@ class DataProcess(object):
 
     @staticmethod
     def aggregate_data(results):
-        knob_labels = sorted(json.loads(results[0].knob_data).keys())
-        metric_labels = sorted(json.loads(results[0].metric_data).keys())
+        label_set_ids = {result.label_set_id for result in results}
+        if None not in label_set_ids:
+            labels = {tuple(map(tuple, ResultVector.get_label_set(i))) for i in label_set_ids}
+            if len(labels) == 1:
+                # All results are packed vectors with the same columns, the
+                # matrices are a single stack of their buffers
+                knob_labels, metric_labels = [list(l) for l in labels.pop()]
+                return {
+                    'X_matrix': ResultVector.unpack_rows([r.knob_vector for r in results], len(knob_labels)),
+                    'y_matrix': ResultVector.unpack_rows([r.metric_vector for r in results], len(metric_labels)),
+                    'rowlabels': [result.id for result in results],
+                    'X_columnlabels': knob_labels,
+                    'y_columnlabels': metric_labels,
+                }
+
+        decoded = [ResultVector.decode(result) for result in results]
+        knob_labels = sorted(decoded[0][0].keys())
+        metric_labels = sorted(decoded[0][1].keys())
         X_matrix = []
         y_matrix = []
         rowlabels = []
 
-        for result in results:
-            param_data = json.loads(result.knob_data)
+        for result, (param_data, metric_data) in zip(results, decoded):
             if len(param_data) != len(knob_labels):
                 raise Exception("Incorrect number of knobs "
                                 "(expected={}, actual={})".format(len(knob_labels),
                                                                   len(param_data)))
 
-            metric_data = json.loads(result.metric_data)
             if len(metric_data) != len(metric_labels):
                 raise Exception("Incorrect number of metrics "
                                 "(expected={}, actual={})".format(len(metric_labels),
@@ -115,9 +136,8 @@ class DataProcess(object):
         }
     
     @staticmethod
-    def clean_knob_data(knob_matrix, knob_labels, session_ids):
-        # Filter and amend knob_matrix and knob_labels according to the tunable knobs in the session
-        knob_matrix = np.array(knob_matrix)
+    def get_knobs_for_sessions(session_ids):
+        # The tunable knobs of all sessions, each knob is listed once
         session_knobs = []
         knob_cat = []
         for session_id in session_ids:
@@ -126,6 +146,16 @@ class DataProcess(object):
                 if knob['name'] not in knob_cat:
                     session_knobs.append(knob)
             knob_cat = [k['name'] for k in session_knobs]
+        return session_knobs
+
+    @staticmethod
+    def clean_knob_data(knob_matrix, knob_labels, session_ids, session_knobs=None):
+        # Filter and amend knob_matrix and knob_labels according to the tunable knobs in the session,
+        # session_knobs can be passed instead of being loaded for session_ids
+        knob_matrix = np.array(knob_matrix)
+        if session_knobs is None:
+            session_knobs = DataProcess.get_knobs_for_sessions(session_ids)
+        knob_cat = [k['name'] for k in session_knobs]
 
         if len(knob_cat) == 0 or knob_cat == knob_labels:
             return knob_matrix, knob_labels
@@ -171,29 +201,25 @@ class DataProcess(object):
         return new_matrix, new_labels
 
     @staticmethod
-    def dummy_encoder_helper(featured_knobs, system_id):
+    def dummy_encoder_helper(featured_knobs, system_id, catalog=None):
         n_values = []
         cat_knob_indices = []
         cat_knob_names = []
         noncat_knob_names = []
         binary_knob_indices = []
-        system = SystemCatalog.query.filter(SystemCatalog.id == system_id).first()
+        if catalog is None:
+            catalog = CatalogCache.get(system_id)
 
-        if system is None:
+        if catalog is None:
             raise Exception("SystemCatalog cannot find system_id: {}".format(system_id))
 
         for i, knob_name in enumerate(featured_knobs):
             # knob can be uniquely identified by (system, knob_name)
-            filters = {
-                KnobCatalog.name == knob_name,
-                KnobCatalog.system_id == system_id
-            }
-            knobs = KnobCatalog.query.filter(*filters).all()
-            if len(knobs) == 0:
+            knob = catalog.knob_by_name.get(knob_name, None)
+            if knob is None:
                 raise Exception(
                     "KnobCatalog cannot find knob of name {} in {}@{}".format(
-                        knob_name, system.type, system.version))
-            knob = knobs[0]
+                        knob_name, catalog.type, catalog.version))
             # check if knob is ENUM
             if knob.var_type == VarType.ENUM.value:
                 # enum_vals is a comma delimited list
@@ -226,8 +252,71 @@ class DataProcess(object):
             PipelineData.pipeline_run_id == pipeline_run_id,
             PipelineData.task_type == task_type
         }
-        return json.loads(PipelineData.query.filter(*filters).first().data)
+        return DataProcess.load_pipeline_entry(PipelineData.query.filter(*filters).first())
+
+    @staticmethod
+    def load_pipeline_entry(pipeline_data):
+        data = json.loads(pipeline_data.data)
+        if pipeline_data.artifact is not None:
+            # the matrix lives in a read-only memory-mapped artifact
+            data['data'] = ArtifactStore.load_matrix(pipeline_data.artifact)
+        return data
+
+    @staticmethod
+    def get_latest_pipeline_entries(workload_id):
+        # Returns the PipelineData objects of the workload stored by the latest
+        # finished pipeline run, keyed by task type
+        filters = {
+            PipelineData.workload_id == workload_id,
+            PipelineData.task_type == PipelineTaskType.KNOB_DATA.value,
+            PipelineRun.end_time != None
+        }
+        latest = PipelineData.query.join(PipelineRun, PipelineData.pipeline_run_id == PipelineRun.id).filter(
+            *filters).order_by(PipelineData.pipeline_run_id.desc()).first()
+        if latest is None:
+            return {}
+        filters = {
+            PipelineData.workload_id == workload_id,
+            PipelineData.pipeline_run_id == latest.pipeline_run_id
+        }
+        return {entry.task_type: entry for entry in PipelineData.query.filter(*filters).all()}
+
+    @staticmethod
+    def carry_forward_pipeline_entry(pipeline_data, pipeline_run_id):
+        # Copies a PipelineData object into another pipeline run, the artifact is shared
+        return PipelineData(pipeline_run_id=pipeline_run_id,
+                            task_type=pipeline_data.task_type,
+                            workload_id=pipeline_data.workload_id,
+                            data=pipeline_data.data,
+                            artifact=pipeline_data.artifact,
+                            creation_time=datetime.now())
+
+    @staticmethod
+    def create_pipeline_matrix(pipeline_run_id, workload_id, task_type, matrix_data):
+        # Saves matrix_data['data'] as an npy artifact, the PipelineData row only
+        # keeps the other (label) entries of matrix_data and the artifact path
+        name = task_type.lower().replace(' ', '_')
+        path = ArtifactStore.save_matrix(ArtifactStore.get_pipeline_path(pipeline_run_id, workload_id, name),
+                                         matrix_data['data'])
+        labels = {key: value for key, value in matrix_data.items() if key != 'data'}
+        return PipelineData(pipeline_run_id=pipeline_run_id,
+                            task_type=task_type,
+                            workload_id=workload_id,
+                            data=json.dumps(labels),
+                            artifact=path,
+                            creation_time=datetime.now())
     
+    @staticmethod
+    def get_workload_fingerprint(metric_matrix, metric_labels, fingerprint_metrics):
+        # A fixed-length summary of a workload: the 10th..90th percentiles of
+        # each of the fingerprint metrics, metric by metric. Returns None if
+        # one of the metrics is missing.
+        index = {label: i for i, label in enumerate(metric_labels)}
+        if any(metric not in index for metric in fingerprint_metrics):
+            return None
+        columns = np.asarray(metric_matrix)[:, [index[metric] for metric in fingerprint_metrics]]
+        return np.percentile(columns, np.arange(10, 100, 10), axis=0).T.ravel()
+
     @staticmethod
     def combine_duplicate_rows(X_matrix, y_matrix, rowlabels):
         X_unique, idxs, invs, cts = np.unique(X_matrix,
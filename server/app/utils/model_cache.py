@@ -0,0 +1,83 @@
+from app.commons import WORKLOAD_MODEL_CACHE_BYTES
+from collections import OrderedDict
+import threading
+
+class ModelCache(object):
+    # Process-wide LRU of fitted models. Every entry is stored with its size
+    # in bytes, the least recently used entries are evicted once the total
+    # exceeds WORKLOAD_MODEL_CACHE_BYTES. An entry larger than the budget is
+    # not cached at all. Evicted models that have a release() method are
+    # released (e.g. to remove the artifacts they exported).
+    _entries = OrderedDict()
+    _nbytes = 0
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(key):
+        with ModelCache._lock:
+            entry = ModelCache._entries.get(key, None)
+            if entry is None:
+                return None
+            ModelCache._entries.move_to_end(key)
+            return entry[0]
+
+    @staticmethod
+    def _release(models):
+        for model in models:
+            release = getattr(model, 'release', None)
+            if release is not None:
+                release()
+
+    @staticmethod
+    def put(key, model, nbytes):
+        if nbytes > WORKLOAD_MODEL_CACHE_BYTES:
+            return False
+        evicted = []
+        with ModelCache._lock:
+            previous = ModelCache._entries.pop(key, None)
+            if previous is not None:
+                ModelCache._nbytes -= previous[1]
+                if previous[0] is not model:
+                    evicted.append(previous[0])
+            ModelCache._entries[key] = (model, nbytes)
+            ModelCache._nbytes += nbytes
+            while ModelCache._nbytes > WORKLOAD_MODEL_CACHE_BYTES:
+                _, (evicted_model, evicted_nbytes) = ModelCache._entries.popitem(last=False)
+                ModelCache._nbytes -= evicted_nbytes
+                evicted.append(evicted_model)
+        ModelCache._release(evicted)
+        return True
+
+    @staticmethod
+    def resize(key, model, nbytes):
+        # Updates the size of a cached model that grew (e.g. fitted lazily),
+        # the model is only resized if it is still the entry of the key.
+        # Returns whether it is still cached.
+        evicted = []
+        with ModelCache._lock:
+            entry = ModelCache._entries.get(key, None)
+            if entry is None or entry[0] is not model:
+                return False
+            ModelCache._entries[key] = (model, nbytes)
+            ModelCache._nbytes += nbytes - entry[1]
+            while ModelCache._nbytes > WORKLOAD_MODEL_CACHE_BYTES:
+                _, (evicted_model, evicted_nbytes) = ModelCache._entries.popitem(last=False)
+                ModelCache._nbytes -= evicted_nbytes
+                evicted.append(evicted_model)
+        ModelCache._release(evicted)
+        return model not in evicted
+
+    @staticmethod
+    def invalidate(key=None):
+        with ModelCache._lock:
+            if key is None:
+                evicted = [model for model, _ in ModelCache._entries.values()]
+                ModelCache._entries.clear()
+                ModelCache._nbytes = 0
+            else:
+                entry = ModelCache._entries.pop(key, None)
+                evicted = []
+                if entry is not None:
+                    ModelCache._nbytes -= entry[1]
+                    evicted.append(entry[0])
+        ModelCache._release(evicted)
@@ -0,0 +1,62 @@
+from app.commons import GPR_OPTIMIZER_CACHE_SIZE
+from collections import OrderedDict
+from contextlib import contextmanager
+import threading
+
+class OptimizerCache(object):
+    # Process-wide LRU of the compiled acquisition optimizers, at most
+    # GPR_OPTIMIZER_CACHE_SIZE of them are kept. Evicted optimizers are
+    # released (their sessions are closed), acquire() hands out the
+    # optimizers locked so that they cannot be released while they run.
+    _entries = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def get(key, build):
+        # Returns the optimizer of the key, build() compiles it on a miss
+        with OptimizerCache._lock:
+            optimizer = OptimizerCache._entries.get(key, None)
+            if optimizer is not None:
+                OptimizerCache._entries.move_to_end(key)
+                return optimizer
+        optimizer = build()
+        evicted = []
+        with OptimizerCache._lock:
+            # Another thread may have compiled the same optimizer meanwhile
+            cached = OptimizerCache._entries.get(key, None)
+            if cached is not None:
+                OptimizerCache._entries.move_to_end(key)
+                evicted.append(optimizer)
+                optimizer = cached
+            else:
+                OptimizerCache._entries[key] = optimizer
+                while len(OptimizerCache._entries) > GPR_OPTIMIZER_CACHE_SIZE:
+                    evicted.append(OptimizerCache._entries.popitem(last=False)[1])
+        for evicted_optimizer in evicted:
+            evicted_optimizer.release()
+        return optimizer
+
+    @staticmethod
+    @contextmanager
+    def acquire(key, build):
+        # Holds the lock of the optimizer of the key (see get) while the block
+        # runs. An optimizer evicted & released before its lock was taken is
+        # replaced by a new one.
+        while True:
+            optimizer = OptimizerCache.get(key, build)
+            optimizer.lock.acquire()
+            if not optimizer.released:
+                break
+            optimizer.lock.release()
+        try:
+            yield optimizer
+        finally:
+            optimizer.lock.release()
+
+    @staticmethod
+    def invalidate():
+        with OptimizerCache._lock:
+            evicted = list(OptimizerCache._entries.values())
+            OptimizerCache._entries.clear()
+        for optimizer in evicted:
+            optimizer.release()
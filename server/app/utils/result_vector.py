@@ -0,0 +1,116 @@
+from app import db
+from app.models import LabelSet
+from app.commons import RESULT_VECTOR_COMPRESSION
+import numpy as np
+import threading, hashlib, json, zlib
+
+# The first byte of a packed vector tells how the float64 payload is stored
+_RAW = b'\x00'
+_ZLIB = b'\x01'
+_DTYPE = np.dtype('<f8')
+
+class ResultVector(object):
+    # Stores the knob & metric data of a result as packed float64 vectors. The
+    # column labels are kept once per distinct label set in the LabelSet table,
+    # the rows only reference them through label_set_id.
+    _label_sets = {}
+    _label_set_ids = {}
+    _lock = threading.Lock()
+
+    @staticmethod
+    def pack(values, compress=RESULT_VECTOR_COMPRESSION):
+        payload = np.asarray(values, dtype=_DTYPE).tobytes()
+        if compress:
+            return _ZLIB + zlib.compress(payload)
+        return _RAW + payload
+
+    @staticmethod
+    def unpack(buf):
+        return np.frombuffer(ResultVector._payload(buf), dtype=_DTYPE)
+
+    @staticmethod
+    def _payload(buf):
+        header, payload = buf[:1], buf[1:]
+        if header == _RAW:
+            return payload
+        if header == _ZLIB:
+            return zlib.decompress(payload)
+        raise Exception("Unknown result vector header: %r" % header)
+
+    @staticmethod
+    def unpack_rows(bufs, width):
+        # Stacks the vectors of many results into a (len(bufs), width) matrix
+        # with a single copy of the joined payloads
+        payload = bytearray().join(ResultVector._payload(buf) for buf in bufs)
+        matrix = np.frombuffer(payload, dtype=_DTYPE)
+        if matrix.size != len(bufs) * width:
+            raise Exception("Incorrect size of result vectors (expected={}, actual={})".format(
+                len(bufs) * width, matrix.size))
+        return matrix.reshape(len(bufs), width)
+
+    @staticmethod
+    def get_label_set(label_set_id):
+        # Label sets are never modified once written, so they are cached for good
+        with ResultVector._lock:
+            labels = ResultVector._label_sets.get(label_set_id, None)
+        if labels is None:
+            label_set = LabelSet.query.filter(LabelSet.id == label_set_id).first()
+            if label_set is None:
+                raise Exception("LabelSet cannot find label_set_id: {}".format(label_set_id))
+            labels = (json.loads(label_set.knob_labels), json.loads(label_set.metric_labels))
+            with ResultVector._lock:
+                ResultVector._label_sets[label_set_id] = labels
+        return labels
+
+    @staticmethod
+    def get_label_set_id(system_id, knob_labels, metric_labels):
+        knob_labels, metric_labels = list(knob_labels), list(metric_labels)
+        digest = hashlib.sha1(json.dumps([system_id, knob_labels, metric_labels]).encode('utf-8')).hexdigest()
+        with ResultVector._lock:
+            label_set_id = ResultVector._label_set_ids.get(digest, None)
+        if label_set_id is not None:
+            return label_set_id
+
+        filters = {
+            LabelSet.digest == digest,
+            LabelSet.system_id == system_id
+        }
+        label_set = LabelSet.query.filter(*filters).order_by(LabelSet.id).first()
+        if label_set is None:
+            # Only flushed, the caller commits it together with the results.
+            # It is not cached by this session (the caller may roll back),
+            # the next sessions find it committed.
+            label_set = LabelSet(digest=digest, knob_labels=json.dumps(knob_labels),
+                                 metric_labels=json.dumps(metric_labels), system_id=system_id)
+            db.session.add(label_set)
+            db.session.flush()
+            db.session.info.setdefault('pending_label_set_ids', set()).add(label_set.id)
+            return label_set.id
+        if label_set.id in db.session.info.get('pending_label_set_ids', ()):
+            return label_set.id
+        with ResultVector._lock:
+            ResultVector._label_set_ids[digest] = label_set.id
+            ResultVector._label_sets[label_set.id] = (knob_labels, metric_labels)
+        return label_set.id
+
+    @staticmethod
+    def encode(system_id, knob_dict, metric_dict):
+        # Returns the vector columns of a Result row, the labels are sorted
+        # like DataProcess.aggregate_data orders the matrix columns
+        knob_labels = sorted(knob_dict.keys())
+        metric_labels = sorted(metric_dict.keys())
+        return {
+            'label_set_id': ResultVector.get_label_set_id(system_id, knob_labels, metric_labels),
+            'knob_vector': ResultVector.pack([knob_dict[l] for l in knob_labels]),
+            'metric_vector': ResultVector.pack([metric_dict[l] for l in metric_labels])
+        }
+
+    @staticmethod
+    def decode(result):
+        # Returns the knob & metric data of a result as dictionaries
+        if result.label_set_id is None:
+            return json.loads(result.knob_data), json.loads(result.metric_data)
+        knob_labels, metric_labels = ResultVector.get_label_set(result.label_set_id)
+        knob_values = ResultVector.unpack(result.knob_vector)
+        metric_values = ResultVector.unpack(result.metric_vector)
+        return dict(zip(knob_labels, knob_values.tolist())), dict(zip(metric_labels, metric_values.tolist()))
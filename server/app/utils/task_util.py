@@ -4,6 +4,7 @@ from app.parser import *
 from datetime import datetime
 from pytz import timezone
 from app.commons import *
+from .completion_registry import CompletionRegistry
 import time, json
 
 class TaskUtil(object):
@@ -13,8 +14,9 @@ class TaskUtil(object):
         return '{}@{}#{}'.format(session.name, session.algorithm, result_id)
 
     @staticmethod
-    def save_execution_time(module, start_ts, fn, result_id=None):
-        end_ts = time.time()
+    def save_execution_time(module, start_ts, fn, result_id=None, end_ts=None):
+        if end_ts is None:
+            end_ts = time.time()
         exec_time = end_ts - start_ts
         start_time = datetime.fromtimestamp(int(start_ts), timezone(TIME_ZONE))
         db.session.add(ExecutionTime(module=module, function=fn, tag="",
@@ -36,6 +38,7 @@ class TaskUtil(object):
         )
         result.next_configuration = json.dumps(retval)
         db.session.commit()
+        CompletionRegistry.notify(result.id, result.next_configuration)
 
         return retval
 
@@ -0,0 +1,101 @@
+import unittest
+import json
+import math
+from app.commons import DEFAULT_CONVERSION
+from app.utils.conversion import CompiledConversion, Conversion, parse_factor
+
+CONVERSION = json.loads(DEFAULT_CONVERSION)
+
+
+def eval_raw_size(value, system):
+    # The former conversion, evaluating the factors on every call
+    for suffix, factor in system.items():
+        if value.endswith(suffix):
+            if len(value) == len(suffix):
+                amount = 1
+            else:
+                try:
+                    amount = int(value[:-len(suffix)])
+                except ValueError:
+                    continue
+            return amount * eval(factor)
+    return None
+
+
+def eval_human_readable(value, system, min_suffix):
+    min_factor = None
+    unit = None
+    mod_system = []
+    for suffix, factor in system.items():
+        if suffix == min_suffix:
+            if value < eval(factor):
+                return value
+            min_factor = eval(factor)
+            unit = min_suffix
+            value = math.floor(float(value) / min_factor)
+            break
+        mod_system.append((eval(factor), suffix))
+    for factor, suffix in mod_system:
+        adj_factor = factor / min_factor
+        if value % adj_factor == 0:
+            value = math.floor(float(value) / adj_factor)
+            unit = suffix
+            break
+        if value / adj_factor > 100:
+            value = round(value / adj_factor)
+            unit = suffix
+            break
+    return '{}{}'.format(int(value), unit)
+
+
+class TestConversion(unittest.TestCase):
+
+    def setUp(self):
+        self.conversion = CompiledConversion(CONVERSION)
+
+    def test_parse_factor(self):
+        self.assertEqual(parse_factor('1024 ** 3'), 1024 ** 3)
+        self.assertEqual(parse_factor(' 1000 * 60 * 60 * 24 '), 86400000)
+        self.assertEqual(parse_factor('(2 + 2) // 3 - 1'), 0)
+        self.assertEqual(parse_factor(7), 7)
+        for factor in ('__import__("os").getcwd()', '1.5', '2 / 1', 'x * 2', 'True'):
+            with self.assertRaises(ValueError):
+                parse_factor(factor)
+
+    def test_compiled_conversion(self):
+        self.assertEqual(set(self.conversion.systems.keys()), {'BYTES_SYSTEM', 'TIME_SYSTEM'})
+        self.assertEqual(self.conversion.min_bytes_unit, 'KiB')
+        self.assertEqual(self.conversion.min_time_unit, 'ms')
+        self.assertEqual(self.conversion.bytes_system.factors['GiB'], 1024 ** 3)
+        self.assertEqual(self.conversion.time_system.factors['h'], 3600000)
+
+    def test_raw_size_matches_eval(self):
+        values = ['10ms', 'ms', '5s', '3m', '2h', '1d', '512KiB', '64MiB', 'GiB', '2TiB', '10', 'xms', '1.5GiB']
+        for name in ('BYTES_SYSTEM', 'TIME_SYSTEM'):
+            system = CONVERSION[name]
+            compiled = self.conversion.systems[name]
+            for value in values:
+                expected = eval_raw_size(value, system)
+                self.assertEqual(compiled.get_raw_size(value), expected, value)
+                self.assertEqual(Conversion.get_raw_size(value, system), expected, value)
+            self.assertEqual(compiled.get_raw_sizes(values + values),
+                             [eval_raw_size(value, system) for value in values + values])
+
+    def test_human_readable_matches_eval(self):
+        cases = [('BYTES_SYSTEM', 'KiB', [1024 * i for i in range(1, 3000, 7)] + [1024 ** 3, 5 * 1024 ** 4, 100]),
+                 ('TIME_SYSTEM', 'ms', list(range(0, 500000, 997)) + [3600000, 86400000 * 3])]
+        for name, min_suffix, values in cases:
+            system = CONVERSION[name]
+            compiled = self.conversion.systems[name]
+            expected = [eval_human_readable(value, system, min_suffix) for value in values]
+            self.assertEqual(compiled.get_human_readables(values, min_suffix), expected)
+            self.assertEqual([Conversion.get_human_readable(value, system, min_suffix) for value in values],
+                             expected)
+
+    def test_human_readable_invalid_min_suffix(self):
+        with self.assertRaises(ValueError):
+            self.conversion.bytes_system.get_human_readable(4096, 'ms')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,77 @@
+import unittest
+import json
+import numpy as np
+from types import SimpleNamespace
+from app.utils.result_vector import ResultVector
+from app.utils.data_process import DataProcess
+
+KNOB_LABELS = ['knob_a', 'knob_b', 'knob_c']
+METRIC_LABELS = ['metric_a', 'metric_b']
+
+
+class TestResultVector(unittest.TestCase):
+
+    def setUp(self):
+        rng = np.random.RandomState(0)
+        self.knobs = rng.rand(5, len(KNOB_LABELS))
+        self.metrics = rng.rand(5, len(METRIC_LABELS)) * 1e6
+        # The label sets are cached for good, so the tests do not query the database
+        self.label_set_id = -1
+        ResultVector._label_sets[self.label_set_id] = (KNOB_LABELS, METRIC_LABELS)
+
+    def tearDown(self):
+        ResultVector._label_sets.pop(self.label_set_id, None)
+
+    def vector_result(self, i, compress=False):
+        return SimpleNamespace(id=i + 1, label_set_id=self.label_set_id,
+                               knob_vector=ResultVector.pack(self.knobs[i], compress=compress),
+                               metric_vector=ResultVector.pack(self.metrics[i], compress=compress))
+
+    def json_result(self, i):
+        return SimpleNamespace(id=i + 1, label_set_id=None,
+                               knob_data=json.dumps(dict(zip(KNOB_LABELS, self.knobs[i].tolist()))),
+                               metric_data=json.dumps(dict(zip(METRIC_LABELS, self.metrics[i].tolist()))))
+
+    def test_pack_unpack(self):
+        for compress in (False, True):
+            buf = ResultVector.pack(self.metrics[0], compress=compress)
+            np.testing.assert_array_equal(ResultVector.unpack(buf), self.metrics[0])
+        with self.assertRaises(Exception):
+            ResultVector.unpack(b'\x07' + ResultVector.pack(self.metrics[0])[1:])
+
+    def test_unpack_rows(self):
+        bufs = [ResultVector.pack(row, compress=i % 2 == 0) for i, row in enumerate(self.knobs)]
+        np.testing.assert_array_equal(ResultVector.unpack_rows(bufs, len(KNOB_LABELS)), self.knobs)
+        with self.assertRaises(Exception):
+            ResultVector.unpack_rows(bufs, len(KNOB_LABELS) + 1)
+
+    def test_decode(self):
+        knob_data, metric_data = ResultVector.decode(self.vector_result(0, compress=True))
+        self.assertEqual(knob_data, dict(zip(KNOB_LABELS, self.knobs[0].tolist())))
+        self.assertEqual(metric_data, dict(zip(METRIC_LABELS, self.metrics[0].tolist())))
+
+    def test_aggregate_data_fast_path(self):
+        results = [self.vector_result(i, compress=i % 2 == 0) for i in range(len(self.knobs))]
+        data = DataProcess.aggregate_data(results)
+        np.testing.assert_array_equal(data['X_matrix'], self.knobs)
+        np.testing.assert_array_equal(data['y_matrix'], self.metrics)
+        self.assertEqual(data['rowlabels'], [1, 2, 3, 4, 5])
+        self.assertEqual(data['X_columnlabels'], KNOB_LABELS)
+        self.assertEqual(data['y_columnlabels'], METRIC_LABELS)
+
+    def test_aggregate_data_matches_json(self):
+        # The json results (and a mix of both) take the per-result path
+        vector_data = DataProcess.aggregate_data([self.vector_result(i) for i in range(len(self.knobs))])
+        json_data = DataProcess.aggregate_data([self.json_result(i) for i in range(len(self.knobs))])
+        mixed_data = DataProcess.aggregate_data([self.vector_result(i) if i % 2 else self.json_result(i)
+                                                 for i in range(len(self.knobs))])
+        for data in (json_data, mixed_data):
+            np.testing.assert_array_equal(data['X_matrix'], vector_data['X_matrix'])
+            np.testing.assert_array_equal(data['y_matrix'], vector_data['y_matrix'])
+            self.assertEqual(data['rowlabels'], vector_data['rowlabels'])
+            self.assertEqual(data['X_columnlabels'], vector_data['X_columnlabels'])
+            self.assertEqual(data['y_columnlabels'], vector_data['y_columnlabels'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,163 @@
+from app.models import Result
+from app.commons import TRAINING_MATRIX_CACHE_SIZE
+from .data_process import DataProcess
+from collections import OrderedDict
+import numpy as np
+import threading
+
+class TrainingMatrix(object):
+    # Append-only X/y matrices of the results of one (session, workload). Rows
+    # are only ever added, so the views handed out stay valid while it grows.
+    # Every change bumps the generation so that downstream caches can tell
+    # when the matrices changed.
+
+    def __init__(self, session_id, workload_id):
+        self.session_id = session_id
+        self.workload_id = workload_id
+        self.lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self.knob_labels = None
+        self.metric_labels = None
+        self.n_rows = 0
+        self.last_result_id = 0
+        self.generation = getattr(self, 'generation', 0) + 1
+        self._X = None
+        self._y = None
+        self._rowlabels = None
+
+    def _reserve(self, n_rows):
+        capacity = 0 if self._X is None else self._X.shape[0]
+        if n_rows <= capacity:
+            return
+        capacity = max(16, capacity)
+        while capacity < n_rows:
+            capacity *= 2
+        X = np.empty((capacity, len(self.knob_labels)), dtype=np.float64)
+        y = np.empty((capacity, len(self.metric_labels)), dtype=np.float64)
+        rowlabels = np.empty(capacity, dtype=np.int64)
+        if self.n_rows > 0:
+            X[:self.n_rows] = self._X[:self.n_rows]
+            y[:self.n_rows] = self._y[:self.n_rows]
+            rowlabels[:self.n_rows] = self._rowlabels[:self.n_rows]
+        self._X, self._y, self._rowlabels = X, y, rowlabels
+
+    def append(self, agg_data):
+        # Appends the output of DataProcess.aggregate_data, returns False if
+        # its columns do not match and the matrix has to be rebuilt
+        if self.knob_labels is None:
+            self.knob_labels = list(agg_data['X_columnlabels'])
+            self.metric_labels = list(agg_data['y_columnlabels'])
+        elif self.knob_labels != list(agg_data['X_columnlabels']) or \
+                self.metric_labels != list(agg_data['y_columnlabels']):
+            return False
+
+        n_new = len(agg_data['rowlabels'])
+        self._reserve(self.n_rows + n_new)
+        self._X[self.n_rows:self.n_rows + n_new] = agg_data['X_matrix']
+        self._y[self.n_rows:self.n_rows + n_new] = agg_data['y_matrix']
+        self._rowlabels[self.n_rows:self.n_rows + n_new] = agg_data['rowlabels']
+        self.n_rows += n_new
+        self.last_result_id = max(self.last_result_id, max(agg_data['rowlabels']))
+        self.generation += 1
+        return True
+
+    def view(self):
+        # Same form as the output of DataProcess.aggregate_data, the matrices
+        # are read-only views of the current rows
+        X_matrix = self._X[:self.n_rows]
+        y_matrix = self._y[:self.n_rows]
+        X_matrix.flags.writeable = False
+        y_matrix.flags.writeable = False
+        return {
+            'X_matrix': X_matrix,
+            'y_matrix': y_matrix,
+            'rowlabels': self._rowlabels[:self.n_rows].tolist(),
+            'X_columnlabels': list(self.knob_labels),
+            'y_columnlabels': list(self.metric_labels),
+            'generation': self.generation,
+        }
+
+    def sync(self):
+        # Appends the results stored since the last sync. If rows showed up
+        # below last_result_id (concurrent commits) or the columns changed,
+        # the matrix is rebuilt from all the results.
+        filters = {
+            Result.session_id == self.session_id,
+            Result.workload_id == self.workload_id
+        }
+        new_results = Result.query.filter(*filters).filter(
+            Result.id > self.last_result_id).order_by(Result.id).all()
+        n_results = Result.query.filter(*filters).count()
+        if n_results == self.n_rows + len(new_results):
+            if len(new_results) == 0 or self.append(DataProcess.aggregate_data(new_results)):
+                return
+        self._reset()
+        results = Result.query.filter(*filters).order_by(Result.id).all()
+        if len(results) > 0 and not self.append(DataProcess.aggregate_data(results)):
+            raise Exception("Cannot build the training matrix of session_id={}, workload_id={}".format(
+                self.session_id, self.workload_id))
+
+class TrainingMatrixStore(object):
+    # Process-wide LRU of the training matrices keyed by (session_id, workload_id)
+    _matrices = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def _get_matrix(session_id, workload_id):
+        key = (session_id, workload_id)
+        with TrainingMatrixStore._lock:
+            matrix = TrainingMatrixStore._matrices.get(key, None)
+            if matrix is None:
+                matrix = TrainingMatrix(session_id, workload_id)
+                TrainingMatrixStore._matrices[key] = matrix
+            TrainingMatrixStore._matrices.move_to_end(key)
+            while len(TrainingMatrixStore._matrices) > TRAINING_MATRIX_CACHE_SIZE:
+                TrainingMatrixStore._matrices.popitem(last=False)
+        return matrix
+
+    @staticmethod
+    def extend(session_id, workload_id):
+        # Called once new results are stored, only matrices that are already
+        # materialized are extended, the others are built on their first read
+        with TrainingMatrixStore._lock:
+            matrix = TrainingMatrixStore._matrices.get((session_id, workload_id), None)
+        if matrix is not None:
+            with matrix.lock:
+                matrix.sync()
+
+    @staticmethod
+    def get(session_id, workload_id):
+        matrix = TrainingMatrixStore._get_matrix(session_id, workload_id)
+        with matrix.lock:
+            matrix.sync()
+            if matrix.n_rows == 0:
+                return None
+            return matrix.view()
+
+    @staticmethod
+    def get_workload(workload_id, session_ids):
+        # The rows of a workload across sessions, ordered by result id like the
+        # rows of DataProcess.aggregate_data. Returns None if the sessions do
+        # not share the same columns.
+        views = [TrainingMatrixStore.get(session_id, workload_id) for session_id in session_ids]
+        views = [view for view in views if view is not None]
+        if len(views) == 0:
+            return None
+        if len(views) == 1:
+            return views[0]
+        for view in views[1:]:
+            if view['X_columnlabels'] != views[0]['X_columnlabels'] or \
+                    view['y_columnlabels'] != views[0]['y_columnlabels']:
+                return None
+        rowlabels = np.concatenate([view['rowlabels'] for view in views])
+        order = np.argsort(rowlabels, kind='mergesort')
+        return {
+            'X_matrix': np.vstack([view['X_matrix'] for view in views])[order],
+            'y_matrix': np.vstack([view['y_matrix'] for view in views])[order],
+            'rowlabels': rowlabels[order].tolist(),
+            'X_columnlabels': views[0]['X_columnlabels'],
+            'y_columnlabels': views[0]['y_columnlabels'],
+            'generation': tuple(view['generation'] for view in views),
+        }
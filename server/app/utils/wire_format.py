@@ -0,0 +1,82 @@
+from app.commons import METRIC_LAYOUT_REGISTRY_SIZE
+from collections import OrderedDict
+import threading, gzip, json
+
+class UnknownLayoutError(Exception):
+    # The client refers to a metric layout the server does not hold (anymore),
+    # it has to send the snapshot again together with the metric names
+    pass
+
+class MetricLayoutRegistry(object):
+    # Metric names of the columnar snapshots, registered once per session and
+    # layout id. The layouts only live in this process, so they are bounded.
+    _layouts = OrderedDict()
+    _lock = threading.Lock()
+
+    @staticmethod
+    def register(session_id, layout_id, names):
+        key = (session_id, str(layout_id))
+        with MetricLayoutRegistry._lock:
+            MetricLayoutRegistry._layouts[key] = list(names)
+            MetricLayoutRegistry._layouts.move_to_end(key)
+            while len(MetricLayoutRegistry._layouts) > METRIC_LAYOUT_REGISTRY_SIZE:
+                MetricLayoutRegistry._layouts.popitem(last=False)
+
+    @staticmethod
+    def get(session_id, layout_id):
+        key = (session_id, str(layout_id))
+        with MetricLayoutRegistry._lock:
+            names = MetricLayoutRegistry._layouts.get(key, None)
+            if names is not None:
+                MetricLayoutRegistry._layouts.move_to_end(key)
+            return names
+
+class WireFormat(object):
+    # Request bodies may be gzip-compressed (Content-Encoding: gzip) and their
+    # fields may hold native objects instead of embedded JSON strings
+
+    @staticmethod
+    def load_body(request):
+        data = request.get_data()
+        encoding = request.headers.get('Content-Encoding', '').strip().lower()
+        if encoding == 'gzip':
+            data = gzip.decompress(data)
+        elif encoding not in ('', 'identity'):
+            raise ValueError("Unsupported content encoding: '%s'" % encoding)
+        return json.loads(data.decode('utf-8'))
+
+    @staticmethod
+    def load_field(value):
+        if isinstance(value, str):
+            return json.loads(value)
+        return value
+
+    @staticmethod
+    def load_metrics(value, session_id):
+        # A columnar snapshot looks like {"layout": "<id>", "names": [...], "values": [...]},
+        # where "names" (scope-qualified, e.g. 'global.tidb.tidb_qps') is only required
+        # the first time a layout is used by the session
+        metrics = WireFormat.load_field(value)
+        if not isinstance(metrics, dict) or 'layout' not in metrics:
+            return metrics
+
+        layout_id = metrics['layout']
+        names = metrics.get('names', None)
+        if names is not None:
+            MetricLayoutRegistry.register(session_id, layout_id, names)
+        else:
+            names = MetricLayoutRegistry.get(session_id, layout_id)
+            if names is None:
+                raise UnknownLayoutError("Unknown metric layout: '%s'" % layout_id)
+
+        values = metrics.get('values', [])
+        if len(values) != len(names):
+            raise ValueError("Metric layout '%s' has %d names but got %d values" 
+                             % (layout_id, len(names), len(values)))
+        nested = {}
+        for name, metric_value in zip(names, values):
+            scope, _, metric_name = name.partition('.')
+            if scope not in nested:
+                nested[scope] = {}
+            nested[scope][metric_name] = metric_value
+        return nested
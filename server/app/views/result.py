@@ -1,6 +1,6 @@
 from flask import Blueprint, request, Response
 from app.parser import KnobParser, MetricParser
-from app.types import VarType, WorkloadStatusType
+from app.types import VarType, WorkloadStatusType, ResultStorageType
 from app.utils import *
 from app.models import *
 from app.commons import *
@@ -13,21 +13,7 @@ import json
 
 result = Blueprint('result', __name__)
 
-@result.route('/generate/<session_name>', methods=['POST'])
-def generate_result(session_name):
-    req = json.loads(request.stream.read())
-    metrics_before = req.get('metrics_before', None)
-    metrics_after = req.get('metrics_after', None)
-    knobs = req.get('knobs', None)
-    summary = req.get('summary', None)
-    if metrics_before is None or metrics_after is None or knobs is None or summary is None:
-        return Response("Request 'metrics_before' or 'metrics_after' or 'knobs' or 'summary' is null", status=500)
-    
-    session = Session.query.filter(Session.name == session_name).first()
-    if session is None:
-        return Response("Invalid session: '%s'" % session_name, status=404)
-
-    summary = json.loads(summary)
+def _check_system(session, summary):
     filters = {
         SystemCatalog.type == summary['system_type'], 
         SystemCatalog.version == summary['version']
@@ -37,66 +23,174 @@ def generate_result(session_name):
         expected = SystemCatalog.query.filter(SystemCatalog.id == session.system_id).first()
         return Response("The system must match the type and version, expected=%s:%s, actual=%s:%s" \
         % (expected.type, expected.version, summary['system_type'], summary['version']), status=500)
+    return None
+
+def _parse_result(session, observation, metric_parser, converted_knob_dict):
+    # Parse one observation into the column values of a Result row, the
+    # workload name is returned with it so that callers can resolve the
+    # workload id themselves. The knobs are converted by the caller.
+    summary = observation['summary']
     start_time = datetime.fromtimestamp(int(float(summary['start_time']) / 1000), timezone(TIME_ZONE))
     end_time = datetime.fromtimestamp(int(float(summary['end_time']) / 1000), timezone(TIME_ZONE))
     observation_time = float(summary['observation_time'])
 
-    # load, process, and store the knobs in the system's configuration
-    parser = KnobParser(session.system_id)
-    knob_dict = parser.parse_system_knobs(json.loads(knobs))
-    filters = {
-        KnobCatalog.system_id == session.system_id,
-        KnobCatalog.var_type != VarType.STRING.value,
-        KnobCatalog.var_type != VarType.TIMESTAMP.value,
-        KnobCatalog.tunable == True
+    # load, process, and store the runtime metrics exposed by the system
+    initial_metric_dict = metric_parser.parse_system_metrics(observation['metrics_before'])
+    final_metric_dict = metric_parser.parse_system_metrics(observation['metrics_after'])
+    metric_dict = metric_parser.calculate_change_in_metrics(initial_metric_dict, final_metric_dict)
+    numeric_metric_dict = metric_parser.convert_system_metrics(metric_dict, session.target_objective)
+
+    row = {
+        'observation_start_time': start_time,
+        'observation_end_time': end_time,
+        'observation_time': observation_time,
+        'session_id': session.id
     }
-    knob_to_convert = KnobCatalog.query.filter(*filters).all()
-    converted_knob_dict = parser.convert_system_knobs(knob_dict, knob_to_convert)
+    if RESULT_STORAGE_MODE == ResultStorageType.VECTOR.value:
+        row.update(ResultVector.encode(session.system_id, converted_knob_dict, numeric_metric_dict))
+    else:
+        row['knob_data'] = json.dumps(converted_knob_dict)
+        row['metric_data'] = json.dumps(numeric_metric_dict)
+    return summary['workload'], row
 
-    # load, process, and store the runtime metrics exposed by the system
-    metrics_before = json.loads(metrics_before)
-    metrics_after = json.loads(metrics_after)
-    parser = MetricParser(session.system_id)
-    initial_metric_dict = parser.parse_system_metrics(metrics_before)
-    final_metric_dict = parser.parse_system_metrics(metrics_after)
-    metric_dict = parser.calculate_change_in_metrics(initial_metric_dict, final_metric_dict)
-    numeric_metric_dict = parser.convert_system_metrics(metric_dict, session.target_objective)
+def _get_knobs_to_convert(system_id):
+    return [knob for knob in CatalogCache.get(system_id).tunable_knobs
+            if knob.var_type != VarType.STRING.value and knob.var_type != VarType.TIMESTAMP.value]
 
+def _get_or_create_workload(name, system_id):
     # create a new workload if this one does not already exist
     filters = {
-        Workload.name == summary['workload'],
-        Workload.system_id == session.system_id
+        Workload.name == name,
+        Workload.system_id == system_id
     }
     workload = Workload.query.filter(*filters).first()
     if workload is None:
-        workload = Workload(name=summary['workload'], 
-            status=WorkloadStatusType.MODIFIED.value, system_id=session.system_id)
+        workload = Workload(name=name, 
+            status=WorkloadStatusType.MODIFIED.value, system_id=system_id)
         db.session.add(workload)
         db.session.flush()
-        workload_id = workload.id
     else:
         workload.status = WorkloadStatusType.MODIFIED.value
-        workload_id = workload.id
+    return workload.id
+
+@result.route('/generate/<session_name>', methods=['POST'])
+def generate_result(session_name):
+    req = WireFormat.load_body(request)
+    metrics_before = req.get('metrics_before', None)
+    metrics_after = req.get('metrics_after', None)
+    knobs = req.get('knobs', None)
+    summary = req.get('summary', None)
+    if metrics_before is None or metrics_after is None or knobs is None or summary is None:
+        return Response("Request 'metrics_before' or 'metrics_after' or 'knobs' or 'summary' is null", status=500)
+    
+    session = Session.query.filter(Session.name == session_name).first()
+    if session is None:
+        return Response("Invalid session: '%s'" % session_name, status=404)
+
+    summary = WireFormat.load_field(summary)
+    error = _check_system(session, summary)
+    if error is not None:
+        return error
+
+    try:
+        observation = {
+            'summary': summary,
+            'knobs': WireFormat.load_field(knobs),
+            'metrics_before': WireFormat.load_metrics(metrics_before, session.id),
+            'metrics_after': WireFormat.load_metrics(metrics_after, session.id)
+        }
+    except UnknownLayoutError as e:
+        return Response(str(e), status=404)
+
+    # load, process, and store the knobs in the system's configuration
+    knob_parser = KnobParser(session.system_id)
+    knob_dict = knob_parser.parse_system_knobs(observation['knobs'])
+    converted_knob_dict = knob_parser.convert_system_knobs(knob_dict, _get_knobs_to_convert(session.system_id))
+    workload_name, row = _parse_result(session, observation, 
+        MetricParser(session.system_id), converted_knob_dict)
+    workload_id = _get_or_create_workload(workload_name, session.system_id)
     db.session.commit()
 
-    result = Result(
-        knob_data=json.dumps(converted_knob_dict), 
-        metric_data=json.dumps(numeric_metric_dict), 
-        observation_start_time=start_time, 
-        observation_end_time=end_time,
-        observation_time=observation_time, 
-        workload_id = workload_id,
-        session_id=session.id)
+    result = Result(workload_id=workload_id, **row)
     db.session.add(result)
     db.session.flush()
     result_id = result.id
     db.session.commit()
+    TrainingMatrixStore.extend(session.id, workload_id)
 
     if session.algorithm == AlgorithmType.GPB.value:
         executor.submit(flow.gaussian_process_bandits, result_id)
     
     return Response("Result stored successfully! Running tunner with result id: %s" % result.id, status=200)
 
+@result.route('/generate_batch/<session_name>', methods=['POST'])
+def generate_batch_result(session_name):
+    # Stores N observations of one session in a single transaction. Each entry of
+    # 'results' has the same fields as the body of '/generate/<session_name>'.
+    req = WireFormat.load_body(request)
+    observations = req.get('results', None)
+    if observations is None or len(observations) == 0:
+        return Response("Request 'results' is null or empty", status=500)
+
+    session = Session.query.filter(Session.name == session_name).first()
+    if session is None:
+        return Response("Invalid session: '%s'" % session_name, status=404)
+
+    # the parsers and the knob catalog are loaded once for the whole batch
+    knob_parser = KnobParser(session.system_id)
+    metric_parser = MetricParser(session.system_id)
+    knob_to_convert = _get_knobs_to_convert(session.system_id)
+    parsed_observations = []
+    for i, obs in enumerate(observations):
+        fields = [obs.get(key, None) for key in ('metrics_before', 'metrics_after', 'knobs', 'summary')]
+        if any(field is None for field in fields):
+            return Response("Request 'metrics_before' or 'metrics_after' or 'knobs' or 'summary' "
+                            "of result %d is null" % i, status=500)
+        summary = WireFormat.load_field(fields[3])
+        error = _check_system(session, summary)
+        if error is not None:
+            return error
+        try:
+            metrics_before = WireFormat.load_metrics(fields[0], session.id)
+            metrics_after = WireFormat.load_metrics(fields[1], session.id)
+        except UnknownLayoutError as e:
+            return Response("%s (result %d)" % (str(e), i), status=404)
+        knobs = WireFormat.load_field(fields[2])
+        parsed_observations.append({
+            'summary': summary,
+            'knobs': knob_parser.parse_system_knobs(knobs),
+            'metrics_before': metrics_before,
+            'metrics_after': metrics_after
+        })
+
+    # the knobs are converted column by column for the whole batch
+    converted_knob_dicts = knob_parser.convert_system_knobs_batch(
+        [observation['knobs'] for observation in parsed_observations], knob_to_convert)
+    parsed_results = [_parse_result(session, observation, metric_parser, converted_knob_dict)
+                      for observation, converted_knob_dict in zip(parsed_observations, converted_knob_dicts)]
+
+    # upsert every distinct workload once, then insert all results in bulk
+    workload_ids = {}
+    for workload_name, _ in parsed_results:
+        if workload_name not in workload_ids:
+            workload_ids[workload_name] = _get_or_create_workload(workload_name, session.system_id)
+    rows = []
+    for workload_name, row in parsed_results:
+        row['workload_id'] = workload_ids[workload_name]
+        rows.append(row)
+    db.session.bulk_insert_mappings(Result, rows)
+    db.session.commit()
+    for workload_id in set(workload_ids.values()):
+        TrainingMatrixStore.extend(session.id, workload_id)
+
+    # one tuning job per session, driven by the newest stored result
+    result_id = db.session.query(db.func.max(Result.id)).filter(Result.session_id == session.id).scalar()
+    if session.algorithm == AlgorithmType.GPB.value:
+        executor.submit(flow.gaussian_process_bandits, result_id)
+
+    return Response("%d results stored successfully! Running tunner with result id: %s" 
+                    % (len(rows), result_id), status=200)
+
 @result.route('/query/<session_name>', methods=['GET'])
 def query_result(session_name):
     session = Session.query.filter(Session.name == session_name).first()
@@ -108,3 +202,38 @@ def query_result(session_name):
     if next_configuration is None:
         return Response("Not found next configuration", status=404)
     return Response(next_configuration, status=200)
+
+def _load_next_configuration(result_id):
+    next_configuration = Result.query.with_entities(Result.next_configuration).filter(
+        Result.id == result_id).scalar()
+    # release the connection before the request thread starts to block
+    db.session.rollback()
+    return next_configuration
+
+@result.route('/query/<session_name>/<int:result_id>', methods=['GET'])
+def wait_result(session_name, result_id):
+    # Long-poll variant of '/query/<session_name>', it blocks until the
+    # recommendation of result_id is ready or the timeout (in seconds) expires
+    try:
+        timeout = float(request.args.get('timeout', LONG_POLL_DEFAULT_TIMEOUT))
+    except ValueError:
+        return Response("Invalid timeout: '%s'" % request.args.get('timeout'), status=500)
+    timeout = min(max(timeout, 0), LONG_POLL_MAX_TIMEOUT)
+
+    # The result must belong to the session before anything is read from the registry
+    session = Session.query.filter(Session.name == session_name).first()
+    if session is None:
+        return Response("Invalid session: '%s'" % session_name, status=404)
+    result_exists = Result.query.with_entities(Result.id).filter(
+        Result.id == result_id, Result.session_id == session.id).first()
+    if result_exists is None:
+        return Response("Invalid result id for session '%s': %d" % (session_name, result_id), status=404)
+    db.session.rollback()
+
+    next_configuration = CompletionRegistry.get(result_id)
+    if next_configuration is None:
+        next_configuration = CompletionRegistry.wait(result_id, timeout, 
+            lambda: _load_next_configuration(result_id))
+    if next_configuration is None:
+        return Response("Not found next configuration", status=404)
+    return Response(next_configuration, status=200)
@@ -60,4 +60,5 @@ def register_system():
     db.session.add_all(metrics_catalog_list)
 
     db.session.commit()
+    CatalogCache.invalidate(system_catalog.id)
     return Response("Success to register %s@%s" % (system_type, version), status=200)
@@ -18,17 +18,13 @@ def aggregate_target_results(result_id, algorithm, data):
     logger.info("%s: Aggregating target results..." % task_name)
 
     # Aggregate all knob config results tried by the target so far in this
-    # tuning session and this tuning workload.
-    filters = {
-        Result.session_id == newest_result.session_id,
-        Result.workload_id == newest_result.workload_id
-    }
-    target_results = Result.query.filter(*filters).all()
-    if len(target_results) == 0:
+    # tuning session and this tuning workload, only the results stored since
+    # the last call are parsed.
+    agg_data = TrainingMatrixStore.get(newest_result.session_id, newest_result.workload_id)
+    if agg_data is None:
         raise Exception('Cannot find any results for session_id={}, workload_id={}'
                         .format(newest_result.session_id, newest_result.workload_id))
     
-    agg_data = DataProcess.aggregate_data(target_results)
     agg_data['newest_result_id'] = result_id
     agg_data['status'] = 'good'
 
@@ -3,55 +3,272 @@ from app.utils import *
 from app.types import *
 from app.analysis.preprocessing import Bin
 from app.analysis.gpr import gpr_models
-from app.analysis.gpr.predict import gpflow_predict
 from app.analysis.gp import GPRNP
+from app.commons import MAPPING_NUM_WORKERS, MAPPING_CANDIDATE_CLUSTERS, MAPPING_WARM_SESSION_AGE
 from sklearn.preprocessing import StandardScaler
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
 from loguru import logger
+from datetime import datetime, timedelta
 import numpy as np
-import tensorflow as tf
-import time, json, gpflow
+import time, json, hashlib, multiprocessing, threading, uuid
 
-def map_workload(data, algorithm):
-    start_ts = time.time()
-    newest_result = Result.query.filter(Result.id == data['newest_result_id']).first()
-    session = Session.query.filter(Session.id == newest_result.session_id).first()
-    task_name = TaskUtil.get_task_name(session, data['newest_result_id'])
-    target_workload = Workload.query.filter(Workload.id == newest_result.workload_id).first()
+# The hyperparameters the fitted workload mapping models depend on
+_MAPPING_MODEL_PARAMS = ('GPR_USE_GPFLOW', 'GPR_MODEL_NAME', 'GPR_LENGTH_SCALE', 'GPR_MAGNITUDE',
+                         'GPR_RIDGE', 'GPR_MAX_TRAIN_SIZE', 'GPR_BATCH_SIZE')
 
-    if data['status'] != 'good':
-        logger.info("%s: Skipping workload mapping (status: %s)." % (task_name, data['status']))
-        return data
+class WorkloadMappingModels(object):
+    # Everything map_workload needs to score a target against the other
+    # workloads of a pipeline run: the scalers & the binner fitted on their
+    # data and one model per workload. The models are GPRNP objects (with
+    # GPR_USE_GPFLOW they use the kernel of the gpflow model, see
+    # gpr_models.get_exponential_kernel_params), so only their Cholesky
+    # factors & alphas are needed to predict. A model is fitted the first time
+    # its workload is scored, from the scaled training data of the workload.
+    # The fingerprints (workload_id -> (cluster, fingerprint)) computed by the
+    # background tasks restrict the scoring to the workloads near the target,
+    # the other workloads are never fitted.
+    # The artifacts exported for the scoring pool are removed on release(),
+    # once the scorings still using them are done.
 
-    logger.info("%s: Mapping the workload..." % task_name)
+    def __init__(self, X_scaler, y_scaler, y_binner, pruned_metric_idxs, training_data, model_params,
+                 fingerprint_metrics=None, fingerprints=None):
+        self.X_scaler = X_scaler
+        self.y_scaler = y_scaler
+        self.y_binner = y_binner
+        self.pruned_metric_idxs = pruned_metric_idxs
+        self.workload_ids = list(training_data.keys())
+        # workload_id -> (X_scaled, y_scaled) of the workloads not fitted yet
+        self.training_data = dict(training_data)
+        # length_scale, magnitude, ridge, max_train_size & batch_size of the GPRNP models
+        self.model_params = model_params
+        self.models = {}
+        self.cache_key = None
+        self.fingerprint_metrics = fingerprint_metrics
+        self.fingerprints = fingerprints or {}
+        self.model_id = uuid.uuid4().hex
+        self.artifacts = {}
+        self.scorings = 0
+        self.released = False
+        self.lock = threading.Lock()
+        self.fit_lock = threading.Lock()
 
-    params = json.loads(session.hyper_parameters)
-    y_columnlabels = np.array(data['y_columnlabels'])
+    def get_model(self, workload_id):
+        # The GPRNP model of the workload, fitted on the first call
+        with self.fit_lock:
+            model = self.models.get(workload_id, None)
+            if model is None:
+                X_scaled, y_scaled = self.training_data[workload_id]
+                # Using this workload's data, train a Gaussian process model on
+                # all the metric columns at once (they share the kernel matrix).
+                model = GPRNP(length_scale=self.model_params['length_scale'],
+                              magnitude=self.model_params['magnitude'],
+                              max_train_size=self.model_params['max_train_size'],
+                              batch_size=self.model_params['batch_size'])
+                model.fit(X_scaled, y_scaled, ridge=self.model_params['ridge'])
+                self.models[workload_id] = model
+                del self.training_data[workload_id]
+        return model
 
-    # Find all pipeline data belonging to the latest version with the same
-    # system as the target
-    pipeline_data = PipelineData.query.filter(PipelineData.workload_id == newest_result.workload_id).all()
-    pipeline_run_ids = [data.pipeline_run_id for data in pipeline_data]
-    filters = {
-        PipelineRun.end_time != None,
-        PipelineRun.id.in_(pipeline_run_ids)
-    }
-    latest_pipeline_run = PipelineRun.query.filter(*filters).order_by(PipelineRun.id.desc()).first()
-    assert latest_pipeline_run is not None
-    data['pipeline_run'] = latest_pipeline_run.id
+    def export(self, workload_id):
+        # Saves X_train & alpha of the GPRNP model of the workload as npy
+        # artifacts (once), the worker processes memory-map them. Every export
+        # holds the artifacts until the scoring using them calls scored().
+        model = self.get_model(workload_id)
+        with self.lock:
+            if self.released:
+                raise Exception("The workload mapping models %s have been released." % self.model_id)
+            artifacts = self.artifacts.get(workload_id, None)
+            if artifacts is None:
+                artifacts = {
+                    name: ArtifactStore.save_matrix(ArtifactStore.get_mapping_path(self.model_id, workload_id, name),
+                                                    matrix)
+                    for name, matrix in (('X_train', model.X_train), ('alpha', model.alpha))
+                }
+                self.artifacts[workload_id] = artifacts
+            self.scorings += 1
+        return artifacts
+
+    def scored(self, future=None):
+        # Done callback of the scoring of an exported workload
+        with self.lock:
+            self.scorings -= 1
+            if self.released and self.scorings == 0:
+                self._remove_artifacts()
+
+    def get_candidates(self, y_matrix, y_columnlabels, n_clusters=MAPPING_CANDIDATE_CLUSTERS):
+        # The workloads of the n_clusters clusters whose centroids are nearest
+        # to the fingerprint of the target (every outlier is a cluster of its
+        # own). All the workloads are candidates if some of them have no
+        # fingerprint or the target lacks one of the fingerprint metrics.
+        workload_ids = list(self.workload_ids)
+        if len(self.fingerprints) == 0 or any(workload_id not in self.fingerprints
+                                              for workload_id in workload_ids):
+            return workload_ids
+        target = DataProcess.get_workload_fingerprint(y_matrix, y_columnlabels, self.fingerprint_metrics)
+        if target is None:
+            return workload_ids
 
-    pipeline_data = PipelineData.query.filter(PipelineData.pipeline_run_id == latest_pipeline_run.id).all()
+        fingerprints = np.vstack([self.fingerprints[workload_id][1] for workload_id in workload_ids])
+        mean = np.mean(fingerprints, axis=0)
+        std = np.std(fingerprints, axis=0)
+        std[std == 0] = 1.0
+        fingerprints = (fingerprints - mean) / std
+        target = (target - mean) / std
+
+        clusters = {}
+        for i, workload_id in enumerate(workload_ids):
+            label = self.fingerprints[workload_id][0]
+            clusters.setdefault(('outlier', workload_id) if label == -1 else label, []).append(i)
+        members = list(clusters.values())
+        centroids = np.vstack([np.mean(fingerprints[idxs], axis=0) for idxs in members])
+        nearest = np.argsort(np.linalg.norm(centroids - target, axis=1), kind='mergesort')[:max(1, n_clusters)]
+        return [workload_ids[i] for cluster in nearest for i in members[cluster]]
+
+    def release(self):
+        # Called by the ModelCache on eviction, the artifacts are removed by
+        # the last scoring still using them
+        with self.lock:
+            self.released = True
+            if self.scorings == 0:
+                self._remove_artifacts()
+
+    def _remove_artifacts(self):
+        if len(self.artifacts) > 0:
+            ArtifactStore.remove_tree(ArtifactStore.get_mapping_dir(self.model_id))
+            self.artifacts = {}
+
+    @property
+    def nbytes(self):
+        # Grows as the models are fitted
+        nbytes = 0
+        for model in list(self.models.values()):
+            arrays = [model.X_train, model.y_train, model.L, model.alpha]
+            nbytes += sum(array.nbytes for array in arrays if array is not None)
+        for arrays in list(self.training_data.values()):
+            nbytes += sum(array.nbytes for array in arrays)
+        return nbytes
+
+    def predict(self, workload_id, X_target):
+        return self.get_model(workload_id).predict_mean(X_target)
+
+def score_workload(predictions, y_target, y_binner):
+    # Bin each of the predicted metric columns by deciles and then compute
+    # the score (i.e., distance) between the target workload and a known
+    # workload (the bins are unsigned integers, they are subtracted as floats)
+    predictions = y_binner.transform(predictions)
+    dists = np.sqrt(np.sum(np.square(
+        np.subtract(predictions, y_target, dtype=np.float64)), axis=1))
+    return np.mean(dists)
+
+def _score_workload_task(task):
+    # Runs in the scoring pool, the GPRNP model is rebuilt from its memory-mapped
+    # X_train & alpha
+    ArtifactStore.set_data_dir(task['data_dir'])
+    model = GPRNP(length_scale=task['length_scale'],
+                  magnitude=task['magnitude'],
+                  batch_size=task['batch_size'])
+    model.set_params(X_train=ArtifactStore.load_matrix(task['artifacts']['X_train']),
+                     alpha=ArtifactStore.load_matrix(task['artifacts']['alpha']))
+    predictions = model.predict_mean(task['X_target']).reshape(task['y_target'].shape)
+    return score_workload(predictions, task['y_target'], task['y_binner'])
+
+_scoring_pool = None
+_scoring_pool_lock = threading.Lock()
+
+def _get_scoring_pool():
+    global _scoring_pool
+    with _scoring_pool_lock:
+        if _scoring_pool is None:
+            # Spawned, forking the threaded server process is not safe
+            _scoring_pool = ProcessPoolExecutor(max_workers=MAPPING_NUM_WORKERS,
+                                                mp_context=multiprocessing.get_context('spawn'))
+        return _scoring_pool
+
+def score_workloads(mapping_models, X_target, y_target, params, deadline_ts=None, workload_ids=None):
+    # Scores the target against the workloads of the mapping models (all of
+    # them by default). With MAPPING_NUM_WORKERS > 1 the workloads are scored
+    # by a process pool. Once deadline_ts is passed, only the workloads scored
+    # so far are returned (at least one).
+    scores = {}
+    if workload_ids is None:
+        workload_ids = list(mapping_models.workload_ids)
+    if MAPPING_NUM_WORKERS > 1 and len(workload_ids) > 1:
+        pool = _get_scoring_pool()
+        futures = {}
+        local_workload_ids = []
+        for workload_id in workload_ids:
+            try:
+                artifacts = mapping_models.export(workload_id)
+            except Exception:
+                # Released by the ModelCache meanwhile, scored in this process
+                local_workload_ids.append(workload_id)
+                continue
+            model = mapping_models.get_model(workload_id)
+            task = {
+                'data_dir': ArtifactStore.data_dir,
+                'artifacts': artifacts,
+                'length_scale': model.length_scale,
+                'magnitude': model.magnitude,
+                'batch_size': params['GPR_BATCH_SIZE'],
+                'X_target': X_target,
+                'y_target': y_target,
+                'y_binner': mapping_models.y_binner,
+            }
+            try:
+                future = pool.submit(_score_workload_task, task)
+            except Exception:
+                mapping_models.scored()
+                raise
+            future.add_done_callback(mapping_models.scored)
+            futures[future] = workload_id
+        timeout = None if deadline_ts is None else max(deadline_ts - time.time(), 0)
+        done, not_done = wait(list(futures.keys()), timeout=timeout)
+        while True:
+            for future in done:
+                try:
+                    scores[futures[future]] = future.result()
+                except Exception as ex:
+                    logger.warning("Cannot score workload %s: %s" % (futures[future], ex))
+            if len(scores) > 0 or len(not_done) == 0:
+                break
+            # Nothing scored before the deadline, wait for the next workload
+            done, not_done = wait(not_done, return_when=FIRST_COMPLETED)
+        for future in not_done:
+            future.cancel()
+        workload_ids = local_workload_ids
+
+    for workload_id in workload_ids:
+        if deadline_ts is not None and len(scores) > 0 and time.time() > deadline_ts:
+            break
+        # Predict the performance of each metric for each of the knob
+        # configurations attempted so far by the target.
+        predictions = mapping_models.predict(workload_id, X_target).reshape(y_target.shape)
+        scores[workload_id] = score_workload(predictions, y_target, mapping_models.y_binner)
+    return scores
+
+def get_mapping_key(pipeline_run_id, target_workload_id, session_knobs, y_columnlabels, params):
+    digest = hashlib.sha1(json.dumps([session_knobs, list(y_columnlabels)]).encode('utf-8')).hexdigest()
+    return (pipeline_run_id, target_workload_id, digest) + tuple(params[k] for k in _MAPPING_MODEL_PARAMS)
+
+def build_mapping_models(target_workload, pipeline_run_id, session_knobs, y_columnlabels, params):
+    # Loads the data of the other workloads of the pipeline run (same system
+    # as the target) and scales it for their mapping models, which are fitted
+    # when their workloads are scored. Returns None if there is
+    # no other workload.
+    pipeline_data = PipelineData.query.filter(PipelineData.pipeline_run_id == pipeline_run_id).all()
+    y_columnlabels = np.array(y_columnlabels)
 
     # pruned metrics but we just use those from the first workload for now
     initialized = False
     global_pruned_metrics = None
     pruned_metric_idxs = None
-    
+
     unique_workloads = list(set([data.workload_id for data in pipeline_data]))
     workload_data = {}
     # Compute workload mapping data for each unique workload
     for unique_workload in unique_workloads:
         # do not include the workload of the current session
-        if newest_result.workload_id == unique_workload:
+        if target_workload.id == unique_workload:
             continue
         workload_obj = Workload.query.filter(Workload.id == unique_workload).first()
         if workload_obj.system_id != target_workload.system_id:
@@ -63,28 +280,25 @@ def map_workload(data, algorithm):
             continue
 
         # Load knob & metric data for this workload
-        knob_data = DataProcess.load_pipeline_data(unique_workload, latest_pipeline_run.id, 
+        knob_data = DataProcess.load_pipeline_data(unique_workload, pipeline_run_id,
                                                    PipelineTaskType.KNOB_DATA.value)
         knob_data["data"], knob_data["columnlabels"] = \
             DataProcess.clean_knob_data(knob_data["data"], knob_data["columnlabels"],
-                                        [session.id])
+                                        None, session_knobs)
 
-        metric_data = DataProcess.load_pipeline_data(unique_workload, latest_pipeline_run.id, 
+        metric_data = DataProcess.load_pipeline_data(unique_workload, pipeline_run_id,
                                                      PipelineTaskType.METRIC_DATA.value)
-        X_matrix = np.array(knob_data["data"])
-        y_matrix = np.array(metric_data["data"])
+        X_matrix = np.asarray(knob_data["data"])
+        y_matrix = np.asarray(metric_data["data"])
         rowlabels = np.array(knob_data["rowlabels"])
         assert np.array_equal(rowlabels, metric_data["rowlabels"])
 
         if not initialized:
             # For now set pruned metrics to be those computed for the first workload
-            global_pruned_metrics = DataProcess.load_pipeline_data(unique_workload, latest_pipeline_run.id,
+            global_pruned_metrics = DataProcess.load_pipeline_data(unique_workload, pipeline_run_id,
                                                                    PipelineTaskType.PRUNED_METRICS.value)
             pruned_metric_idxs = [i for i in range(y_matrix.shape[1]) if y_columnlabels[
                 i] in global_pruned_metrics]
-
-            # Filter y columnlabels by pruned_metrics
-            y_columnlabels = y_columnlabels[pruned_metric_idxs]
             initialized = True
 
         # Filter y matrices by pruned_metrics
@@ -101,10 +315,18 @@ def map_workload(data, algorithm):
         }
 
     if len(workload_data) == 0:
-        # The background task that aggregates the data has not finished running yet
-        data.update(mapped_workload=None, scores=None)
-        logger.info('%s: Skipping workload mapping because no different workload is available.' % task_name)
-        return data
+        return None
+
+    # The fingerprints of the workloads clustered by the background tasks
+    fingerprint_metrics = None
+    fingerprints = {}
+    for entry in pipeline_data:
+        if entry.task_type != PipelineTaskType.WORKLOAD_FINGERPRINT.value or \
+                entry.workload_id not in workload_data:
+            continue
+        fingerprint = json.loads(entry.data)
+        fingerprint_metrics = fingerprint['metrics']
+        fingerprints[entry.workload_id] = (fingerprint['cluster'], np.array(fingerprint['fingerprint']))
 
     # Stack all X & y matrices for preprocessing
     Xs = np.vstack([entry['X_matrix'] for entry in list(workload_data.values())])
@@ -120,53 +342,159 @@ def map_workload(data, algorithm):
     del Xs
     del ys
 
+    if params['GPR_USE_GPFLOW']:
+        # The gpflow models are not optimized here, their predicted means are
+        # those of the GPRNP with the same kernel. They had no training size
+        # limit.
+        model_params = gpr_models.get_exponential_kernel_params(params['GPR_MODEL_NAME'],
+                                                                lengthscales=params['GPR_LENGTH_SCALE'],
+                                                                variance=params['GPR_MAGNITUDE'])
+        model_params['max_train_size'] = max(len(entry['X_matrix']) for entry in workload_data.values())
+    else:
+        model_params = {'magnitude': params['GPR_MAGNITUDE'],
+                        'length_scale': params['GPR_LENGTH_SCALE'],
+                        'ridge': params['GPR_RIDGE'],
+                        'max_train_size': params['GPR_MAX_TRAIN_SIZE']}
+    model_params['batch_size'] = params['GPR_BATCH_SIZE']
+
+    # The models are fitted when their workloads are scored
+    training_data = {}
+    for workload_id, workload_entry in list(workload_data.items()):
+        training_data[workload_id] = (X_scaler.transform(workload_entry['X_matrix']),
+                                      y_scaler.transform(workload_entry['y_matrix']))
+    return WorkloadMappingModels(X_scaler, y_scaler, y_binner, pruned_metric_idxs, training_data, model_params,
+                                 fingerprint_metrics, fingerprints)
+
+def get_mapping_models(target_workload, pipeline_run_id, session_knobs, y_columnlabels, params):
+    # The mapping models of the target workload, fitted once per pipeline run
+    # and kept in the ModelCache. Returns them and whether they are cached,
+    # the caller must release() the models that are not (too large for the
+    # cache) once it is done with them.
+    key = get_mapping_key(pipeline_run_id, target_workload.id, session_knobs, y_columnlabels, params)
+    mapping_models = ModelCache.get(key)
+    if mapping_models is not None:
+        return mapping_models, True
+    mapping_models = build_mapping_models(target_workload, pipeline_run_id, session_knobs,
+                                          y_columnlabels, params)
+    if mapping_models is None:
+        return None, False
+    mapping_models.cache_key = key
+    return mapping_models, ModelCache.put(key, mapping_models, mapping_models.nbytes)
+
+def update_cached_size(mapping_models):
+    # The cached mapping models grow as their workloads are fitted. Returns
+    # whether they are still cached, if not the caller must release() them.
+    return ModelCache.resize(mapping_models.cache_key, mapping_models, mapping_models.nbytes)
+
+def warm_mapping_models(pipeline_run_id):
+    # Fits the mapping models of the active sessions (with a result in the
+    # last MAPPING_WARM_SESSION_AGE seconds) whose latest results belong to a
+    # workload of the pipeline run, so that their next recommendations only
+    # predict on the cached models. Only the workloads near the session's
+    # latest target data are fitted.
+    workload_ids = {data.workload_id for data in PipelineData.query.filter(
+        PipelineData.pipeline_run_id == pipeline_run_id).all()}
+    active_since = datetime.now() - timedelta(seconds=MAPPING_WARM_SESSION_AGE)
+    session_ids = {row.session_id for row in Result.query.with_entities(Result.session_id).filter(
+        Result.workload_id.in_(workload_ids), Result.creation_time >= active_since).distinct().all()}
+    num_warmed = 0
+    for session_id in session_ids:
+        session = Session.query.filter(Session.id == session_id).first()
+        if session is None or session.algorithm != AlgorithmType.GPB.value:
+            continue
+        newest_result = Result.query.filter(Result.session_id == session_id).order_by(Result.id.desc()).first()
+        if newest_result.workload_id not in workload_ids:
+            continue
+        target_data = TrainingMatrixStore.get(session_id, newest_result.workload_id)
+        if target_data is None:
+            continue
+        target_workload = Workload.query.filter(Workload.id == newest_result.workload_id).first()
+        try:
+            mapping_models, cached = get_mapping_models(target_workload, pipeline_run_id,
+                                                        DataProcess.get_knobs_for_session(session_id),
+                                                        target_data['y_columnlabels'],
+                                                        json.loads(session.hyper_parameters))
+            if mapping_models is None:
+                continue
+            for workload_id in mapping_models.get_candidates(target_data['y_matrix'],
+                                                             target_data['y_columnlabels']):
+                mapping_models.get_model(workload_id)
+            if cached and update_cached_size(mapping_models):
+                num_warmed += 1
+            else:
+                mapping_models.release()
+        except Exception as ex:
+            logger.warning("Cannot warm the workload mapping models of session %s: %s" % (session.name, ex))
+    return num_warmed
+
+def map_workload(data, algorithm):
+    start_ts = time.time()
+    newest_result = Result.query.filter(Result.id == data['newest_result_id']).first()
+    session = Session.query.filter(Session.id == newest_result.session_id).first()
+    task_name = TaskUtil.get_task_name(session, data['newest_result_id'])
+    target_workload = Workload.query.filter(Workload.id == newest_result.workload_id).first()
+
+    if data['status'] != 'good':
+        logger.info("%s: Skipping workload mapping (status: %s)." % (task_name, data['status']))
+        return data
+
+    logger.info("%s: Mapping the workload..." % task_name)
+
+    params = json.loads(session.hyper_parameters)
+
+    # Find all pipeline data belonging to the latest version with the same
+    # system as the target
+    pipeline_data = PipelineData.query.filter(PipelineData.workload_id == newest_result.workload_id).all()
+    pipeline_run_ids = [data.pipeline_run_id for data in pipeline_data]
+    filters = {
+        PipelineRun.end_time != None,
+        PipelineRun.id.in_(pipeline_run_ids)
+    }
+    latest_pipeline_run = PipelineRun.query.filter(*filters).order_by(PipelineRun.id.desc()).first()
+    assert latest_pipeline_run is not None
+    data['pipeline_run'] = latest_pipeline_run.id
+
+    mapping_models, cached = get_mapping_models(target_workload, latest_pipeline_run.id,
+                                                DataProcess.get_knobs_for_session(session.id),
+                                                data['y_columnlabels'], params)
+    if mapping_models is None:
+        # The background task that aggregates the data has not finished running yet
+        data.update(mapped_workload=None, scores=None)
+        logger.info('%s: Skipping workload mapping because no different workload is available.' % task_name)
+        return data
+
     X_target = data['X_matrix']
     # Filter the target's y data by the pruned metrics.
-    y_target = data['y_matrix'][:, pruned_metric_idxs]
+    y_target = data['y_matrix'][:, mapping_models.pruned_metric_idxs]
 
     # Now standardize the target's data and bin it by the deciles we just
     # calculated
-    X_target = X_scaler.transform(X_target)
-    y_target = y_scaler.transform(y_target)
-    y_target = y_binner.transform(y_target)
+    X_target = mapping_models.X_scaler.transform(X_target)
+    y_target = mapping_models.y_scaler.transform(y_target)
+    y_target = mapping_models.y_binner.transform(y_target)
 
-    scores = {}
-    for workload_id, workload_entry in list(workload_data.items()):
-        predictions = np.empty_like(y_target)
-        X_workload = workload_entry['X_matrix']
-        X_scaled = X_scaler.transform(X_workload)
-        y_workload = workload_entry['y_matrix']
-        y_scaled = y_scaler.transform(y_workload)
-        for j, y_col in enumerate(y_scaled.T):
-            # Using this workload's data, train a Gaussian process model
-            # and then predict the performance of each metric for each of
-            # the knob configurations attempted so far by the target.
-            y_col = y_col.reshape(-1, 1)
-            if params['GPR_USE_GPFLOW']:
-                model_kwargs = {'lengthscales': params['GPR_LENGTH_SCALE'],
-                                'variance': params['GPR_MAGNITUDE'],
-                                'noise_variance': params['GPR_RIDGE']}
-                tf.reset_default_graph()
-                graph = tf.get_default_graph()
-                gpflow.reset_default_session(graph=graph)
-                m = gpr_models.create_model(params['GPR_MODEL_NAME'], X=X_scaled, y=y_col,
-                                            **model_kwargs)
-                gpr_result = gpflow_predict(m.model, X_target)
-            else:
-                model = GPRNP(length_scale=params['GPR_LENGTH_SCALE'],
-                              magnitude=params['GPR_MAGNITUDE'],
-                              max_train_size=params['GPR_MAX_TRAIN_SIZE'],
-                              batch_size=params['GPR_BATCH_SIZE'])
-                model.fit(X_scaled, y_col, ridge=params['GPR_RIDGE'])
-                gpr_result = model.predict(X_target)
-            predictions[:, j] = gpr_result.ypreds.ravel()
-        # Bin each of the predicted metric columns by deciles and then
-        # compute the score (i.e., distance) between the target workload
-        # and each of the known workloads
-        predictions = y_binner.transform(predictions)
-        dists = np.sqrt(np.sum(np.square(
-            np.subtract(predictions, y_target)), axis=1))
-        scores[workload_id] = np.mean(dists)
+    # An optional deadline (seconds) bounds the scoring, the best workload
+    # scored by then is mapped
+    deadline = params.get('MAPPING_DEADLINE', 0)
+    deadline_ts = start_ts + deadline if deadline else None
+    # Only score the workloads of the clusters nearest to the target
+    candidates = mapping_models.get_candidates(data['y_matrix'], data['y_columnlabels'])
+    if len(candidates) < len(mapping_models.workload_ids):
+        logger.info('%s: Scoring %s of %s workloads of the nearest clusters.' % (task_name, len(candidates),
+                    len(mapping_models.workload_ids)))
+    try:
+        scores = score_workloads(mapping_models, X_target, y_target, params, deadline_ts, candidates)
+    finally:
+        # The candidates fitted by the scoring count in the cached size
+        if not cached or not update_cached_size(mapping_models):
+            # Not in the ModelCache, nobody else releases their artifacts
+            mapping_models.release()
+    if len(scores) < len(candidates):
+        logger.info('%s: Scored %s of %s workloads before the deadline.' % (task_name, len(scores),
+                    len(candidates)))
+    if len(scores) == 0:
+        data.update(mapped_workload=None, scores=None)
+        return data
 
     # Find the best (minimum) score
     best_score = np.inf
@@ -174,7 +502,7 @@ def map_workload(data, algorithm):
     best_workload_name = None
     scores_info = {}
     for workload_id, similarity_score in list(scores.items()):
-        workload_name = Workload.objects.get(pk=workload_id).name
+        workload_name = Workload.query.filter(Workload.id == workload_id).first().name
         if similarity_score < best_score:
             best_score = similarity_score
             best_workload_id = workload_id
@@ -185,4 +513,4 @@ def map_workload(data, algorithm):
     exec_time = TaskUtil.save_execution_time("async_task", start_ts, "map_workload", newest_result.id)
     logger.info('%s: Done mapping the workload (%.1f seconds).' % (task_name, exec_time))
 
-    return data
\ No newline at end of file
+    return data
@@ -4,8 +4,7 @@ from app.utils import *
 from app.types import *
 from app.commons import *
 from app.analysis.nn_tf import NeuralNet
-from app.analysis.gpr import gpr_models
-from app.analysis.gpr.optimize import tf_optimize
+from app.analysis.gpr.optimize import CompiledOptimizer
 from app.analysis.gp_tf import GPRGD
 from app.analysis.gpr import ucb
 from app.analysis.preprocessing import DummyEncoder
@@ -13,8 +12,7 @@ from app.analysis.constraints import ParamConstraintHelper
 from sklearn.preprocessing import StandardScaler
 from loguru import logger
 import numpy as np
-import tensorflow as tf
-import time, json, queue, gpflow
+import time, json, queue
 
 def process_training_data(data):
     newest_result = Result.query.filter(Result.id == data['newest_result_id']).first()
@@ -38,7 +36,7 @@ def process_training_data(data):
             workload_knob_data["columnlabels"], [session.id])
         X_workload = np.array(cleaned_workload_knob_data[0])
         X_columnlabels = np.array(cleaned_workload_knob_data[1])
-        y_workload = np.array(workload_metric_data['data'])
+        y_workload = np.asarray(workload_metric_data['data'])
         y_columnlabels = np.array(workload_metric_data['columnlabels'])
         rowlabels_workload = np.array(workload_metric_data['rowlabels'])
     else:
@@ -265,12 +263,13 @@ def configuration_recommendation(data, algorithm):
             opt_kwargs['ucb_beta'] = ucb.get_ucb_beta(params['GPR_UCB_BETA'],
                                                       scale=params['GPR_UCB_SCALE'],
                                                       t=i + 1., ndim=X_scaled.shape[1])
-            tf.reset_default_graph()
-            graph = tf.get_default_graph()
-            gpflow.reset_default_session(graph=graph)
-            m = gpr_models.create_model(params['GPR_MODEL_NAME'], X=X_scaled, y=y_scaled,
-                                        **model_kwargs)
-            res = tf_optimize(m.model, X_samples, **opt_kwargs)
+            # The optimizer is compiled once per (model name, input dimension,
+            # number of candidates), the data are rebound for every call
+            key = (params['GPR_MODEL_NAME'], X_samples.shape[1], X_samples.shape[0]) + \
+                tuple(sorted(model_kwargs.items()))
+            with OptimizerCache.acquire(key, lambda: CompiledOptimizer(
+                    params['GPR_MODEL_NAME'], X_samples.shape[1], X_samples.shape[0], **model_kwargs)) as optimizer:
+                res = optimizer.optimize(X_scaled, y_scaled, X_samples, **opt_kwargs)
         else:
             model = GPRGD(length_scale=params['GPR_LENGTH_SCALE'],
                           magnitude=params['GPR_MAGNITUDE'],
@@ -283,8 +282,11 @@ def configuration_recommendation(data, algorithm):
                           sigma_multiplier=params['GPR_SIGMA_MULTIPLIER'],
                           mu_multiplier=params['GPR_MU_MULTIPLIER'],
                           ridge=params['GPR_RIDGE'])
-            model.fit(X_scaled, y_scaled, X_min, X_max)
-            res = model.predict(X_samples, constraint_helper=constraint_helper)
+            try:
+                model.fit(X_scaled, y_scaled, X_min, X_max)
+                res = model.predict(X_samples, constraint_helper=constraint_helper)
+            finally:
+                model.close()
 
     best_config_idx = np.argmin(res.minl.ravel())
     best_config = res.minl_conf[best_config_idx, :]
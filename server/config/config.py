@@ -15,4 +15,6 @@ def parse_config(config_file):
     else:
         config_obj = ProductionConfig()
     config_obj.SQLALCHEMY_DATABASE_URI = config["db_url"]
+    if "data_dir" in config:
+        config_obj.DATA_DIR = config["data_dir"]
     return config_obj
@@ -2,6 +2,7 @@ class BaseConfig(object):
     SQLALCHEMY_DATABASE_URI = "mysql://<username>:<password>@<server>/<database>"
     SQLALCHEMY_TRACK_MODIFICATIONS = False
     SCHEDULER_API_ENABLED = True
+    DATA_DIR = "data"
     JOBS = [
         {
             'id': 'periodic_task',
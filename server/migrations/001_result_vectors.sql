@@ -0,0 +1,26 @@
+-- Upgrades an existing smarttune database (MySQL) for RESULT_STORAGE_MODE = 'vector'.
+-- db.create_all() creates the missing label_set table on startup, but it never
+-- alters the existing result table, so its new columns are added here:
+--
+--   $ mysql -u <username> -p smarttune < server/migrations/001_result_vectors.sql
+--
+-- The statements match app/models.py (LabelSet & Result). The existing rows keep
+-- their json knob_data & metric_data, they have no label_set_id.
+
+CREATE TABLE IF NOT EXISTS label_set (
+    id INTEGER NOT NULL AUTO_INCREMENT,
+    digest VARCHAR(64) NOT NULL,
+    knob_labels TEXT NOT NULL,
+    metric_labels TEXT NOT NULL,
+    creation_time DATETIME,
+    system_id INTEGER,
+    PRIMARY KEY (id),
+    INDEX ix_label_set_digest (digest),
+    FOREIGN KEY (system_id) REFERENCES system_catalog (id)
+);
+
+ALTER TABLE result
+    ADD COLUMN knob_vector LONGBLOB NULL,
+    ADD COLUMN metric_vector LONGBLOB NULL,
+    ADD COLUMN label_set_id INTEGER NULL,
+    ADD FOREIGN KEY (label_set_id) REFERENCES label_set (id);
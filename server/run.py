@@ -1,10 +1,12 @@
 from app import create_app
 from config import * 
 
-args = parse_args()
-app = create_app(parse_config(args.config))
-
 def main():
+    # The app (and its scheduler) is only created here, the worker processes
+    # spawned by the background tasks import this module without starting
+    # another one
+    args = parse_args()
+    app = create_app(parse_config(args.config))
     app.run(host='0.0.0.0', debug=False)
 
 if __name__ == '__main__':